@@ -8,10 +8,8 @@ import math as m
 import numpy as np
 import pickle as _p
 import pandas as pd
-from fastdtw import fastdtw
-import scikit_posthocs as sp
+from collections import OrderedDict
 from numpy.matlib import repmat
-import shapely.geometry as geom
 
 # scipy module imports
 from scipy import stats
@@ -19,8 +17,9 @@ from scipy.stats import poisson as p
 from scipy.signal import medfilt
 from scipy.stats import pearsonr as pr
 from scipy.spatial.distance import *
-from scipy.optimize import minimize, curve_fit
+from scipy.optimize import minimize, curve_fit, linear_sum_assignment
 from scipy.interpolate import interp1d
+from scipy.interpolate import PchipInterpolator as pchip
 from scipy.stats.distributions import t
 
 # rpy2 module imports
@@ -46,6 +45,17 @@ from sklearn.linear_model import LinearRegression
 from scipy.optimize import least_squares
 from sklearn.discriminant_analysis import LinearDiscriminantAnalysis as LDA
 
+# shared memory module import (python 3.8+ only)
+try:
+    from multiprocessing import shared_memory
+except ImportError:
+    shared_memory = None
+
+try:
+    from multiprocessing import resource_tracker
+except ImportError:
+    resource_tracker = None
+
 # PyQt5 module imports
 from PyQt5.QtCore import QRect
 
@@ -67,6 +77,7 @@ diff_dist = lambda x, y: np.sum(np.sum((x - y) ** 2, axis=0)) ** 0.5
 n_cell_pool0 = [1, 2, 3, 4, 5, 10, 15, 20, 30, 40, 50, 75, 100, 150, 200, 300, 400, 500]        # SPEED LDA CELL COUNTS
 n_cell_pool1 = [1, 2, 3, 4, 5, 10, 15, 20, 30, 40, 50, 75, 100, 150, 200, 300, 400, 500]        # DIRECTION LDA CELL COUNTS
 lda_trial_type = None
+shm_task = {'name': None, 'shm': [], 'n_sp': []}
 
 # lambda functions
 rmv_nan_elements = lambda y: [[np.array(xx)[~np.isnan(xx)] for xx in yy] for yy in y]
@@ -141,6 +152,138 @@ def opt_time_to_y0(args, bounds):
     else:
         return x_opt
 
+
+def eval_pchip_columns(pp, x):
+    '''
+
+    :param pp:
+    :param x:
+    :return:
+    '''
+
+    # determines the polynomial interval/offset of each point (row i of x is evaluated with column i of pp)
+    i_int = np.clip(np.searchsorted(pp.x, x, side='right') - 1, 0, len(pp.x) - 2)
+    dx, i_col = x - pp.x[i_int], np.arange(np.size(x, axis=0)).reshape(-1, *([1] * (np.ndim(x) - 1)))
+
+    # evaluates the cubic polynomials
+    c = pp.c[:, i_int, i_col]
+    return ((c[0] * dx + c[1]) * dx + c[2]) * dx + c[3]
+
+
+def calc_time_to_y0(pp, y0, x_lo, x_hi, n_iter=50, f_tol=1e-6):
+    '''
+
+    :param pp:
+    :param y0:
+    :param x_lo:
+    :param x_hi:
+    :param n_iter:
+    :param f_tol:
+    :return:
+    '''
+
+    # sets the search grid points (the lower/upper limits and any interpolation knots between them)
+    x_lo, x_hi = np.asarray(x_lo, dtype=float), np.asarray(x_hi, dtype=float)
+    x_knot = np.clip(pp.x.reshape(1, -1), x_lo.reshape(-1, 1), x_hi.reshape(-1, 1))
+    x_g = np.hstack((x_lo.reshape(-1, 1), x_knot, x_hi.reshape(-1, 1)))
+    f_g = eval_pchip_columns(pp, x_g) - y0.reshape(-1, 1)
+
+    # determines the first grid interval for each signal that contains a crossing point
+    i_c = np.arange(len(y0))
+    is_cross = np.sign(f_g[:, :-1]) * np.sign(f_g[:, 1:]) <= 0
+    i_cross = np.argmax(is_cross, axis=1)
+    a, b, f_a = x_g[i_c, i_cross], x_g[i_c, i_cross + 1], f_g[i_c, i_cross]
+
+    # determines the crossing points by bisection
+    for _ in range(n_iter):
+        x_m = (a + b) / 2.
+        f_m = eval_pchip_columns(pp, x_m) - y0
+        is_lo = f_a * f_m <= 0
+        b, a, f_a = np.where(is_lo, x_m, b), np.where(is_lo, a, x_m), np.where(is_lo, f_a, f_m)
+
+    # if there is no crossing, then use the closest grid point (or the lower limit if the values are not close)
+    x_y0 = (a + b) / 2.
+    i_min = np.argmin(np.abs(f_g), axis=1)
+    x_near = np.where(np.abs(f_g[i_c, i_min]) < np.sqrt(f_tol), x_g[i_c, i_min], x_lo)
+    x_y0 = np.where(np.any(is_cross, axis=1), x_y0, x_near)
+
+    # returns the crossing points (the lower limit is used for empty search ranges)
+    return np.where((x_hi - x_lo) < f_tol, x_lo, x_y0)
+
+
+def calc_signal_hw_features(v_mu, sig_feat, p_rlx=0.05):
+    '''
+
+    :param v_mu:
+    :param sig_feat:
+    :param p_rlx:
+    :return:
+    '''
+
+    # initialisations
+    n_pts, n_c = np.shape(v_mu)
+    i_c, xi = np.arange(n_c), np.arange(n_pts)
+
+    # creates the piecewise-polynomials of the mean signals
+    pp = pchip(xi, v_mu, axis=0)
+    t_max, i_max = sig_feat[:, 2], sig_feat[:, 2].astype(int)
+
+    # determines the minimum point/voltage following the maximum
+    v_post = np.where(xi.reshape(-1, 1) >= i_max.reshape(1, -1), v_mu, np.inf)
+    t_min = np.argmin(v_post, axis=0) - i_max + t_max
+    v_min = np.min(v_post, axis=0)
+
+    # sets the half-width/relaxation voltage levels
+    v_max_2 = v_mu[i_max, i_c] / 2.0
+    v_half = v_mu[sig_feat[:, 1].astype(int), i_c] / 2.0
+    v_rlx = v_min + p_rlx * (v_max_2 - v_min)
+
+    ##################################################
+    ####    POST-STIMULI SPIKE HALF-WIDTH TIME    ####
+    ##################################################
+
+    # determines the location of the half-width points
+    t_hw1_lo = calc_time_to_y0(pp, v_half, sig_feat[:, 0], sig_feat[:, 1])
+    t_hw1_hi = calc_time_to_y0(pp, v_half, sig_feat[:, 1], sig_feat[:, 2])
+    t_hw2_lo = calc_time_to_y0(pp, v_max_2, sig_feat[:, 1], sig_feat[:, 2])
+    t_hw2_hi = calc_time_to_y0(pp, v_max_2, sig_feat[:, 2], t_min)
+    t_rlx = calc_time_to_y0(pp, v_rlx, sig_feat[:, 2], t_min)
+
+    # calculates the new signal features
+    sig_feat_nw = np.array(sig_feat, dtype=float)
+    sig_feat_nw[:, 3], sig_feat_nw[:, 4] = t_hw1_lo, t_hw1_hi
+
+    # returns the signal features with the new features appended
+    return np.hstack((sig_feat_nw, np.vstack((t_hw2_hi - t_hw2_lo, t_rlx - t_max)).T))
+
+
+def load_expt_file(f_name, lazy=True):
+    '''
+
+    :param f_name:
+    :param lazy:
+    :return:
+    '''
+
+    # loads the data from the data file
+    data_nw = cf.load_single_file(f_name, lazy=lazy)
+
+    # setting of other fields
+    if isinstance(data_nw, dict):
+        data_nw['expFile'] = f_name
+
+    # re-calculates the signal features (single experiment only)
+    if os.path.splitext(f_name)[1] == '.cdata':
+        if np.shape(data_nw['sigFeat'])[1] == 5:
+            data_nw['sigFeat'] = calc_signal_hw_features(np.asarray(data_nw['vMu']), np.asarray(data_nw['sigFeat']))
+
+        # sets the cell cluster include indices (if not already set)
+        if 'clInclude' not in data_nw['expInfo']:
+            data_nw['expInfo']['clInclude'] = np.ones(data_nw['nC'], dtype=bool)
+
+    # returns the data dictionary
+    return data_nw
+
 ###########################################
 ####    CROSS-CORRELOGRAM FUNCTIONS    ####
 ###########################################
@@ -264,23 +407,12 @@ def calc_isi_hist_metrics(data_fix, data_free, is_feas, calc_fcn, is_norm=True,
     :return:
     '''
 
-    # memory allocation
-    hist_metric = np.zeros((data_fix['nC'], data_free['nC']))
-
-    # calculates the correlation coefficient for each feasible cluster
-    for i_fix in range(data_fix['nC']):
-        for i_free in range(data_free['nC']):
-            if is_feas[i_fix, i_free]:
-                h_fix = data_fix['isiHist'][i_fix]
-                h_free = data_free['isiHist'][i_free]
-
-                if is_norm:
-                    h_fix = norm_signal_sum(h_fix)
-                    h_free = norm_signal_sum(h_free)
+    # sets the fixed/free histogram arrays
+    h_fix = np.array([data_fix['isiHist'][i] for i in range(data_fix['nC'])], dtype=float)
+    h_free = np.array([data_free['isiHist'][i] for i in range(data_free['nC'])], dtype=float)
 
-                hist_metric[i_fix, i_free] = calc_fcn(h_fix, h_free)
-            else:
-                hist_metric[i_fix, i_free] = np.nan
+    # calculates the metric for each feasible cluster pair
+    hist_metric = calc_hist_metric_matrix(h_fix, h_free, calc_fcn, is_feas, is_norm)
 
     # returns the final array
     return hist_metric, norm_array_rows(hist_metric, max_norm)
@@ -300,21 +432,17 @@ def calc_signal_hist_metrics(data_fix, data_free, is_feas, calc_fcn, is_norm=Tru
     # memory allocation
     hist_metric = np.zeros((data_fix['nC'], data_free['nC']))
 
-    # calculates the metrics for each time point between each
-    for i_fix in range(data_fix['nC']):
-        # loops through each of the free clusters calculating the metrics for the current time point
-        for i_free in range(data_free['nC']):
-            if is_feas[i_fix, i_free]:
-                # calculates
-                single_metric = calc_single_hist_metric(data_fix, data_free, i_fix, i_free, is_norm, calc_fcn)
+    # calculates the metrics for each time point between each feasible cluster pair
+    for i_pts in range(data_fix['nPts']):
+        # retrieves fixed/free histograms for the current point
+        h_fix = np.array([data_fix['ptsHist'][i][i_pts, :] for i in range(data_fix['nC'])], dtype=float)
+        h_free = np.array([data_free['ptsHist'][i][i_pts, :] for i in range(data_free['nC'])], dtype=float)
 
-                # calculates the mean of all the time points
-                hist_metric[i_fix, i_free] = np.mean(single_metric)
-            else:
-                # if not feasible, then set a NaN value
-                hist_metric[i_fix, i_free] = np.nan
+        # adds the metrics for the current time point
+        hist_metric += calc_hist_metric_matrix(h_fix, h_free, calc_fcn, is_feas, is_norm)
 
-    # returns the final metric array
+    # returns the final metric array (the mean of all the time points)
+    hist_metric /= data_fix['nPts']
     return hist_metric
 
 
@@ -330,23 +458,16 @@ def calc_single_hist_metric(data_fix, data_free, i_fix, i_free, is_norm, calc_fc
     :return:
     '''
 
-    # retrieves/normalises the fixed histogram for the current point
-    metric_temp = np.zeros(data_fix['nPts'])
-
-    for i_pts in range(data_fix['nPts']):
-        # retrieves fixed/free histograms for the current point
-        h_fix = data_fix['ptsHist'][i_fix][i_pts, :]
-        h_free = data_free['ptsHist'][i_free][i_pts, :]
-
-        # normalises the histograms (if required)
-        if is_norm:
-            h_fix = norm_signal_sum(h_fix)
-            h_free = norm_signal_sum(h_free)
+    # retrieves fixed/free histograms for all points
+    h_fix = np.array(data_fix['ptsHist'][i_fix][:data_fix['nPts'], :], dtype=float)
+    h_free = np.array(data_free['ptsHist'][i_free][:data_fix['nPts'], :], dtype=float)
 
-        # calculates the metric
-        metric_temp[i_pts] = calc_fcn(h_fix, h_free)
+    # normalises the histograms (if required)
+    if is_norm:
+        h_fix, h_free = norm_hist_rows(h_fix), norm_hist_rows(h_free)
 
-    return metric_temp
+    # calculates the metric for each point
+    return calc_hist_metric_pairs(h_fix, h_free, calc_fcn)
 
 ################################################
 ####    SIGNAL BASED METRICS CALCULATIONS   ####
@@ -443,52 +564,175 @@ def calc_signal_corr(i_dtw, data_fix, data_free, is_feas):
     y_min = [np.min(data_fix['vMu'][:, i]) for i in range(data_fix['nC'])]
     y_max = [np.max(data_fix['vMu'][:, i]) for i in range(data_fix['nC'])]
 
+    # memory allocation
+    i_pair = np.array(np.where(is_feas)).T
+    y_fix_dtw, y_free_dtw = np.empty(len(i_pair), dtype=object), np.empty(len(i_pair), dtype=object)
+    cc[:], dd_dtw[:], dtw_scale[:] = np.nan, np.nan, np.nan
+
     #
-    for i_fix in range(data_fix['nC']):
-        for i_free in range(data_free['nC']):
-            if is_feas[i_fix, i_free]:
-                # sets up the dynamic time-warped signals
-                i_dtw_nw = i_dtw[i_fix, i_free]
-                y_fix_norm = norm_signal(data_fix['vMu'][:, i_fix], y_min=y_min[i_fix], y_max=y_max[i_fix])
-                y_free_norm = norm_signal(data_free['vMu'][:, i_free], y_min=y_min[i_fix], y_max=y_max[i_fix])
-                y_fix_dtw, y_free_dtw = y_fix_norm[i_dtw_nw[:, 0]], y_free_norm[i_dtw_nw[:, 1]]
-
-                # calculates the correlation coefficient
-                C = np.corrcoef(y_fix_dtw, y_free_dtw)
-
-                # calculates the total distance between the mean signals
-                d_tot_dtw = calc_total_distance(y_fix_dtw, y_free_dtw, data_fix['nPts'])
-
-                # dtw_scale[i_fix, i_free] = (data_fix['nPts'] / len(i_dtw_nw))
-                cc[i_fix, i_free] = C[0, 1]
-                dd_dtw[i_fix, i_free] = np.max(d_tot_dtw)
-                dtw_scale[i_fix, i_free] = data_fix['nPts'] / len(y_fix_dtw)
-            else:
-                cc[i_fix, i_free] = np.nan
-                dd_dtw[i_fix, i_free] = np.nan
-                dtw_scale[i_fix, i_free] = np.nan
+    for i_p, (i_fix, i_free) in enumerate(i_pair):
+        # sets up the dynamic time-warped signals
+        i_dtw_nw = i_dtw[i_fix, i_free]
+        y_fix_norm = norm_signal(data_fix['vMu'][:, i_fix], y_min=y_min[i_fix], y_max=y_max[i_fix])
+        y_free_norm = norm_signal(data_free['vMu'][:, i_free], y_min=y_min[i_fix], y_max=y_max[i_fix])
+        y_fix_dtw[i_p], y_free_dtw[i_p] = y_fix_norm[i_dtw_nw[:, 0]], y_free_norm[i_dtw_nw[:, 1]]
+
+        # calculates the correlation coefficient
+        C = np.corrcoef(y_fix_dtw[i_p], y_free_dtw[i_p])
+
+        # dtw_scale[i_fix, i_free] = (data_fix['nPts'] / len(i_dtw_nw))
+        cc[i_fix, i_free] = C[0, 1]
+        dtw_scale[i_fix, i_free] = data_fix['nPts'] / len(y_fix_dtw[i_p])
+
+    # calculates the maximum total distance between the mean signals (for all feasible pairs)
+    if len(i_pair):
+        dd_dtw[i_pair[:, 0], i_pair[:, 1]] = calc_max_total_distance(y_fix_dtw, y_free_dtw, data_fix['nPts'])
 
     # returns the final arrays
     return cc, dd_dtw, dtw_scale
 
 
-def calc_dtw_indices(comp, data_fix, data_free, is_feas):
+def calc_dtw_indices(comp, data_fix, data_free, is_feas, w_band=0.1, pool=None, n_blk=256):
     '''
 
+    :param comp:
     :param data_fix:
     :param data_free:
+    :param is_feas:
+    :param w_band:
+    :param pool:
+    :param n_blk:
     :return:
     '''
 
-    #
-    for i_fix in range(data_fix['nC']):
-        for i_free in range(data_free['nC']):
-            if is_feas[i_fix, i_free]:
-                _, p = fastdtw(data_fix['vMu'][:, i_fix], data_free['vMu'][:, i_free])
-                comp.i_dtw[i_fix, i_free] = np.array(p)
+    # initialisations
+    y_fix, y_free = data_fix['vMu'], data_free['vMu']
+    n_t_fix, n_t_free = np.size(y_fix, axis=0), np.size(y_free, axis=0)
+    w = max(1, int(np.ceil(w_band * max(n_t_fix, n_t_free))))
+    i_pair = np.array(np.where(is_feas)).T
+
+    # sets up the banded dtw calculations (in blocks of signal pairs)
+    p_data = [[y_fix[:, i_pair[i:(i + n_blk), 0]].T, y_free[:, i_pair[i:(i + n_blk), 1]].T, w]
+              for i in range(0, len(i_pair), n_blk)]
+
+    # runs the dtw calculations (over multiple processes if a pool is provided)
+    if pool is None:
+        dtw_res = map(calc_dtw_indices_pool, p_data)
+    else:
+        dtw_res = pool.map(calc_dtw_indices_pool, p_data)
+
+    # sets the warping path indices for each feasible signal pair
+    for i_blk, (_, p_dtw) in enumerate(dtw_res):
+        for i_p, p in enumerate(p_dtw):
+            i_fix, i_free = i_pair[i_blk * n_blk + i_p]
+            comp.i_dtw[i_fix, i_free] = p
 
     return comp
 
+
+def calc_dtw_indices_pool(p_data):
+    '''
+
+    :param p_data:
+    :return:
+    '''
+
+    # retrieves the pool data and runs the banded dtw calculations
+    y_fix, y_free, w = p_data
+    return calc_banded_dtw(y_fix, y_free, w)
+
+
+def calc_lb_keogh(y_q, y_c, w):
+    '''
+
+    :param y_q:
+    :param y_c:
+    :param w:
+    :return:
+    '''
+
+    # the lower bound isn't used to prune the signal pairs (as the warping paths of all feasible pairs are required
+    # for the signal metrics), but can be used to check the dtw distances from calc_banded_dtw
+
+    # calculates the upper/lower envelopes of the candidate signals (over the band width)
+    y_pad = np.pad(y_c, ((0, 0), (w, w)), mode='edge')
+    y_win = np.lib.stride_tricks.sliding_window_view(y_pad, 2 * w + 1, axis=1)
+    y_U, y_L = np.max(y_win, axis=2), np.min(y_win, axis=2)
+
+    # returns the lower bound values (absolute difference to the envelope)
+    return np.sum(np.maximum(y_q - y_U, 0.) + np.maximum(y_L - y_q, 0.), axis=1)
+
+
+def calc_banded_dtw(y_fix, y_free, w, n_mem=2 ** 22):
+    '''
+
+    :param y_fix:
+    :param y_free:
+    :param w:
+    :param n_mem:
+    :return:
+    '''
+
+    # array dimensioning
+    n_sig, n, m = np.size(y_fix, axis=0), np.size(y_fix, axis=1), np.size(y_free, axis=1)
+    n_grp = max(1, int(n_mem / ((n + 1) * (m + 1))))
+
+    # the band is widened (if required) so that it is connected. the band centre moves by s = (n - 1) / (m - 1)
+    # rows between columns, so a band half-width of at least s / 2 ensures consecutive columns overlap or touch
+    w = max(w, int(np.ceil((n - 1) / max(1, m - 1) / 2.)))
+
+    # memory allocation
+    d_dtw, p_dtw = np.zeros(n_sig), np.empty(n_sig, dtype=object)
+
+    # sets the cell indices (and band mask) along each anti-diagonal of the cost matrix
+    i_diag, j_diag = [], []
+    for k in range(2, n + m + 1):
+        i_k = np.arange(max(1, k - m), min(n, k - 1) + 1)
+        j_k = k - i_k
+        is_band = np.abs((i_k - 1) - (j_k - 1) * (n - 1) / max(1, m - 1)) <= w
+        i_diag.append(i_k[is_band])
+        j_diag.append(j_k[is_band])
+
+    for i0 in range(0, n_sig, n_grp):
+        # memory allocation
+        x, y = y_fix[i0:(i0 + n_grp)], y_free[i0:(i0 + n_grp)]
+        n_b = len(x)
+        D = np.inf * np.ones((n_b, n + 1, m + 1))
+        D[:, 0, 0] = 0.
+
+        # calculates the accumulated cost matrix (each anti-diagonal only depends on the previous two)
+        for i_k, j_k in zip(i_diag, j_diag):
+            D_min = np.minimum(np.minimum(D[:, i_k - 1, j_k], D[:, i_k, j_k - 1]), D[:, i_k - 1, j_k - 1])
+            D[:, i_k, j_k] = np.abs(x[:, i_k - 1] - y[:, j_k - 1]) + D_min
+
+        # backtracks the warping paths (ties are resolved in the same order as fastdtw). signal pairs without a
+        # path through the band (infinite cost) have no warping path
+        i_b = np.arange(n_b)
+        ib = i_b[np.isfinite(D[:, n, m])]
+        i, j, n_path = n * np.ones(n_b, dtype=int), m * np.ones(n_b, dtype=int), np.zeros(n_b, dtype=int)
+        p_path = np.zeros((n_b, n + m, 2), dtype=int)
+        while len(ib):
+            # appends the current path points
+            p_path[ib, n_path[ib], 0], p_path[ib, n_path[ib], 1] = i[ib] - 1, j[ib] - 1
+            n_path[ib] += 1
+
+            # determines the next point along the path
+            D_prev = np.vstack((D[ib, i[ib] - 1, j[ib]], D[ib, i[ib], j[ib] - 1], D[ib, i[ib] - 1, j[ib] - 1]))
+            k_min = np.argmin(D_prev, axis=0)
+            i[ib] -= (k_min != 1)
+            j[ib] -= (k_min != 0)
+
+            # removes the completed paths
+            ib = ib[np.logical_or(i[ib] > 0, j[ib] > 0)]
+
+        # sets the dtw distances/warping paths
+        d_dtw[i0:(i0 + n_b)] = D[:, n, m]
+        for k in i_b:
+            p_dtw[i0 + k] = p_path[k, :n_path[k]][::-1] if n_path[k] else None
+
+    # returns the distances and warping paths
+    return d_dtw, p_dtw
+
 ############################################
 ####    HISTOGRAM SIMILARITY METRICS    ####
 ############################################
@@ -502,17 +746,75 @@ def calc_total_distance(y_fix, y_free, n_pts):
 
     # sets the point arrays
     xi = np.array(range(len(y_fix))) / n_pts
-    pp = [np.vstack((xi, y_fix)).T, np.vstack((xi, y_free)).T]
-    lines = [geom.LineString(pp[1]), geom.LineString(pp[0])]
+    pp = np.stack((np.vstack((xi, y_fix)).T, np.vstack((xi, y_free)).T))
 
-    #
-    d_tot = np.zeros((len(xi), 2))
-    for j in range(len(pp)):
-        for i, p in enumerate(pp[j]):
-            pp_g = geom.Point(p[0], p[1])
-            d_tot[i, j] = pp_g.distance(lines[j])
+    # calculates the distance from each signal's points to the other signal
+    return calc_polyline_distance(pp, pp[::-1]).T
+
+
+def calc_max_total_distance(y_fix, y_free, n_pts):
+    '''
+
+    :param y_fix:
+    :param y_free:
+    :param n_pts:
+    :return:
+    '''
+
+    # memory allocation
+    n_pair, n_max = len(y_fix), max([len(y) for y in y_fix])
+    pp = np.zeros((2, n_pair, n_max, 2))
+
+    # sets the point arrays for each signal pair (shorter signals are padded by repeating the final point)
+    for i_pair in range(n_pair):
+        xi, n_y = np.arange(n_max) / n_pts, len(y_fix[i_pair])
+        xi[n_y:] = xi[n_y - 1]
+        pp[0, i_pair, :, 0] = pp[1, i_pair, :, 0] = xi
+        pp[0, i_pair, :, 1] = np.pad(y_fix[i_pair], (0, n_max - n_y), mode='edge')
+        pp[1, i_pair, :, 1] = np.pad(y_free[i_pair], (0, n_max - n_y), mode='edge')
+
+    # calculates the maximum distance from each signal's points to the other signal
+    d_tot = calc_polyline_distance(pp.reshape(-1, n_max, 2), pp[::-1].reshape(-1, n_max, 2))
+    return np.max(d_tot.reshape(2, n_pair, n_max), axis=(0, 2))
+
+
+def calc_polyline_distance(pts, lines, n_mem=2 ** 22):
+    '''
+
+    :param pts:
+    :param lines:
+    :param n_mem:
+    :return:
+    '''
+
+    # ensures each polyline has at least one segment
+    if np.size(lines, axis=1) == 1:
+        lines = np.repeat(lines, 2, axis=1)
+
+    # sets the line segment start points/direction vectors
+    n_b, n_p, n_s = np.size(pts, axis=0), np.size(pts, axis=1), np.size(lines, axis=1) - 1
+    p0, dp = lines[:, :-1, :], np.diff(lines, axis=1)
+    dp_sq = np.maximum(np.sum(dp ** 2, axis=2), np.finfo(float).tiny)
+
+    # memory allocation
+    d_min = np.zeros((n_b, n_p))
+    n_blk = max(1, int(n_mem / max(1, n_p * n_s)))
+
+    # calculates the minimum point/segment distances in blocks
+    for i_b in range(0, n_b, n_blk):
+        # calculates the projection of each point onto each segment (clipped to the segment end points)
+        ib = slice(i_b, i_b + n_blk)
+        dpx, dpy = dp[ib, None, :, 0], dp[ib, None, :, 1]
+        dx, dy = pts[ib, :, None, 0] - p0[ib, None, :, 0], pts[ib, :, None, 1] - p0[ib, None, :, 1]
+        t_p = np.clip((dx * dpx + dy * dpy) / dp_sq[ib, None, :], 0., 1.)
 
-    return d_tot
+        # calculates the minimum distance between each point and the projected points
+        dx -= t_p * dpx
+        dy -= t_p * dpy
+        d_min[ib] = np.sqrt(np.min(dx * dx + dy * dy, axis=2))
+
+    # returns the minimum distance array
+    return d_min
 
 
 def calc_kldiverge(hist_1, hist_2):
@@ -582,6 +884,189 @@ def calc_wasserstein(hist_1, hist_2):
 
     return stats.wasserstein_distance(hist_1, hist_2)
 
+
+def calc_hist_metric_matrix(h_fix, h_free, calc_fcn, is_feas=None, is_norm=False, n_blk=2 ** 14):
+    '''
+
+    :param h_fix:
+    :param h_free:
+    :param calc_fcn:
+    :param is_feas:
+    :param is_norm:
+    :param n_blk:
+    :return:
+    '''
+
+    # initialisations
+    n_fix, n_free = len(h_fix), len(h_free)
+    if is_feas is None:
+        is_feas = np.ones((n_fix, n_free), dtype=bool)
+
+    # normalises the histograms (if required)
+    if is_norm:
+        h_fix, h_free = norm_hist_rows(h_fix), norm_hist_rows(h_free)
+
+    # memory allocation
+    i_pair = np.array(np.where(is_feas)).T
+    hist_metric = np.nan * np.ones((n_fix, n_free))
+
+    # calculates the metrics for the feasible cluster pairs (in blocks of pairs)
+    for i0 in range(0, len(i_pair), n_blk):
+        i_fix, i_free = i_pair[i0:(i0 + n_blk), 0], i_pair[i0:(i0 + n_blk), 1]
+        hist_metric[i_fix, i_free] = calc_hist_metric_pairs(h_fix[i_fix], h_free[i_free], calc_fcn)
+
+    # returns the metric array
+    return hist_metric
+
+
+def calc_hist_metric_pairs(h_1, h_2, calc_fcn):
+    '''
+
+    :param h_1:
+    :param h_2:
+    :param calc_fcn:
+    :return:
+    '''
+
+    if (calc_fcn in hist_pair_fcn) and (np.shape(h_1) == np.shape(h_2)):
+        # case is there is a vectorised version of the metric function
+        return hist_pair_fcn[calc_fcn](h_1, h_2)
+    else:
+        # otherwise, calculate the metric for each histogram pair
+        return np.array([calc_fcn(x1, x2) for x1, x2 in zip(h_1, h_2)])
+
+
+def norm_hist_rows(h):
+    '''
+
+    :param h:
+    :return:
+    '''
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return h / np.sum(h, axis=1, keepdims=True)
+
+
+def calc_kldiverge_pairs(h_1, h_2):
+    '''
+
+    :param h_1:
+    :param h_2:
+    :return:
+    '''
+
+    # sets the (offset) probability distributions
+    pk, qk = norm_hist_rows(h_1 + 1), norm_hist_rows(h_2 + 1)
+
+    # returns the relative entropy values
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.sum(pk * np.log(pk / qk), axis=1)
+
+
+def calc_bhattacharyya_pairs(h_1, h_2):
+    '''
+
+    :param h_1:
+    :param h_2:
+    :return:
+    '''
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return -np.log(np.sum(np.sqrt(h_1 * h_2), axis=1))
+
+
+def calc_hist_intersect_pairs(h_1, h_2):
+    '''
+
+    :param h_1:
+    :param h_2:
+    :return:
+    '''
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return np.sum(np.minimum(h_1, h_2), axis=1) / np.maximum(np.sum(h_1, axis=1), np.sum(h_2, axis=1))
+
+
+def calc_kw_stat_pairs(h_1, h_2):
+    '''
+
+    :param h_1:
+    :param h_2:
+    :return:
+    '''
+
+    # ranks the combined histogram values for each pair
+    n_pair, n_1, n_2 = np.size(h_1, axis=0), np.size(h_1, axis=1), np.size(h_2, axis=1)
+    h_comb, N = np.hstack((h_1, h_2)), n_1 + n_2
+    h_rank = stats.rankdata(h_comb, axis=1)
+
+    # calculates the tie counts (the t^3 - t sum) for each pair
+    h_sort = np.sort(h_comb, axis=1)
+    is_new = np.hstack((np.ones((n_pair, 1), dtype=bool), np.diff(h_sort, axis=1) != 0))
+    i_run = np.cumsum(is_new, axis=1) - 1 + N * np.arange(n_pair)[:, None]
+    n_tie = np.bincount(i_run.flatten(), minlength=n_pair * N).reshape(n_pair, N)
+    tie_sum = np.sum(n_tie ** 3 - n_tie, axis=1).astype(float)
+
+    # calculates the (tie corrected) kruskal-wallis statistic values
+    R_1, R_2 = np.sum(h_rank[:, :n_1], axis=1), np.sum(h_rank[:, n_1:], axis=1)
+    H = (12. / (N * (N + 1))) * (R_1 ** 2 / n_1 + R_2 ** 2 / n_2) - 3. * (N + 1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return H / (1. - tie_sum / (N ** 3 - N))
+
+
+def calc_ks2_stat_pairs(h_1, h_2):
+    '''
+
+    :param h_1:
+    :param h_2:
+    :return:
+    '''
+
+    # sets the cdf step sizes of the combined (sorted) histogram values
+    n_pair, n_1, n_2 = np.size(h_1, axis=0), np.size(h_1, axis=1), np.size(h_2, axis=1)
+    h_comb = np.hstack((h_1, h_2))
+    i_sort = np.argsort(h_comb, axis=1, kind='stable')
+    h_sort = np.take_along_axis(h_comb, i_sort, axis=1)
+    dF = np.where(i_sort < n_1, n_2, -n_1)
+
+    # calculates the maximum cdf difference (the cdfs are only evaluated at the end of each group of tied values)
+    is_end = np.hstack((np.diff(h_sort, axis=1) != 0, np.ones((n_pair, 1), dtype=bool)))
+    k_stat = np.max(np.where(is_end, np.abs(np.cumsum(dF, axis=1)), 0), axis=1)
+
+    # calculates the p-values for each unique statistic value (these only depend on the statistic/sample sizes)
+    ks_stat = np.nan * np.ones(n_pair)
+    is_ok = ~np.any(np.isnan(h_comb), axis=1)
+    k_stat_u, i_stat_u, i_inv = np.unique(k_stat[is_ok], return_index=True, return_inverse=True)
+    i_ok = np.where(is_ok)[0]
+    ks_stat_u = np.array([stats.ks_2samp(h_1[i_ok[i]], h_2[i_ok[i]])[1] for i in i_stat_u])
+    ks_stat[is_ok] = ks_stat_u[i_inv]
+
+    # returns the p-values
+    return ks_stat
+
+
+def calc_wasserstein_pairs(h_1, h_2):
+    '''
+
+    :param h_1:
+    :param h_2:
+    :return:
+    '''
+
+    # for equal sample sizes, the 1D wasserstein distance is the mean difference between the sorted values
+    return np.mean(np.abs(np.sort(h_1, axis=1) - np.sort(h_2, axis=1)), axis=1)
+
+
+# vectorised versions of the histogram metric functions
+hist_pair_fcn = {
+    calc_kldiverge: calc_kldiverge_pairs,
+    calc_bhattacharyya: calc_bhattacharyya_pairs,
+    calc_hist_intersect: calc_hist_intersect_pairs,
+    calc_kw_stat: calc_kw_stat_pairs,
+    calc_ks2_stat: calc_ks2_stat_pairs,
+    calc_wasserstein: calc_wasserstein_pairs,
+}
+
 ###############################################
 ####    ART STATS CALCULATION FUNCTIONS    ####
 ###############################################
@@ -793,47 +1278,44 @@ def norm_array_rows(metric, max_norm=True):
 ###################################################
 
 
-def cluster_distance(data_fix, data_free, n_shuffle=100, n_spikes=10, i_cluster=[1]):
+def cluster_distance(data_fix, data_free, n_shuffle=100, n_spikes=10, i_cluster=[1], seed=None, n_mem=2 ** 24):
     '''
 
+    :param data_fix:
+    :param data_free:
+    :param n_shuffle:
+    :param n_spikes:
+    :param i_cluster:
+    :param seed:
+    :param n_mem:
     :return:
     '''
 
     # memory allocation and other initialisations
-    n_cluster = len(i_cluster)
-    rperm = np.random.permutation
-    mu_dist = np.zeros((n_cluster, data_free['nC'] + 1, n_shuffle))
+    n_cluster, n_free = len(i_cluster), data_free['nC']
+    r_state = cf.setup_random_state(seed)
+    mu_dist = np.zeros((n_cluster, n_free + 1, n_shuffle))
 
     # calculates the distances between the free/fixed cluster shuffled means (over all clusters/shuffles)
     for i_fix in range(n_cluster):
         # REMOVE ME LATER for waitbar
         print('Calculating Distances for Fixed Cluster #{0}'.format(i_fix + 1))
 
-        # progress update update
-        for i_free in range(data_free['nC'] + 1):
-            # sets the number of free/fixed spikes for the current cluster
-            i_cl = i_cluster[i_fix] - 1
-            n_fix = np.size(data_fix['vSpike'][i_cl], axis=1)
-            if i_free < data_free['nC']:
-                n_free = np.size(data_free['vSpike'][i_free], axis=1)
-
-            #
-            for i_shuff in range(n_shuffle):
-                # calculates the shuffled fixed mean signal
-                ind_fix = rperm(n_fix)[:n_spikes]
-                ws_fix = np.mean(data_fix['vSpike'][i_cl][:, ind_fix], axis=1)
-
-                # sets the comparison signal based on the type
-                if i_free == data_free['nC']:
-                    # case is the fixed signal population mean
-                    ws_free = data_fix['vMu'][:, i_cl]
-                else:
-                    # case is the shuffled free mean signal
-                    ind_free = rperm(n_free)[:n_spikes]
-                    ws_free = np.mean(data_free['vSpike'][i_free][:, ind_free], axis=1)
+        # calculates the shuffled fixed mean signals (for each free cluster comparison/shuffle)
+        i_cl = i_cluster[i_fix] - 1
+        ws_fix = calc_random_subset_means(data_fix['vSpike'][i_cl], n_spikes, (n_free + 1) * n_shuffle, r_state, n_mem)
+        ws_fix = ws_fix.reshape(n_free + 1, n_shuffle, -1)
+
+        # sets the comparison signals. these are the shuffled free mean signals and the fixed signal population mean
+        ws_free = np.empty(np.shape(ws_fix))
+        for i_free in range(n_free):
+            v_free = data_free['vSpike'][i_free]
+            ws_free[i_free] = calc_random_subset_means(v_free, n_spikes, n_shuffle, r_state, n_mem)
 
-                # calculates the euclidean distance between the signals
-                mu_dist[i_fix, i_free, i_shuff] = euclidean(ws_free, ws_fix)
+        ws_free[n_free] = data_fix['vMu'][:, i_cl]
+
+        # calculates the euclidean distance between the signals
+        mu_dist[i_fix, :, :] = np.sqrt(np.sum((ws_free - ws_fix) ** 2, axis=2))
 
     #
     return mu_dist
@@ -842,6 +1324,40 @@ def cluster_distance(data_fix, data_free, n_shuffle=100, n_spikes=10, i_cluster=
     # h.close()
 
 
+def calc_random_subset_means(v_spike, n_sub, n_draw, r_state=None, n_mem=2 ** 24):
+    '''
+
+    :param v_spike:
+    :param n_sub:
+    :param n_draw:
+    :param r_state:
+    :param n_mem:
+    :return:
+    '''
+
+    # initialisations
+    n_t, n_sp = np.shape(v_spike)
+    n_sub, r_state = min(n_sub, n_sp), cf.setup_random_state(r_state)
+    n_blk = max(1, int(n_mem / max(1, n_sp, n_t * n_sub)))
+
+    # memory allocation
+    ws_mean = np.nan * np.ones((n_draw, n_t))
+    if n_sub == 0:
+        return ws_mean
+
+    # calculates the random subset means (in blocks of random draws)
+    for i0 in range(0, n_draw, n_blk):
+        # sets the random subset indices (the smallest uniform random values give a subset without replacement)
+        n_b = min(n_blk, n_draw - i0)
+        ind_sub = np.argpartition(r_state.rand(n_b, n_sp), n_sub - 1, axis=1)[:, :n_sub]
+
+        # calculates the subset mean signals
+        ws_mean[i0:(i0 + n_b), :] = np.mean(v_spike[:, ind_sub], axis=2).T
+
+    # returns the mean signal array
+    return ws_mean
+
+
 def calc_ccgram_types(ccG, ccG_xi, t_spike, c_id=None, calc_para=None, w_prog=None, expt_id=None):
     '''
 
@@ -1175,34 +1691,93 @@ def calc_weighted_mean(metrics, W=None):
         W = np.ones(np.size(metrics, axis=2)) / np.size(metrics, axis=2)
     else:
         # otherwise, ensure the weights sum up to 1
-        W = W / np.sum(W)
+        W = np.asarray(W, dtype=float) / np.sum(W)
 
     # sets the weighted values into the overall array (only for the non-NaN values)
-    for i_row in range(np.size(metrics, axis=0)):
-        ii = np.array([np.isnan(x) for x in metrics[i_row, :, 0]])
-        for i_met in range(np.size(metrics, axis=2)):
-            metric_weighted_mean[i_row, :, i_met] = W[i_met] * metrics[i_row, :, i_met]
+    metric_weighted_mean[:] = W.reshape(1, 1, -1) * metrics
 
     # returns the weighted sum
     return np.nansum(metric_weighted_mean, axis=2)
 
 
-def det_gmm_cluster_groups(grp_means):
+def det_cluster_assignment(D, is_feas, solver='Optimal', d_max=None):
     '''
 
-    :param g_means:
+    :param D:
+    :param is_feas:
+    :param solver:
+    :param d_max:
     :return:
     '''
 
-    # lambda function declaration
-    mu_tol = 1e-3
+    # case is there are multiple comparisons (the assignments for each comparison are calculated separately)
+    if isinstance(D, list):
+        return [det_cluster_assignment(_D, _is_feas, solver, d_max) for _D, _is_feas in zip(D, is_feas)]
 
-    # initialisations
-    i_grp, i_ind, n_grp = [grp_means[0]], [[0]], np.size(grp_means, axis=0)
+    # determines the feasible matches (undefined costs or those above the distance threshold are removed)
+    D = np.asarray(D, dtype=float)
+    is_ok = np.logical_and(is_feas, np.isfinite(D))
+    if d_max is not None:
+        is_ok[is_ok] = D[is_ok] <= d_max
 
-    #
-    for i in range(1, n_grp):
-        # calculates the distance between the currently stored groups
+    # memory allocation
+    n_fix, n_free = np.shape(D)
+    i_match = -np.ones(n_fix, dtype=int)
+
+    # if there are no feasible matches, then exit
+    if not np.any(is_ok):
+        return i_match
+
+    if solver == 'Greedy':
+        # case is the greedy matching (the next best feasible match is taken until all matches are found)
+        i_free_ok, i_fix_ok = np.where(is_ok.T)
+        i_sort = np.argsort(D[i_fix_ok, i_free_ok], kind='stable')
+
+        # memory allocation
+        is_fix, is_free = np.zeros(n_fix, dtype=bool), np.zeros(n_free, dtype=bool)
+        n_match_max = min(len(np.unique(i_fix_ok)), len(np.unique(i_free_ok)))
+
+        # determines the overall unique matches
+        for iR, iC in zip(i_fix_ok[i_sort], i_free_ok[i_sort]):
+            if not (is_fix[iR] or is_free[iC]):
+                # if there is not already a match, then update the match arrays
+                i_match[iR] = iC
+                is_fix[iR], is_free[iC] = True, True
+                if np.sum(is_fix) == n_match_max:
+                    # if all matches are found, then exit the loop
+                    break
+
+    else:
+        # case is the optimal matching. infeasible matches are given a cost larger than any feasible assignment
+        # (this maximises the number of feasible matches before minimising the total match cost)
+        d_min, d_max_ok = np.min(D[is_ok]), np.max(D[is_ok])
+        C = np.where(is_ok, D - d_min, (d_max_ok - d_min + 1.) * (min(n_fix, n_free) + 1))
+        i_row, i_col = linear_sum_assignment(C)
+
+        # removes any infeasible assignments
+        is_match = is_ok[i_row, i_col]
+        i_match[i_row[is_match]] = i_col[is_match]
+
+    # returns the match array
+    return i_match
+
+
+def det_gmm_cluster_groups(grp_means):
+    '''
+
+    :param g_means:
+    :return:
+    '''
+
+    # lambda function declaration
+    mu_tol = 1e-3
+
+    # initialisations
+    i_grp, i_ind, n_grp = [grp_means[0]], [[0]], np.size(grp_means, axis=0)
+
+    #
+    for i in range(1, n_grp):
+        # calculates the distance between the currently stored groups
         mu_diff = np.vstack([[diff_dist(x, grp_means[i]), diff_dist(x, grp_means[i][:, ::-1])] for x in i_grp])
         if np.any(mu_diff < mu_tol):
             # if there is a match, then determine which group/direction the new mean
@@ -1324,10 +1899,13 @@ def get_rot_phase_offsets(calc_para, is_vis=False):
         return None, None
 
 
-def calc_noise_correl(d_data, n_sp):
+def calc_noise_correl(d_data, n_sp, n_perm=0, seed=None):
     '''
 
     :param d_data:
+    :param n_sp:
+    :param n_perm:
+    :param seed:
     :return:
     '''
 
@@ -1339,7 +1917,6 @@ def calc_noise_correl(d_data, n_sp):
         '''
 
         # array dimensioning and parameters
-        z_tol = 3.
         n_t0, n_c = int(np.size(n_spt0, axis=0) / 2), np.size(n_spt0, axis=1)
 
         # array dimensioning
@@ -1349,39 +1926,37 @@ def calc_noise_correl(d_data, n_sp):
         else:
             n_spt = n_spt0[:n_t0, :, :] + n_spt0[n_t0:, :, :]
 
-        # memory allocation
-        r_pair = np.nan * np.ones((n_c, n_c))
-        z_sp_pair = np.empty((n_c, n_c), dtype=object)
-
         # calculates the pair-wise pearson correlations between each cell pair (over all trials)
-        for i_c0 in range(n_c):
-            for i_c1 in range(i_c0 + 1, n_c):
-                # sets up the pairwise array and from this calculates the mean/std dev
-                n_sp_pair = n_spt[:, np.array([i_c0, i_c1]), :]
-                x, y = n_sp_pair[:, 0, :].flatten(), n_sp_pair[:, 1, :].flatten()
+        z_sp, is_acc = calc_noise_correl_zscore(n_spt)
+        r_pair, n_pair = calc_masked_correl_matrix(z_sp, is_acc)
 
-                # calculates the x/y z-scored values
-                x_z = (x - np.nanmean(x)) / np.nanstd(x) if np.any(x > 0) else x
-                y_z = (y - np.nanmean(y)) / np.nanstd(y) if np.any(y > 0) else y
-                is_acc = np.logical_and(np.abs(x_z) < z_tol, np.abs(y_z) < z_tol)
-
-                # calculates the pair-wise pearson correlations
-                r_pair[i_c0, i_c1] = r_pair[i_c1, i_c0] = pr(x_z[is_acc], y_z[is_acc])[0]
-                z_sp_pair[i_c0, i_c1] = np.vstack((x_z[is_acc], y_z[is_acc])).T
+        # calculates the correlation significance values (permutation test if the permutation count is given)
+        if n_perm > 0:
+            p_pair = calc_noise_correl_perm_test(z_sp, is_acc, r_pair, n_perm, r_state)
+        else:
+            p_pair = calc_correl_pvalue(r_pair, n_pair)
 
         # returns the pairwise correlation array
         if is_3d:
-            return r_pair
-        else:
-            return r_pair, z_sp_pair
+            return r_pair, p_pair
+
+        # sets the accepted z-scored values for each cell pair
+        z_sp_pair = np.empty((n_c, n_c), dtype=object)
+        for i_c0, i_c1 in zip(*np.triu_indices(n_c, k=1)):
+            ii = np.logical_and(is_acc[:, i_c0], is_acc[:, i_c1])
+            z_sp_pair[i_c0, i_c1] = z_sp[ii][:, np.array([i_c0, i_c1])]
+
+        # returns the pairwise correlation/z-scored value arrays
+        return r_pair, p_pair, z_sp_pair
 
     # array dimensioning
     n_cond = len(d_data.ttype)
     n_ex, n_t, n_dim = len(n_sp), int(np.size(n_sp[0], axis=0) / (2 * n_cond)), len(np.shape(n_sp[0]))
+    r_state = cf.setup_random_state(seed)
 
     # memory allocation
     A = np.empty(n_ex, dtype=object)
-    d_data.pw_corr = dcopy(A)
+    d_data.pw_corr, d_data.pw_corr_p = dcopy(A), dcopy(A)
 
     for i_ex in range(n_ex):
         if n_dim == 2:
@@ -1390,361 +1965,1549 @@ def calc_noise_correl(d_data, n_sp):
                 d_data.z_corr = dcopy(A)
 
             # case is analysing non-shuffled data
-            d_data.pw_corr[i_ex], d_data.z_corr[i_ex] = zip(*[
+            d_data.pw_corr[i_ex], d_data.pw_corr_p[i_ex], d_data.z_corr[i_ex] = zip(*[
                 calc_pw_noise_correl(n_sp[i_ex][np.arange(i * n_t, (i + 2) * n_t), :]) for i in range(n_cond)
             ])
         else:
             # case is analysing shuffled data
-            d_data.pw_corr[i_ex] = [
+            d_data.pw_corr[i_ex], d_data.pw_corr_p[i_ex] = [list(x) for x in zip(*[
                 calc_pw_noise_correl(n_sp[i_ex][np.arange(i * n_t, (i + 2) * n_t), :, :], True) for i in range(n_cond)
-            ]
+            ])]
 
 
-def set_def_para(para, p_str, def_val):
+def calc_noise_correl_zscore(n_spt, z_tol=3.):
     '''
 
-    :param rot_para:
-    :param p_str:
-    :param def_val:
+    :param n_spt:
+    :param z_tol:
     :return:
     '''
 
-    # returns the parameter value if present in the para dictionary, otherwise return the default value
-    return dcopy(para[p_str]) if p_str in para else dcopy(def_val)
-
+    # sets the trial counts for each cell (trials/shuffles are combined into a single axis)
+    n_c = np.size(n_spt, axis=1)
+    x = np.transpose(n_spt, (0, 2, 1)).reshape(-1, n_c).astype(float)
 
-########################################################################################################################
-####                                           LDA CALCULATION FUNCTIONS                                            ####
-########################################################################################################################
+    # calculates the z-scored values (cells with no spikes are not z-scored)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        x_mn, x_sd = np.nanmean(x, axis=0), np.nanstd(x, axis=0)
+        z_sp = np.where(np.any(x > 0, axis=0), (x - x_mn) / x_sd, x)
 
-######################################
-####    ROTATION LDA FUNCTIONS    ####
-######################################
+    # returns the z-scored values and the acceptance mask (outlier/missing values are removed)
+    with np.errstate(invalid='ignore'):
+        return z_sp, np.abs(z_sp) < z_tol
 
 
-def setup_lda_spike_counts(r_obj, i_cell, i_ex, n_t, return_all=True):
+def calc_masked_correl_matrix(z_sp, is_acc):
     '''
 
-    :param r_obj:
-    :param i_cell:
-    :param i_ex:
-    :param n_t:
+    :param z_sp:
+    :param is_acc:
     :return:
     '''
 
-    # memory allocation
-    n_sp, t_sp, i_grp = [], [], []
-    ind_c = [np.where(i_expt == i_ex)[0][i_cell] for i_expt in r_obj.i_expt]
-    n_cell, ind_t = len(ind_c[0]), np.array(range(n_t))
-
-    # sets up the LDA data/group index arrays across each condition
-    for i_filt in range(r_obj.n_filt):
-        # retrieves the time spikes for the current filter/experiment, and then combines into a single
-        # concatenated array. calculates the final spike counts over each cell/trial and appends to the
-        # overall spike count array
-        A = dcopy(r_obj.t_spike[i_filt][ind_c[i_filt], :, :])[:, ind_t, :]
-        if r_obj.rot_filt['t_type'][i_filt] == 'MotorDrifting':
-            # case is motordrifting (swap phases)
-            t_sp_tmp = np.hstack((A[:, :, 2], A[:, :, 1]))
-        else:
-            # case is other experiment conditions
-            t_sp_tmp = np.hstack((A[:, :, 1], A[:, :, 2]))
+    # sets the masked value arrays
+    M = is_acc.astype(float)
+    Z = np.where(is_acc, z_sp, 0.)
 
-        # calculates the spike counts and appends them to the count array
-        n_sp.append(np.vstack([np.array([len(y) for y in x]) for x in t_sp_tmp]))
-        t_sp.append(t_sp_tmp)
+    # calculates the masked sums over the points that are valid for both cells in each pair
+    n_pair = np.dot(M.T, M)
+    Sx, Sxx, Sxy = np.dot(Z.T, M), np.dot((Z ** 2).T, M), np.dot(Z.T, Z)
 
-        # sets the grouping indices
-        ind_g = [2 * i_filt, 2 * i_filt + 1]
-        i_grp.append(np.hstack((ind_g[0] * np.ones(n_t), ind_g[1] * np.ones(n_t))).astype(int))
+    # calculates the pearson correlation values
+    with np.errstate(invalid='ignore', divide='ignore'):
+        vx, vy = n_pair * Sxx - Sx ** 2, n_pair * Sxx.T - Sx.T ** 2
+        r_pair = np.clip((n_pair * Sxy - Sx * Sx.T) / np.sqrt(vx * vy), -1., 1.)
 
-    # combines the spike counts/group indices into the final combined arrays
-    n_sp, i_grp = np.hstack(n_sp).T, np.hstack(i_grp)
+    # removes the infeasible values (diagonal, or pairs with insufficient/constant values)
+    is_const = np.logical_or(vx <= 1e-10 * n_pair * Sxx, vy <= 1e-10 * n_pair * Sxx.T)
+    r_pair[np.logical_or.reduce((n_pair < 2, is_const, np.eye(len(r_pair), dtype=bool)))] = np.nan
 
-    # returns the important arrays
-    if return_all:
-        return n_sp, t_sp, i_grp, n_cell
-    else:
-        return n_sp, i_grp
+    # returns the correlation/pair count arrays
+    return r_pair, n_pair
 
 
-def norm_spike_counts(n_sp, N, is_norm):
+def calc_correl_pvalue(r_pair, n_pair):
     '''
 
-    :param n_sp:
+    :param r_pair:
+    :param n_pair:
     :return:
     '''
 
-    # makes a copy of the spike count array
-    n_sp_calc = dcopy(n_sp)
+    # calculates the two-sided p-values (student-t distribution with n - 2 degrees of freedom)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        dof = n_pair - 2.
+        t_stat = np.abs(r_pair) * np.sqrt(dof / (1. - r_pair ** 2))
+        p_pair = 2. * t.sf(t_stat, dof)
 
-    # normalises the spike counts (if required)
-    if is_norm:
-        n_sp_mn, n_sp_sd = np.mean(n_sp_calc, axis=0), np.std(n_sp_calc, axis=0)
-        n_sp_calc = np.divide(n_sp_calc - repmat(n_sp_mn, N, 1), repmat(n_sp_sd, N, 1))
+    # returns the p-values
+    p_pair[np.isnan(r_pair)] = np.nan
+    return p_pair
 
-        # any cells where the std. deviation is zero are set to zero (to remove any NaNs)
-        n_sp_calc[:, n_sp_sd == 0] = 0
 
-    # returns the final values
-    return n_sp_calc
+def calc_noise_correl_perm_test(z_sp, is_acc, r_pair, n_perm, r_state=None, n_mem=2 ** 24):
+    '''
+
+    :param z_sp:
+    :param is_acc:
+    :param r_pair:
+    :param n_perm:
+    :param r_state:
+    :param n_mem:
+    :return:
+    '''
 
+    # initialisations
+    n_pts, n_c = np.shape(z_sp)
+    r_state = cf.setup_random_state(r_state)
+    n_blk = max(1, int(n_mem / max(1, n_pts * n_c)))
+    n_ex, n_tot = np.zeros((n_c, n_c)), np.zeros((n_c, n_c))
+
+    # calculates the null correlations in blocks of permutations
+    for i_blk in range(0, n_perm, n_blk):
+        # sets the permutation indices (trials are shuffled independently for each cell)
+        n_p = min(n_blk, n_perm - i_blk)
+        ind_p = np.argsort(r_state.rand(n_p, n_pts, n_c), axis=1)
+
+        for i_p in range(n_p):
+            # calculates the null correlation matrix for the current permutation
+            z_p = np.take_along_axis(z_sp, ind_p[i_p], axis=0)
+            r_null, _ = calc_masked_correl_matrix(z_p, np.take_along_axis(is_acc, ind_p[i_p], axis=0))
+
+            # increments the exceedance/valid counts
+            is_ok = ~np.isnan(r_null)
+            with np.errstate(invalid='ignore'):
+                n_ex += np.logical_and(is_ok, np.abs(r_null) >= np.abs(r_pair) - 1e-12)
+            n_tot += is_ok
+
+    # returns the permutation p-values
+    p_pair = (1. + n_ex) / (1. + n_tot)
+    p_pair[np.isnan(r_pair)] = np.nan
+    return p_pair
 
-def run_rot_lda(data, calc_para, r_filt, i_expt, i_cell, n_trial_max, d_data=None, is_shuffle=False, w_prog=None,
-                pW0=0., pW=100., n_sp0=None):
+
+def set_def_para(para, p_str, def_val):
     '''
 
-    :param data:
-    :param calc_para:
-    :param r_filt:
-    :param i_expt:
-    :param i_cell:
-    :param n_trial_max:
-    :param d_data:
-    :param is_shuffle:
+    :param rot_para:
+    :param p_str:
+    :param def_val:
     :return:
     '''
 
-    def run_lda_predictions(w_prog, r_obj, lda_para, n_sp, i_cell, i_ex, is_shuffle, pW0, pW):
+    # returns the parameter value if present in the para dictionary, otherwise return the default value
+    return dcopy(para[p_str]) if p_str in para else dcopy(def_val)
+
+
+########################################################################################################################
+####                                           LDA CALCULATION FUNCTIONS                                            ####
+########################################################################################################################
+
+############################################
+####    SPIKE COUNT TENSOR FUNCTIONS    ####
+############################################
+
+class SpikeCountTensor(object):
+    def __init__(self, r_obj=None, t_bin=None):
+
+        # initialisations
+        self.n_filt = 0
+        self.n_expt = 0
+        self.t_bin = t_bin
+        self.i_expt = []
+        self.n_sp = []
+        self.rot_filt = {'t_type': []}
+
+        # calculates the spike counts from the rotation filtered data object (if provided)
+        if r_obj is not None:
+            self.set_spike_counts(r_obj)
+
+    def set_spike_counts(self, r_obj):
         '''
 
         :param r_obj:
-        :param cell_ok:
-        :param n_trial_max:
-        :param i_ex:
         :return:
         '''
 
-        def shuffle_trial_counts(n_sp, n_t):
-            '''
+        # sets the filter/experiment fields from the rotation filtered data object
+        self.n_filt, self.n_expt = r_obj.n_filt, r_obj.n_expt
+        self.rot_filt = {'t_type': list(r_obj.rot_filt['t_type'])}
+        self.i_expt = [np.array(x) for x in r_obj.i_expt]
 
-            :param n_sp:
-            :param n_trial_max:
-            :return:
-            '''
+        # calculates the (cell, trial, phase[, time-bin]) spike count tensors for each filter
+        self.n_sp = [calc_spike_count_tensor(t_sp, self.t_bin) for t_sp in r_obj.t_spike]
+        self.set_read_only()
 
-            # initialisation
-            n_cell = np.size(n_sp, axis=1)
-            n_cond = int(np.size(n_sp, axis=0) / (2 * n_t))
+    def set_read_only(self):
+        '''
+
+        :return:
+        '''
 
-            # shuffles the trials for each of the cells
-            for i_cell in range(n_cell):
-                # sets the permutation array ensures the following:
-                #  * CW/CCW trials are shuffled the same between conditions
-                #  * Trials are shuffled independently between conditions
-                ind_perm = [np.random.permutation(n_t) for _ in range(n_cond)]
-                ind_c = np.hstack([np.hstack((x + 2 * i * n_t, x + (2 * i + 1) * n_t)) for i, x in enumerate(ind_perm)])
+        # the arrays are shared between all LDA calculations, so they are flagged as read-only
+        for x in self.n_sp + self.i_expt:
+            x.setflags(write=False)
 
-                # shuffles the trials for the current cell
-                n_sp[:, i_cell] = n_sp[ind_c, i_cell]
+    def save(self, f_name):
+        '''
 
-            # returns the array
-            return n_sp
+        :param f_name:
+        :return:
+        '''
 
-        # memory allocation and initialisations
-        is_OTO = get_glob_para('lda_trial_type') == 'One-Trial Out'
-        n_t, n_grp, N = n_trial_max, 2 * r_obj.n_filt, 2 * r_obj.n_filt * n_trial_max
-        pWS = 1 / r_obj.n_expt
+        # sets the array fields
+        s_data = {'n_filt': self.n_filt, 'n_expt': self.n_expt, 't_type': np.array(self.rot_filt['t_type']),
+                  't_bin': np.array([] if self.t_bin is None else self.t_bin, dtype=float)}
+        for i_filt in range(self.n_filt):
+            s_data['n_sp_{0}'.format(i_filt)] = self.n_sp[i_filt]
+            s_data['i_expt_{0}'.format(i_filt)] = self.i_expt[i_filt]
 
-        ####################################
-        ####    LDA DATA ARRAY SETUP    ####
-        ####################################
+        # outputs the arrays to file (a temporary file is used so that partially written files are never loaded)
+        f_tmp = '{0}.tmp.npz'.format(os.path.splitext(f_name)[0])
+        np.savez(f_tmp, **s_data)
+        os.replace(f_tmp, f_name)
 
-        if n_sp is None:
-            # case is the spike counts haven't been provided
-            n_sp, t_sp, i_grp, n_cell = setup_lda_spike_counts(r_obj, i_cell, i_ex, n_trial_max)
+    @staticmethod
+    def load(f_name):
+        '''
 
-        else:
-            # case is the spike counts have been provided
+        :param f_name:
+        :return:
+        '''
 
-            # retrieves the cell count and group indices
-            n_cell = np.size(n_sp, axis=1)
-            i_grp = np.array(cf.flat_list([list(x * np.ones(n_trial_max, dtype=int)) for x in range(n_grp)]))
+        # loads the arrays from file
+        with np.load(f_name) as s_data:
+            n_sp = SpikeCountTensor(t_bin=s_data['t_bin'] if len(s_data['t_bin']) else None)
+            n_sp.n_filt, n_sp.n_expt = int(s_data['n_filt']), int(s_data['n_expt'])
+            n_sp.rot_filt = {'t_type': [str(x) for x in s_data['t_type']]}
+            n_sp.n_sp = [s_data['n_sp_{0}'.format(i_filt)] for i_filt in range(n_sp.n_filt)]
+            n_sp.i_expt = [s_data['i_expt_{0}'.format(i_filt)] for i_filt in range(n_sp.n_filt)]
 
-        # shuffles the trials (if required)
-        if is_shuffle:
-            n_sp = shuffle_trial_counts(n_sp, n_trial_max)
+        # returns the spike count tensor object
+        n_sp.set_read_only()
+        return n_sp
 
-        # normalises the spike count array (if required)
-        n_sp_calc = norm_spike_counts(n_sp, N, lda_para['is_norm'])
+    def calc_size(self):
+        '''
 
-        ###########################################
-        ####    LDA PREDICTION CALCULATIONS    ####
-        ###########################################
+        :return:
+        '''
 
-        # sets the LDA solver type
-        lda = setup_lda_solver(lda_para)
+        # returns the size (in MB) of the spike count tensors
+        return sum([x.nbytes for x in self.n_sp + self.i_expt]) / 2 ** 20
 
-        # memory allocation
-        lda_pred, c_mat = np.zeros(N, dtype=int), np.zeros((n_grp, n_grp), dtype=int)
-        lda_pred_chance, c_mat_chance = np.zeros(N, dtype=int), np.zeros((n_grp, n_grp), dtype=int)
-        p_mat, is_keep = np.zeros((N, n_grp), dtype=float), np.ones(N, dtype=bool)
+    def get_window_tensor(self, t_ofs, t_phase):
+        '''
 
-        # sets the total number of iterations (based on trial setup type)
-        if is_OTO:
-            # case is "one-trial out" setup
-            NN, xi_rmv = n_trial_max, np.arange(0, N, n_trial_max)
-        else:
-            # case is "one-phase out" setup
-            NN = len(i_grp)
+        :param t_ofs:
+        :param t_phase:
+        :return:
+        '''
 
-        # fits the LDA model and calculates the prediction for each
-        for i_trial in range(NN):
-            # updates the progress bar
-            if w_prog is not None:
-                w_str = 'Running LDA Predictions (Expt {0} of {1})'.format(i_ex + 1, r_obj.n_expt)
-                w_prog.emit(w_str, pW0 + pW * pWS * (i_ex + i_trial / NN))
+        # determines the time bins spanning the analysis window. the window includes both end points, so the upper bin
+        # edge is the next floating point value above the window end (see calc_window_bin_edges)
+        t_bin, t_win = np.array(self.t_bin, dtype=float), [t_ofs, np.nextafter(t_ofs + t_phase, np.inf)]
+        i_lo, i_hi = np.searchsorted(t_bin, t_win)
+        if (i_hi >= len(t_bin)) or np.any(t_bin[[i_lo, i_hi]] != t_win):
+            raise ValueError('The analysis window ({0}s to {1}s) does not match the spike count time bin '
+                             'edges'.format(t_ofs, t_ofs + t_phase))
 
-            # fits the one-out-trial lda model
-            if is_OTO:
-                is_keep[xi_rmv + i_trial] = False
-            else:
-                is_keep[i_trial] = False
+        # creates the window spike count tensor object
+        n_sp_w = SpikeCountTensor()
+        n_sp_w.n_filt, n_sp_w.n_expt = self.n_filt, self.n_expt
+        n_sp_w.rot_filt, n_sp_w.i_expt = self.rot_filt, self.i_expt
 
-            # fits the one-out-trial lda model
+        # sums the spike counts over the window time bins (missing trials retain their count of -1). the same window
+        # is used for the baseline phase, whose counts aren't used by the LDA calculations
+        for n_sp in self.n_sp:
+            n_sp_nw = np.sum(n_sp[..., i_lo:i_hi], axis=-1)
+            n_sp_nw[n_sp[..., 0] < 0] = -1
+            n_sp_w.n_sp.append(n_sp_nw)
+
+        # returns the window spike count tensor object
+        n_sp_w.set_read_only()
+        return n_sp_w
+
+
+class SpikeCountCache(object):
+    def __init__(self, n_max=50, mem_max=512, disk_max=2048, cache_dir=None):
+
+        # initialisations
+        self.n_max = n_max
+        self.mem_max = mem_max
+        self.disk_max = disk_max
+        self.cache_dir = cache_dir
+        self.n_sp = OrderedDict()
+        self.n_sp_size = OrderedDict()
+
+        # other initialisations
+        self.n_hit = 0
+        self.n_miss = 0
+        self.n_disk = 0
+
+    def get_data(self, data, r_filt, i_expt, t_ofs=None, t_phase=None, t_bin=None):
+        '''
+
+        :param data:
+        :param r_filt:
+        :param i_expt:
+        :param t_ofs:
+        :param t_phase:
+        :param t_bin:
+        :return:
+        '''
+
+        # determines the memory/disk keys for the current dataset/filter/bin configuration
+        m_key, d_key = self.get_key(data, r_filt, i_expt, t_ofs, t_phase, t_bin)
+        if m_key in self.n_sp:
+            # if the spike counts have already been calculated, then move them to the end of the queue
+            self.n_hit += 1
+            self.n_sp.move_to_end(m_key)
+            self.n_sp_size.move_to_end(m_key)
+            return self.n_sp[m_key]
+
+        # attempts to load the spike counts from the disk cache (if a cache directory has been set)
+        n_sp, f_name = None, self.get_cache_file(d_key)
+        if (f_name is not None) and os.path.isfile(f_name):
             try:
-                lda.fit(n_sp_calc[is_keep, :], i_grp[is_keep])
+                n_sp = SpikeCountTensor.load(f_name)
+                self.n_disk += 1
             except:
-                if w_prog is not None:
-                    e_str = 'There was an error running the LDA analysis with the current solver parameters. ' \
-                            'Either choose a different solver or alter the solver parameters before retrying'
-                    w_prog.emit('LDA Analysis Error', 0.)
-                return None, None, False
+                n_sp = None
 
-            # resets the acceptance array
-            if is_OTO:
-                # calculates the model prediction from the remaining trial and increments the confusion matrix
-                for i in (xi_rmv + i_trial):
-                    lda_pred[i] = lda.predict(n_sp_calc[i, :].reshape(1, -1))
-                    p_mat[i, :] = lda.predict_proba(n_sp_calc[i, :].reshape(1, -1))
-                    c_mat[i_grp[i], lda_pred[i]] += 1
+            # updates the file modification time (the disk cache files are removed in least recently used order)
+            if n_sp is not None:
+                try:
+                    os.utime(f_name)
+                except OSError:
+                    pass
 
-                    # re-adds the removed trial
-                    is_keep[i] = True
+        if n_sp is None:
+            # otherwise, calculate the spike counts from the rotation filtered data object
+            self.n_miss += 1
+            data_tmp = reduce_cluster_data(data, i_expt)
+            r_obj = RotationFilteredData(data_tmp, r_filt, None, None, True, 'Whole Experiment', False,
+                                         t_ofs=t_ofs, t_phase=t_phase)
+
+            # only store the spike counts if the filtered data object was created successfully
+            n_sp = SpikeCountTensor(r_obj, t_bin)
+            if not r_obj.is_ok:
+                return n_sp
+
+            # outputs the spike counts to the disk cache (removing any files that exceed the disk size limit)
+            if f_name is not None:
+                try:
+                    n_sp.save(f_name)
+                    self.reduce_disk_cache()
+                except:
+                    pass
+
+        # stores the spike counts and removes any entries that exceed the count/memory limits
+        self.n_sp[m_key], self.n_sp_size[m_key] = n_sp, n_sp.calc_size()
+        self.reduce_cache()
+
+        # returns the spike count tensor object
+        return n_sp
+
+    def get_key(self, data, r_filt, i_expt, t_ofs, t_phase, t_bin):
+        '''
 
-            else:
-                # calculates the model prediction from the remaining trial and increments the confusion matrix
-                lda_pred[i_trial] = lda.predict(n_sp_calc[i_trial, :].reshape(1, -1))
-                p_mat[i_trial, :] = lda.predict_proba(n_sp_calc[i_trial, :].reshape(1, -1))
-                c_mat[i_grp[i_trial], lda_pred[i_trial]] += 1
+        :param data:
+        :param r_filt:
+        :param i_expt:
+        :param t_ofs:
+        :param t_phase:
+        :param t_bin:
+        :return:
+        '''
 
-                # re-adds the removed trial
-                is_keep[i_trial] = True
+        # sets the filter/bin configuration and the cell classification/cluster matching state (the signal/match type
+        # filters use these to determine which cells are kept)
+        c_para = [r_filt, list(i_expt), t_ofs, t_phase, None if t_bin is None else list(t_bin)]
+        f_state = self.get_filter_state(data)
 
-            # # fits the one-out-trial shuffled lda model
-            # ind_chance = np.random.permutation(len(i_grp) - 1)
-            # lda.fit(n_sp_calc[ii, :], i_grp[ii][ind_chance])
-            #
-            # # calculates the chance model prediction from the remaining trial and increments the confusion matrix
-            # lda_pred_chance[i_pred] = lda.predict(np.reshape(n_sp_calc[i_pred, :], (1, n_cell)))
-            # c_mat_chance[i_grp[i_pred], lda_pred_chance[i_pred]] += 1
+        # sets the loaded data version (the data object id and the current data update index)
+        data_ver = [id(data), id(data.cluster), getattr(data, 'data_ver', 0)]
 
+        # sets the data content signature (experiment files, cluster IDs and spike counts). this signature is
+        # independent of the current session, so it is used for the disk cache file names
+        c_data = data._cluster if cf.use_raw_clust(data) else data.cluster
+        data_sig = [cf.use_raw_clust(data)] + \
+                   [[c_data[i_ex]['expFile'], list(c_data[i_ex]['clustID']),
+                     [len(x) for x in c_data[i_ex]['tSpike']]] for i_ex in i_expt]
 
-        # calculates the LDA transform values (uses svd solver to accomplish this)
-        if lda_para['solver_type'] != 'lsqr':
-            # memory allocation
-            lda_X, lda_X0 = np.empty(n_grp, dtype=object), lda.fit(n_sp_calc, i_grp)
+        # returns the canonical hashes of the memory/disk keys
+        return cf.get_canonical_hash(c_para, f_state, data_ver), cf.get_canonical_hash(c_para, f_state, data_sig)
 
-            # calculates the variance explained
-            if len(lda_X0.explained_variance_ratio_) == 2:
-                lda_var_exp = np.round(100 * lda_X0.explained_variance_ratio_.sum(), 2)
-            else:
-                lda_var_sum = lda_X0.explained_variance_ratio_.sum()
-                lda_var_exp = np.round(100 * np.sum(lda_X0.explained_variance_ratio_[:2] / lda_var_sum), 2)
+    @staticmethod
+    def get_filter_state(data):
+        '''
 
-            # separates the transform values into the individual groups
-            lda_X0T = lda_X0.transform(n_sp_calc)
-            for ig in range(n_grp):
-                lda_X[ig] = lda_X0T[(ig * n_t):((ig + 1) * n_t), :2]
-        else:
-            # transform values are not possible with this solver type
-            lda_X, lda_var_exp = None, None
+        :param data:
+        :return:
+        '''
 
-        # returns the final values in a dictionary object
-        return {
-            'c_mat': c_mat, 'p_mat': p_mat, 'lda_pred': lda_pred,
-            'c_mat_chance': c_mat_chance, 'lda_pred_chance': lda_pred_chance,
-            'lda_X': lda_X, 'lda_var_exp': lda_var_exp, 'n_cell': n_cell
-        }, n_sp, True
+        # memory allocation
+        f_state = [None, None]
 
-    # initialisations
-    lda_para = calc_para['lda_para']
-    t_ofs, t_phase = get_rot_phase_offsets(calc_para)
+        # sets the cell classification groups (if the cells have been classified)
+        if hasattr(data, 'classify') and getattr(data.classify, 'class_set', False):
+            f_state[0] = getattr(data.classify, 'grp_str', None)
 
-    # creates a reduce data object and creates the rotation filter object
-    data_tmp = reduce_cluster_data(data, i_expt)
-    r_obj = RotationFilteredData(data_tmp, r_filt, None, None, True, 'Whole Experiment', False,
-                                 t_ofs=t_ofs, t_phase=t_phase)
+        # sets the fixed/free cluster match acceptance flags (if the clusters have been matched)
+        if hasattr(data, 'comp') and getattr(data.comp, 'is_set', False):
+            f_state[1] = [[getattr(x, 'fix_name', None), getattr(x, 'is_accept', None)] for x in data.comp.data]
 
-    # memory allocation and other initialisations
-    A = np.empty(r_obj.n_expt, dtype=object)
-    lda, exp_name, n_sp = dcopy(A), dcopy(A), dcopy(A)
-    n_ex = len(i_expt)
+        # returns the filter state
+        return f_state
 
-    # memory allocation for accuracy binary mask calculations
-    n_c = len(r_filt['t_type'])
-    BG, BD = np.zeros((2 * n_c, 2 * n_c), dtype=bool), np.zeros((2, 2 * n_c), dtype=bool)
-    y_acc = np.zeros((n_ex, 1 + n_c), dtype=float)
+    def get_cache_file(self, d_key):
+        '''
 
-    # sets up the binary masks for the group/direction types
-    for i_c in range(n_c):
-        BG[(2 * i_c):(2 * (i_c + 1)), (2 * i_c):(2 * (i_c + 1))] = True
-        BD[0, 2 * i_c], BD[1, 2 * i_c + 1] = True, True
+        :param d_key:
+        :return:
+        '''
 
-    # sets the experiment file names
-    f_name0 = [os.path.splitext(os.path.basename(x['expFile']))[0] for x in data_tmp.cluster]
+        # if there is no cache directory, then exit
+        if self.cache_dir is None:
+            return None
 
-    # loops through each of the experiments performing the lda calculations
-    for i_ex in range(n_ex):
-        exp_name[i_ex] = f_name0[i_ex]
-        lda[i_ex], n_sp[i_ex], ok = run_lda_predictions(w_prog, r_obj, lda_para, n_sp0, i_cell[i_ex],
-                                                        i_ex, is_shuffle, pW0, pW)
-        if not ok:
-            # if there was an error, then exit with a false flag
+        # creates the cache directory (if it doesn't exist)
+        if not os.path.isdir(self.cache_dir):
+            try:
+                os.makedirs(self.cache_dir)
+            except OSError:
+                return None
+
+        # returns the cache file name
+        return os.path.join(self.cache_dir, '{0}.npz'.format(d_key))
+
+    def set_cache_dir(self, cache_dir):
+        '''
+
+        :param cache_dir:
+        :return:
+        '''
+
+        self.cache_dir = cache_dir
+
+    def reduce_cache(self):
+        '''
+
+        :return:
+        '''
+
+        # removes the least recently used tensors until the object count/memory size is within the limits
+        while len(self.n_sp) and ((len(self.n_sp) > self.n_max) or (self.get_cache_size() > self.mem_max)):
+            m_key = next(iter(self.n_sp))
+            self.n_sp.pop(m_key)
+            self.n_sp_size.pop(m_key)
+
+    def reduce_disk_cache(self):
+        '''
+
+        :return:
+        '''
+
+        # retrieves the modification time and size of each disk cache file
+        f_info = []
+        for f_name in self.get_cache_files():
+            try:
+                f_stat = os.stat(f_name)
+                f_info.append((f_stat.st_mtime, f_stat.st_size, f_name))
+            except OSError:
+                pass
+
+        # removes the least recently used files until the disk cache is within the size limit
+        n_byte = sum([x[1] for x in f_info])
+        for _, f_size, f_name in sorted(f_info):
+            if n_byte <= self.disk_max * 2 ** 20:
+                break
+
+            try:
+                os.remove(f_name)
+                n_byte -= f_size
+            except OSError:
+                pass
+
+    def clear(self, clear_disk=False):
+        '''
+
+        :param clear_disk:
+        :return:
+        '''
+
+        # clears all the stored spike count tensors
+        self.n_sp.clear()
+        self.n_sp_size.clear()
+
+        # removes the disk cache files (if required)
+        if clear_disk and (self.cache_dir is not None) and os.path.isdir(self.cache_dir):
+            for f_name in self.get_cache_files():
+                try:
+                    os.remove(f_name)
+                except OSError:
+                    pass
+
+    def get_cache_files(self):
+        '''
+
+        :return:
+        '''
+
+        # returns the spike count cache files
+        if (self.cache_dir is None) or (not os.path.isdir(self.cache_dir)):
+            return []
+        else:
+            return [os.path.join(self.cache_dir, x) for x in os.listdir(self.cache_dir) if x.endswith('.npz')]
+
+    def get_cache_size(self):
+        '''
+
+        :return:
+        '''
+
+        # returns the total size of the stored spike count tensors (in MB)
+        return sum(self.n_sp_size.values())
+
+    def get_disk_cache_size(self):
+        '''
+
+        :return:
+        '''
+
+        # returns the total size of the disk cache files (in MB)
+        return sum([os.path.getsize(x) for x in self.get_cache_files()]) / 2 ** 20
+
+
+def calc_spike_count_tensor(t_spike, t_bin=None):
+    '''
+
+    :param t_spike:
+    :param t_bin:
+    :return:
+    '''
+
+    # calculates the spike counts for each cell/trial/phase (missing trials are given a count of -1)
+    n_sp = np.fromiter(map(lambda x: -1 if x is None else len(x), t_spike.flat), dtype=int, count=t_spike.size)
+    if t_bin is None:
+        return n_sp.reshape(t_spike.shape)
+
+    # determines the time bin index of each spike (the last bin includes the right edge, as with np.histogram)
+    t_bin, n_bin = np.array(t_bin, dtype=float), len(t_bin) - 1
+    t_sp = np.concatenate([np.array(x, dtype=float).ravel() for x in t_spike.flat if x is not None] + [np.empty(0)])
+    i_bin = np.searchsorted(t_bin, t_sp, side='right') - 1
+    i_bin[t_sp == t_bin[-1]] = n_bin - 1
+
+    # calculates the spike counts within each time bin
+    i_seg, is_ok = np.repeat(np.arange(t_spike.size), np.maximum(n_sp, 0)), np.logical_and(i_bin >= 0, i_bin < n_bin)
+    n_sp_bin = np.bincount(i_seg[is_ok] * n_bin + i_bin[is_ok], minlength=t_spike.size * n_bin).reshape(-1, n_bin)
+    n_sp_bin[n_sp < 0, :] = -1
+
+    # returns the binned spike count array
+    return n_sp_bin.reshape(t_spike.shape + (n_bin,))
+
+
+def calc_window_bin_edges(t_win):
+    '''
+
+    :param t_win:
+    :return:
+    '''
+
+    # sets the lower/upper edges of each analysis window. the windows include both end points, so the upper edges are
+    # the next floating point values above the window ends (the final edge ensures all the window bins are half-open)
+    t_edge = [x[0] for x in t_win] + [np.nextafter(x[0] + x[1], np.inf) for x in t_win]
+    return np.append(np.unique(np.array(t_edge, dtype=float)), np.inf)
+
+
+def get_phase_spike_counts(n_sp, t_type, ind_c, n_t):
+    '''
+
+    :param n_sp:
+    :param t_type:
+    :param ind_c:
+    :param n_t:
+    :return:
+    '''
+
+    # sets the phase order (motordrifting experiments have the phases swapped)
+    i_phs = [2, 1] if (t_type == 'MotorDrifting') else [1, 2]
+
+    # retrieves the cell/trial spike counts (missing trials have a count of -1)
+    n_sp_c = n_sp[ind_c, :n_t, :]
+    if np.any(n_sp_c[:, :, i_phs] < 0):
+        raise ValueError('The selected cells have fewer than {0} trials for the "{1}" trial type'.format(n_t, t_type))
+
+    # returns the concatenated cell/trial spike counts for the two phases
+    return np.hstack((n_sp_c[:, :, i_phs[0]], n_sp_c[:, :, i_phs[1]]))
+
+
+def get_spike_count_tensor(data, r_filt, i_expt, t_ofs=None, t_phase=None, t_bin=None):
+    '''
+
+    :param data:
+    :param r_filt:
+    :param i_expt:
+    :param t_ofs:
+    :param t_phase:
+    :param t_bin:
+    :return:
+    '''
+
+    # retrieves the spike count tensors from the cache (calculates them if not already stored)
+    return sp_count_cache.get_data(data, r_filt, i_expt, t_ofs, t_phase, t_bin)
+
+
+def clear_spike_count_cache(clear_disk=False):
+    '''
+
+    :param clear_disk:
+    :return:
+    '''
+
+    # clears the spike count tensor cache
+    sp_count_cache.clear(clear_disk)
+
+
+def get_spike_count_cache_size():
+    '''
+
+    :return:
+    '''
+
+    # returns the cache statistics
+    return {
+        'n_tensor': len(sp_count_cache.n_sp), 'mem_size': sp_count_cache.get_cache_size(),
+        'disk_size': sp_count_cache.get_disk_cache_size(), 'n_hit': sp_count_cache.n_hit,
+        'n_miss': sp_count_cache.n_miss, 'n_disk': sp_count_cache.n_disk,
+    }
+
+
+# the spike count tensor cache
+sp_count_cache = SpikeCountCache()
+
+
+######################################
+####    ROTATION LDA FUNCTIONS    ####
+######################################
+
+
+def setup_lda_spike_counts(r_obj, i_cell, i_ex, n_t, return_all=True):
+    '''
+
+    :param r_obj:
+    :param i_cell:
+    :param i_ex:
+    :param n_t:
+    :return:
+    '''
+
+    # memory allocation
+    n_sp, t_sp, i_grp = [], [], []
+    ind_c = [np.where(i_expt == i_ex)[0][i_cell] for i_expt in r_obj.i_expt]
+    n_cell, ind_t = len(ind_c[0]), np.array(range(n_t))
+
+    # sets up the LDA data/group index arrays across each condition
+    for i_filt in range(r_obj.n_filt):
+        if isinstance(r_obj, SpikeCountTensor):
+            # case is the spike counts have already been calculated (spike times are not retained)
+            t_type = r_obj.rot_filt['t_type'][i_filt]
+            n_sp.append(get_phase_spike_counts(r_obj.n_sp[i_filt], t_type, ind_c[i_filt], n_t))
+            t_sp.append(None)
+
+        else:
+            # retrieves the time spikes for the current filter/experiment, and then combines into a single
+            # concatenated array. calculates the final spike counts over each cell/trial and appends to the
+            # overall spike count array
+            A = dcopy(r_obj.t_spike[i_filt][ind_c[i_filt], :, :])[:, ind_t, :]
+            if r_obj.rot_filt['t_type'][i_filt] == 'MotorDrifting':
+                # case is motordrifting (swap phases)
+                t_sp_tmp = np.hstack((A[:, :, 2], A[:, :, 1]))
+            else:
+                # case is other experiment conditions
+                t_sp_tmp = np.hstack((A[:, :, 1], A[:, :, 2]))
+
+            # calculates the spike counts and appends them to the count array
+            n_sp.append(np.vstack([np.array([len(y) for y in x]) for x in t_sp_tmp]))
+            t_sp.append(t_sp_tmp)
+
+        # sets the grouping indices
+        ind_g = [2 * i_filt, 2 * i_filt + 1]
+        i_grp.append(np.hstack((ind_g[0] * np.ones(n_t), ind_g[1] * np.ones(n_t))).astype(int))
+
+    # combines the spike counts/group indices into the final combined arrays
+    n_sp, i_grp = np.hstack(n_sp).T, np.hstack(i_grp)
+
+    # returns the important arrays
+    if return_all:
+        return n_sp, t_sp, i_grp, n_cell
+    else:
+        return n_sp, i_grp
+
+
+def norm_spike_counts(n_sp, N, is_norm):
+    '''
+
+    :param n_sp:
+    :return:
+    '''
+
+    # makes a copy of the spike count array
+    n_sp_calc = dcopy(n_sp)
+
+    # normalises the spike counts (if required)
+    if is_norm:
+        n_sp_mn, n_sp_sd = np.mean(n_sp_calc, axis=0), np.std(n_sp_calc, axis=0)
+        n_sp_calc = np.divide(n_sp_calc - repmat(n_sp_mn, N, 1), repmat(n_sp_sd, N, 1))
+
+        # any cells where the std. deviation is zero are set to zero (to remove any NaNs)
+        n_sp_calc[:, n_sp_sd == 0] = 0
+
+    # returns the final values
+    return n_sp_calc
+
+
+def run_rot_lda(data, calc_para, r_filt, i_expt, i_cell, n_trial_max, d_data=None, is_shuffle=False, w_prog=None,
+                pW0=0., pW=100., n_sp0=None, seed=None, r_obj=None):
+    '''
+
+    :param data:
+    :param calc_para:
+    :param r_filt:
+    :param i_expt:
+    :param i_cell:
+    :param n_trial_max:
+    :param d_data:
+    :param is_shuffle:
+    :param seed:
+    :param r_obj:
+    :return:
+    '''
+
+    def run_lda_predictions(w_prog, r_obj, lda_para, n_sp, i_cell, i_ex, is_shuffle, pW0, pW, r_state=None):
+        '''
+
+        :param r_obj:
+        :param cell_ok:
+        :param n_trial_max:
+        :param i_ex:
+        :return:
+        '''
+
+        # memory allocation and initialisations
+        is_OTO = get_glob_para('lda_trial_type') == 'One-Trial Out'
+        n_t, n_grp, N = n_trial_max, 2 * r_obj.n_filt, 2 * r_obj.n_filt * n_trial_max
+        pWS = 1 / r_obj.n_expt
+
+        ####################################
+        ####    LDA DATA ARRAY SETUP    ####
+        ####################################
+
+        if n_sp is None:
+            # case is the spike counts haven't been provided
+            n_sp, t_sp, i_grp, n_cell = setup_lda_spike_counts(r_obj, i_cell, i_ex, n_trial_max)
+
+        else:
+            # case is the spike counts have been provided
+
+            # retrieves the cell count and group indices
+            n_cell = np.size(n_sp, axis=1)
+            i_grp = np.array(cf.flat_list([list(x * np.ones(n_trial_max, dtype=int)) for x in range(n_grp)]))
+
+        # shuffles the trials (if required)
+        if is_shuffle:
+            n_sp = shuffle_trial_counts(n_sp, n_trial_max, r_state)
+
+        # normalises the spike count array (if required)
+        n_sp_calc = norm_spike_counts(n_sp, N, lda_para['is_norm'])
+
+        ###########################################
+        ####    LDA PREDICTION CALCULATIONS    ####
+        ###########################################
+
+        # sets the LDA solver type
+        lda = setup_lda_solver(lda_para)
+
+        # memory allocation
+        lda_pred_chance, c_mat_chance = np.zeros(N, dtype=int), np.zeros((n_grp, n_grp), dtype=int)
+
+        # fits the one-out-trial lda models and calculates the prediction for each removed trial
+        w_str = 'Running LDA Predictions (Expt {0} of {1})'.format(i_ex + 1, r_obj.n_expt)
+        lda_res = run_lda_loo_predictions(lda, n_sp_calc, i_grp, n_t, is_OTO, w_prog, w_str,
+                                          [pW0 + pW * pWS * i_ex, pW * pWS])
+        if lda_res is None:
+            if w_prog is not None:
+                e_str = 'There was an error running the LDA analysis with the current solver parameters. ' \
+                        'Either choose a different solver or alter the solver parameters before retrying'
+                w_prog.emit('LDA Analysis Error', 0.)
+            return None, None, False
+        else:
+            lda_pred, p_mat, c_mat = lda_res
+
+        # calculates the LDA transform values (uses svd solver to accomplish this)
+        if lda_para['solver_type'] != 'lsqr':
+            # memory allocation
+            lda_X, lda_X0 = np.empty(n_grp, dtype=object), lda.fit(n_sp_calc, i_grp)
+
+            # calculates the variance explained
+            if len(lda_X0.explained_variance_ratio_) == 2:
+                lda_var_exp = np.round(100 * lda_X0.explained_variance_ratio_.sum(), 2)
+            else:
+                lda_var_sum = lda_X0.explained_variance_ratio_.sum()
+                lda_var_exp = np.round(100 * np.sum(lda_X0.explained_variance_ratio_[:2] / lda_var_sum), 2)
+
+            # separates the transform values into the individual groups
+            lda_X0T = lda_X0.transform(n_sp_calc)
+            for ig in range(n_grp):
+                lda_X[ig] = lda_X0T[(ig * n_t):((ig + 1) * n_t), :2]
+        else:
+            # transform values are not possible with this solver type
+            lda_X, lda_var_exp = None, None
+
+        # returns the final values in a dictionary object
+        return {
+            'c_mat': c_mat, 'p_mat': p_mat, 'lda_pred': lda_pred,
+            'c_mat_chance': c_mat_chance, 'lda_pred_chance': lda_pred_chance,
+            'lda_X': lda_X, 'lda_var_exp': lda_var_exp, 'n_cell': n_cell
+        }, n_sp, True
+
+    # initialisations
+    lda_para = calc_para['lda_para']
+    t_ofs, t_phase = get_rot_phase_offsets(calc_para)
+
+    # retrieves the spike count tensors for the filter configuration (only calculated if not already cached)
+    if r_obj is None:
+        r_obj = get_spike_count_tensor(data, r_filt, i_expt, t_ofs, t_phase)
+
+    # memory allocation and other initialisations
+    A = np.empty(r_obj.n_expt, dtype=object)
+    lda, exp_name, n_sp = dcopy(A), dcopy(A), dcopy(A)
+    n_ex = len(i_expt)
+
+    # memory allocation for accuracy calculations
+    n_c = len(r_filt['t_type'])
+    y_acc = np.zeros((n_ex, 1 + n_c), dtype=float)
+
+    # sets the experiment file names
+    f_name0 = [os.path.splitext(os.path.basename(data.cluster[i_ex]['expFile']))[0] for i_ex in i_expt]
+
+    # sets up the random state (shuffled runs with the same seed give identical results)
+    r_state = cf.setup_random_state(seed) if is_shuffle else None
+
+    # loops through each of the experiments performing the lda calculations
+    for i_ex in range(n_ex):
+        exp_name[i_ex] = f_name0[i_ex]
+        lda[i_ex], n_sp[i_ex], ok = run_lda_predictions(w_prog, r_obj, lda_para, n_sp0, i_cell[i_ex],
+                                                        i_ex, is_shuffle, pW0, pW, r_state)
+        if not ok:
+            # if there was an error, then exit with a false flag
             return False
 
-        # calculates the grouping accuracy values
-        c_mat = lda[i_ex]['c_mat'] / n_trial_max
-        y_acc[i_ex, 0] += np.sum(np.multiply(BG, c_mat)) / (2 * n_c)
+        # calculates the grouping/direction accuracy values
+        y_acc[i_ex, :] = calc_lda_accuracy(lda[i_ex]['c_mat'], n_trial_max, n_c)
+
+    if d_data is not None:
+        # sets the lda values
+        d_data.lda = lda
+        d_data.i_expt = i_expt
+        d_data.i_cell = i_cell
+        d_data.y_acc = y_acc
+        d_data.exp_name = exp_name
+        d_data.lda_trial_type = get_glob_para('lda_trial_type')
+
+        # sets the solver parameters
+        set_lda_para(d_data, lda_para, r_filt, n_trial_max)
+
+        # sets the phase duration/offset parameters
+        d_data.tofs = t_ofs
+        d_data.tphase = t_phase
+        d_data.usefull = calc_para['use_full_rot']
+
+        # updates the progress bar (if provided)
+        if w_prog is not None:
+            w_prog.emit('Calculating Pairwise Correlations...', pW0 + 0.99 * pW)
+
+        # calculates the noise correlation (if required)
+        calc_noise_correl(d_data, n_sp)
+
+        # returns a true value
+        return True
+
+    elif is_shuffle:
+        # otherwise, return the calculated values
+        return [lda, y_acc, exp_name, n_sp]
+
+    else:
+        # otherwise, return the calculated values
+        return [lda, y_acc, exp_name]
+
+
+def shuffle_trial_counts(n_sp, n_t, seed=None):
+    '''
+
+    :param n_sp:
+    :param n_t:
+    :param seed:
+    :return:
+    '''
+
+    # initialisation
+    n_cell = np.size(n_sp, axis=1)
+    n_cond = int(np.size(n_sp, axis=0) / (2 * n_t))
+    r_state = cf.setup_random_state(seed)
+
+    # sets the stratified permutation index array (for all cells/conditions). this ensures the following:
+    #  * CW/CCW trials are shuffled the same between conditions
+    #  * Trials are shuffled independently between conditions and cells
+    ind_perm = np.argsort(r_state.rand(n_cell, n_cond, n_t), axis=2)
+    ind_ofs = (2 * n_t * np.arange(n_cond)).reshape(1, -1, 1, 1) + np.array([0, n_t]).reshape(1, 1, -1, 1)
+    ind_c = (ind_perm[:, :, None, :] + ind_ofs).reshape(n_cell, -1).T
+
+    # returns the shuffled spike count array
+    return np.take_along_axis(np.asarray(n_sp), ind_c, axis=0)
+
+
+def setup_lda_loo_engine(lda, n_sp_calc, i_grp, cell_mask=None, tol_eig=1e-6):
+    '''
+
+    :param lda:
+    :param n_sp_calc:
+    :param i_grp:
+    :param cell_mask:
+    :param tol_eig:
+    :return:
+    '''
+
+    # retrieves the solver parameters (any non-standard solver setups are left to the full refit)
+    lda_p = lda.get_params()
+    if (lda_p['solver'] not in ['svd', 'lsqr', 'eigen']) or (lda_p['shrinkage'] not in [None, 'auto']) or \
+                                (lda_p['priors'] is not None) or (lda_p.get('covariance_estimator') is not None):
+        return None
+
+    # initialisations
+    X = np.array(n_sp_calc, dtype=float)
+    (N, n_f), n_grp = X.shape, np.max(i_grp) + 1
+    n_k = np.bincount(i_grp, minlength=n_grp)
+
+    # each group must still have at least one trial once a trial has been removed
+    if (n_grp < 2) or np.any(n_k < 2):
+        return None
+
+    # calculates the group means
+    mu = np.array([np.mean(X[i_grp == i_g, :], axis=0) for i_g in range(n_grp)])
+
+    if lda_p['shrinkage'] == 'auto':
+        # case is the Ledoit-Wolf shrinkage. the shrinkage intensity is not rank-one updatable (nor separable over
+        # the cell subsets), so only the group covariance matrices of the full dataset are stored (these are reused
+        # for groups with no removed trials)
+        if cell_mask is not None:
+            return None
+
+        return {
+            'X': X, 'i_grp': np.array(i_grp), 'n_k': n_k, 'n_grp': n_grp, 'N': N, 'mu': mu, 'shrinkage': True,
+            'S_k': np.array([calc_ledoit_wolf_cov(X[i_grp == i_g, :]) for i_g in range(n_grp)]),
+        }
+
+    # sets the cell subset masks (the full cell set is used if not provided)
+    if cell_mask is None:
+        cell_mask = np.ones((1, n_f), dtype=bool)
+    else:
+        cell_mask = np.array(cell_mask, dtype=bool).reshape(-1, n_f)
+
+    # calculates the within-group scatter matrix
+    X_c = X - mu[i_grp, :]
+    W = np.dot(X_c.T, X_c)
+
+    # removes any zero within-group variance cells from the subsets. the svd/lsqr solvers give these cells zero weight
+    # (through the rank truncation/minimum norm solution), whereas the eigen solver is unable to solve the system
+    w_sd = np.sqrt(np.diag(W))
+    if lda_p['solver'] == 'eigen':
+        is_ok = ~np.any(np.logical_and(cell_mask, w_sd[None, :] == 0), axis=1)
+    else:
+        cell_mask = np.logical_and(cell_mask, w_sd[None, :] > 0)
+        is_ok = np.any(cell_mask, axis=1)
+
+    # sets the scatter matrix sub-blocks for each cell subset. the cells outside of each subset are replaced by an
+    # identity block (with zero data values) so that all subsets can be stacked into a single batched array
+    is_blk = np.logical_and(cell_mask[:, :, None], cell_mask[:, None, :])
+    W_blk = np.where(is_blk, W[None, :, :], np.eye(n_f)[None, :, :])
+
+    # determines the minimum eigenvalue of the within-group correlation matrix (the engine is only used for subsets
+    # where the scatter matrix is well conditioned, otherwise the sklearn rank truncation would alter the solution)
+    w_sd[w_sd == 0] = 1.
+    eig_min = np.linalg.eigvalsh(np.where(is_blk, W / np.outer(w_sd, w_sd), W_blk))[:, 0]
+    is_ok = np.logical_and(is_ok, eig_min >= tol_eig)
+    W_blk[~is_ok] = np.eye(n_f)
+
+    # calculates the inverse scatter gram matrix for the group means and all trials
+    Z = np.vstack((mu, X))[None, :, :] * cell_mask[:, None, :]
+    Q = np.matmul(Z, np.linalg.solve(W_blk, np.swapaxes(Z, 1, 2)))
+
+    # returns the engine parameters in a dictionary object
+    return {
+        'Q': Q, 'i_grp': np.array(i_grp), 'n_k': n_k, 'n_grp': n_grp, 'N': N, 'shrinkage': False, 'is_ok': is_ok,
+        'solver': lda_p['solver'], 'tol': lda_p['tol'], 'eig_min': eig_min, 'tol_eig': tol_eig,
+    }
+
+
+def calc_ledoit_wolf_cov(X):
+    '''
+
+    :param X:
+    :return:
+    '''
+
+    # standardises the data values (zero variance features are left unscaled)
+    (n, n_f), X_sd = X.shape, np.std(X, axis=0)
+    X_sd[X_sd < 10 * np.finfo(float).eps] = 1.
+    X = (X - np.mean(X, axis=0)) / X_sd
+
+    # calculates the empirical covariance
+    S = np.dot(X.T, X) / n
+    if n_f == 1:
+        return S * X_sd ** 2
+
+    # calculates the Ledoit-Wolf shrinkage intensity
+    X2 = X ** 2
+    tr_S = np.sum(X2) / n
+    mu_S = tr_S / n_f
+    delta_ = np.sum(S ** 2)
+    beta = (np.sum(np.dot(X2.T, X2)) / n - delta_) / (n_f * n)
+    delta = (delta_ - 2. * mu_S * tr_S + n_f * mu_S ** 2) / n_f
+    p_shr = 0. if (min(beta, delta) == 0) else min(beta, delta) / delta
+
+    # calculates the shrunk covariance matrix (rescaled to the original feature scales)
+    S = (1. - p_shr) * S
+    S[np.diag_indices(n_f)] += p_shr * mu_S
+    return X_sd[:, None] * S * X_sd[None, :]
+
+
+def calc_lda_loo_decision(loo, i_rmv):
+    '''
+
+    :param loo:
+    :param i_rmv:
+    :return:
+    '''
+
+    # initialisations
+    n_grp, n_k, i_grp = loo['n_grp'], loo['n_k'], loo['i_grp']
+    k_r, m = i_grp[i_rmv], len(i_rmv)
+    if len(np.unique(k_r)) < m:
+        return None, None
+
+    # sets the group counts/priors of the reduced training set
+    n_k1 = dcopy(n_k)
+    n_k1[k_r] -= 1
+    N1 = loo['N'] - m
+    pr = n_k1 / N1
+
+    if loo['shrinkage']:
+        # case is the Ledoit-Wolf shrinkage (recalculates the covariance of the groups with removed trials)
+        X, mu, S_k = loo['X'], dcopy(loo['mu']), dcopy(loo['S_k'])
+        for i, k in zip(i_rmv, k_r):
+            X_k = X[np.logical_and(i_grp == k, np.arange(loo['N']) != i), :]
+            mu[k, :], S_k[k] = np.mean(X_k, axis=0), calc_ledoit_wolf_cov(X_k)
+
+        # calculates the decision function values from the prior weighted covariance
+        try:
+            coef = np.linalg.solve(np.tensordot(pr, S_k, axes=1), mu.T).T
+        except np.linalg.LinAlgError:
+            return None, None
+
+        lda_dec = np.dot(X[i_rmv, :], coef.T) - 0.5 * np.sum(mu * coef, axis=1) + np.log(pr)
+        return lda_dec[None, :, :], np.ones(1, dtype=bool)
+
+    # restricts the gram matrices to the group means and the removed trials
+    i_s = np.concatenate((np.arange(n_grp), n_grp + np.array(i_rmv)))
+    Q_s, i_m, c_r = loo['Q'][:, i_s[:, None], i_s[None, :]], n_grp + np.arange(m), n_k[k_r] / (n_k[k_r] - 1)
+
+    # sets the reduced group mean, removed trial and scatter downdate vector coefficients
+    A_mu, E_t, E_d = np.eye(n_grp + m, n_grp), np.zeros((n_grp + m, m)), np.zeros((n_grp + m, m))
+    A_mu[k_r, k_r], A_mu[i_m, k_r] = c_r, -1. / (n_k[k_r] - 1)
+    E_t[i_m, np.arange(m)] = 1.
+    E_d[i_m, np.arange(m)], E_d[k_r, np.arange(m)] = 1., -1.
+
+    # applies the rank-m scatter downdate to the gram matrices (Woodbury identity)
+    QE = np.matmul(Q_s, E_d)
+    M = np.diag(1. / c_r)[None, :, :] - np.matmul(E_d.T, QE)
+
+    # flags the subsets where the downdated scatter matrix is (close to) singular (these require the full refit). the
+    # determinant ratio of the downdate is a lower bound on the reduction of the minimum eigenvalue
+    det_ratio = np.prod(c_r) * np.linalg.det(M)
+    is_ok = np.logical_and(loo['is_ok'], (det_ratio * loo['eig_min']) >= loo['tol_eig'])
+    M[~is_ok] = np.eye(m)
+
+    Q_d = Q_s + np.matmul(QE, np.linalg.solve(M, np.swapaxes(QE, 1, 2)))
+    F = np.hstack((A_mu, E_t))
+    G = N1 * np.matmul(F.T, np.matmul(Q_d, F))
+    G_mm, G_mt = G[:, :n_grp, :n_grp], G[:, :n_grp, n_grp:]
+
+    if loo['solver'] == 'svd':
+        # case is the svd solver (projection onto the between-group subspace)
+        P = np.eye(n_grp) - pr[None, :]
+        G_c = np.matmul(P, np.matmul(G_mm, P.T))
+        h = np.matmul(P, G_mt - np.matmul(G_mm, pr)[:, :, None])
+
+        # calculates the between-group scaling decomposition
+        d = np.sqrt(N1 * pr / (n_grp - 1))
+        s2, U = np.linalg.eigh(d[None, :, None] * G_c * d[None, None, :])
+        s2, U = s2[:, ::-1], U[:, :, ::-1]
+        s = np.sqrt(np.maximum(s2, 0.))
+
+        # sets the reduced rank projection (the truncated components are zeroed)
+        is_r = s > loo['tol'] * s[:, :1]
+        s_r = np.where(is_r, s, 1.)
+        coef = U * (s * is_r)[:, None, :] / d[None, :, None]
+
+        # calculates the decision function values
+        X_p = np.matmul(np.swapaxes(h, 1, 2) * d[None, None, :], U) * (is_r / s_r)[:, None, :]
+        lda_dec = np.matmul(X_p, np.swapaxes(coef, 1, 2)) - 0.5 * np.sum(coef ** 2, axis=2)[:, None, :] + np.log(pr)
+
+    else:
+        # case is the lsqr/eigen solvers (full rank within-group covariance)
+        lda_dec = np.swapaxes(G_mt, 1, 2) - 0.5 * np.diagonal(G_mm, axis1=1, axis2=2)[:, None, :] + np.log(pr)
+
+    # returns the decision function values and the subset acceptance flags
+    return lda_dec, is_ok
+
+
+def run_lda_loo_predictions(lda, n_sp_calc, i_grp, n_t, is_OTO, w_prog=None, w_str=None, pw=None, use_fast=True):
+    '''
+
+    :param lda:
+    :param n_sp_calc:
+    :param i_grp:
+    :param n_t:
+    :param is_OTO:
+    :param w_prog:
+    :param w_str:
+    :param pw:
+    :param use_fast:
+    :return:
+    '''
+
+    # memory allocation
+    N, n_grp = len(i_grp), np.max(i_grp) + 1
+    lda_pred, c_mat = np.zeros(N, dtype=int), np.zeros((n_grp, n_grp), dtype=int)
+    p_mat, is_keep = np.zeros((N, n_grp), dtype=float), np.ones(N, dtype=bool)
+
+    # sets the total number of iterations (based on trial setup type)
+    if is_OTO:
+        # case is "one-trial out" setup
+        NN, xi_rmv = n_t, np.arange(0, N, n_t)
+    else:
+        # case is "one-phase out" setup
+        NN = N
+
+    # sets up the closed-form leave-one-out engine (returns None if the solver setup requires the full refit)
+    lda_loo = setup_lda_loo_engine(lda, n_sp_calc, i_grp) if use_fast else None
+    if (lda_loo is not None) and (not lda_loo['shrinkage']) and (not lda_loo['is_ok'][0]):
+        lda_loo = None
+
+    # fits the LDA model and calculates the prediction for each
+    for i_trial in range(NN):
+        # updates the progress bar
+        if w_prog is not None:
+            w_prog.emit(w_str, pw[0] + pw[1] * (i_trial / NN))
+
+        # sets the removed trial indices
+        i_rmv = (xi_rmv + i_trial) if is_OTO else np.array([i_trial])
+
+        # calculates the decision values from the downdated full model (if possible)
+        lda_dec, is_ok = (None, None) if (lda_loo is None) else calc_lda_loo_decision(lda_loo, i_rmv)
+        if (lda_dec is not None) and is_ok[0]:
+            lda_dec = lda_dec[0]
+
+            # calculates the model prediction/probabilities from the decision values
+            p_dec = np.exp(lda_dec - np.max(lda_dec, axis=1)[:, None])
+            lda_pred[i_rmv], p_mat[i_rmv, :] = np.argmax(lda_dec, axis=1), p_dec / np.sum(p_dec, axis=1)[:, None]
+
+            # increments the confusion matrix
+            for i in i_rmv:
+                c_mat[i_grp[i], lda_pred[i]] += 1
+
+            # continues to the next iteration
+            continue
+
+        # fits the one-out-trial lda model
+        is_keep[i_rmv] = False
+        try:
+            lda.fit(n_sp_calc[is_keep, :], i_grp[is_keep])
+        except:
+            return None
+
+        # calculates the model prediction from the removed trials and increments the confusion matrix
+        for i in i_rmv:
+            lda_pred[i] = lda.predict(n_sp_calc[i, :].reshape(1, -1))
+            p_mat[i, :] = lda.predict_proba(n_sp_calc[i, :].reshape(1, -1))
+            c_mat[i_grp[i], lda_pred[i]] += 1
+
+        # re-adds the removed trials
+        is_keep[i_rmv] = True
+
+    # returns the prediction, probability and confusion matrix arrays
+    return lda_pred, p_mat, c_mat
+
+
+def run_batch_lda_loo_predictions(lda, n_sp_calc, i_grp, n_t, is_OTO, cell_mask, mem_max=64):
+    '''
+
+    :param lda:
+    :param n_sp_calc:
+    :param i_grp:
+    :param n_t:
+    :param is_OTO:
+    :param cell_mask:
+    :param mem_max:
+    :return:
+    '''
+
+    # initialisations
+    cell_mask = np.array(cell_mask, dtype=bool)
+    (N, n_f), n_grp, n_sub = np.shape(n_sp_calc), np.max(i_grp) + 1, np.size(cell_mask, axis=0)
+
+    # memory allocation
+    c_mat, is_ok = np.zeros((n_sub, n_grp, n_grp), dtype=int), np.ones(n_sub, dtype=bool)
+    is_fast = np.zeros(n_sub, dtype=bool)
+
+    # sets the removed trial indices for each iteration (based on trial setup type)
+    if is_OTO:
+        # case is "one-trial out" setup
+        i_rmv_t = [np.arange(0, N, n_t) + i_trial for i_trial in range(n_t)]
+    else:
+        # case is "one-phase out" setup
+        i_rmv_t = [np.array([i_trial]) for i_trial in range(N)]
+
+    # runs the closed-form engine over the cell subsets (in blocks to limit the memory footprint)
+    n_blk = max(1, int(mem_max * 2 ** 20 / (8 * (3 * n_f ** 2 + 2 * (N + n_grp) ** 2))))
+    for i0 in range(0, n_sub, n_blk):
+        # sets up the engine for the current subset block (exits if the solver setup requires the full refit)
+        i_blk = np.arange(i0, min(i0 + n_blk, n_sub))
+        lda_loo = setup_lda_loo_engine(lda, n_sp_calc, i_grp, cell_mask=cell_mask[i_blk, :])
+        if lda_loo is None:
+            break
+
+        # calculates the decision values for each removed trial set
+        is_fast_blk = dcopy(lda_loo['is_ok'])
+        for i_rmv in i_rmv_t:
+            lda_dec, is_ok_rmv = calc_lda_loo_decision(lda_loo, i_rmv)
+            if lda_dec is None:
+                is_fast_blk[:] = False
+                break
+
+            # increments the confusion matrices
+            np.add.at(c_mat, (i_blk[:, None], i_grp[i_rmv][None, :], np.argmax(lda_dec, axis=2)), 1)
+            is_fast_blk = np.logical_and(is_fast_blk, is_ok_rmv)
+
+        # flags the subsets which were successfully calculated
+        is_fast[i_blk] = is_fast_blk
+
+    # runs the individual leave-one-out predictions for any subsets that couldn't use the batched engine
+    for i_sub in np.where(~is_fast)[0]:
+        lda_res = run_lda_loo_predictions(lda, n_sp_calc[:, cell_mask[i_sub, :]], i_grp, n_t, is_OTO)
+        if lda_res is None:
+            is_ok[i_sub] = False
+        else:
+            c_mat[i_sub] = lda_res[2]
+
+    # returns the confusion matrices and the success flags
+    return c_mat, is_ok
+
+
+def calc_lda_accuracy(c_mat, n_t, n_c):
+    '''
+
+    :param c_mat:
+    :param n_t:
+    :param n_c:
+    :return:
+    '''
+
+    # memory allocation
+    BG, BD = np.zeros((2 * n_c, 2 * n_c), dtype=bool), np.zeros((2, 2 * n_c), dtype=bool)
+    y_acc, c_mat = np.zeros(1 + n_c, dtype=float), c_mat / n_t
+
+    # sets up the binary masks for the group/direction types
+    for i_c in range(n_c):
+        BG[(2 * i_c):(2 * (i_c + 1)), (2 * i_c):(2 * (i_c + 1))] = True
+        BD[0, 2 * i_c], BD[1, 2 * i_c + 1] = True, True
+
+    # calculates the grouping accuracy values
+    y_acc[0] = np.sum(np.multiply(BG, c_mat)) / (2 * n_c)
+
+    # calculates the direction accuracy values (over each condition)
+    for i_c in range(n_c):
+        y_acc[1 + i_c] = np.sum(np.multiply(BD, c_mat[(2 * i_c):(2 * (i_c + 1)), :])) / 2
+
+    # returns the accuracy values
+    return y_acc
+
+
+def calc_spike_count_lda_accuracy(n_sp, lda_para, n_t, n_c, is_OTO):
+    '''
+
+    :param n_sp:
+    :param lda_para:
+    :param n_t:
+    :param n_c:
+    :param is_OTO:
+    :return:
+    '''
+
+    # sets the group indices and normalises the spike counts (if required)
+    i_grp = np.repeat(np.arange(2 * n_c), n_t)
+    n_sp_calc = norm_spike_counts(n_sp, len(i_grp), lda_para['is_norm'])
+
+    # runs the one-out-trial lda predictions
+    lda_res = run_lda_loo_predictions(setup_lda_solver(lda_para), n_sp_calc, i_grp, n_t, is_OTO)
+    if lda_res is None:
+        # if there was an error, then return a None value
+        return None
+    else:
+        # otherwise, return the accuracy values
+        return calc_lda_accuracy(lda_res[2], n_t, n_c)
+
+
+def calc_subset_lda_accuracy(n_sp, cell_mask, lda_para, n_t, n_c, is_OTO):
+    '''
+
+    :param n_sp:
+    :param cell_mask:
+    :param lda_para:
+    :param n_t:
+    :param n_c:
+    :param is_OTO:
+    :return:
+    '''
+
+    # sets the group indices and normalises the spike counts (the normalisation is independent of the cell subset)
+    i_grp = np.repeat(np.arange(2 * n_c), n_t)
+    n_sp_calc = norm_spike_counts(n_sp, len(i_grp), lda_para['is_norm'])
+
+    # runs the one-out-trial lda predictions for each cell subset
+    c_mat, is_ok = run_batch_lda_loo_predictions(setup_lda_solver(lda_para), n_sp_calc, i_grp, n_t, is_OTO, cell_mask)
+
+    # calculates the accuracy values for each subset (subsets where the lda failed are set to NaN)
+    y_acc = np.nan * np.ones((len(is_ok), 1 + n_c))
+    for i_sub in np.where(is_ok)[0]:
+        y_acc[i_sub, :] = calc_lda_accuracy(c_mat[i_sub], n_t, n_c)
+
+    # returns the accuracy values and the success flags
+    return y_acc, is_ok
+
+
+def setup_expt_lda_spike_counts(data, calc_para, r_filt, i_expt, i_cell, n_trial_max):
+    '''
+
+    :param data:
+    :param calc_para:
+    :param r_filt:
+    :param i_expt:
+    :param i_cell:
+    :param n_trial_max:
+    :return:
+    '''
+
+    # retrieves the spike count tensors for the filter configuration (only calculated if not already cached)
+    t_ofs, t_phase = get_rot_phase_offsets(calc_para)
+    r_obj = get_spike_count_tensor(data, r_filt, i_expt, t_ofs, t_phase)
+
+    # returns the spike counts for the valid cells within each experiment
+    return [setup_lda_spike_counts(r_obj, i_cell[i_ex], i_ex, n_trial_max, False)[0] for i_ex in range(len(i_expt))]
+
+
+class SharedSpikeCounts(object):
+    def __init__(self, n_sp, use_shm=True):
+        '''
+
+        :param n_sp:
+        :param use_shm:
+        '''
+
+        # initialisations
+        self.use_shm = use_shm and (shared_memory is not None)
+        self.shm, self.n_sp = [], [np.ascontiguousarray(x) for x in n_sp]
+
+        if self.use_shm:
+            # copies the spike count arrays (and the cancellation flag) into shared memory blocks
+            for x in self.n_sp + [np.zeros(1, dtype=np.uint8)]:
+                shm = shared_memory.SharedMemory(create=True, size=max(1, x.nbytes))
+                np.ndarray(x.shape, dtype=x.dtype, buffer=shm.buf)[:] = x
+                self.shm.append(shm)
+
+            # sets the shared array information (passed to the pool tasks in place of the arrays)
+            self.sh_info = [(y.name, x.shape, x.dtype.str) for x, y in zip(self.n_sp, self.shm)]
+            self.cancel_info = self.shm[-1].name
+            self.is_cancel = np.ndarray((1,), dtype=np.uint8, buffer=self.shm[-1].buf)
+
+        else:
+            # case is shared memory is not being used (the arrays are passed to the tasks directly)
+            self.sh_info, self.cancel_info, self.is_cancel = self.n_sp, None, np.zeros(1, dtype=np.uint8)
+
+    def cancel(self):
+        '''
+
+        :return:
+        '''
+
+        # sets the cancellation flag (the pool tasks check this flag before each calculation)
+        if len(self.shm):
+            self.is_cancel[0] = 1
+
+    def close(self):
+        '''
+
+        :return:
+        '''
+
+        # sets the cancellation flag and removes the shared memory array views
+        self.cancel()
+        shm_list, self.shm, self.is_cancel = self.shm, [], np.ones(1, dtype=np.uint8)
+
+        # releases the shared memory blocks
+        for shm in shm_list:
+            shm.close()
+            shm.unlink()
+
+
+def get_shared_spike_counts(sh_info, cancel_info):
+    '''
+
+    :param sh_info:
+    :param cancel_info:
+    :return:
+    '''
+
+    global shm_task
+
+    # if shared memory is not being used, then return the arrays directly
+    if cancel_info is None:
+        return sh_info, np.zeros(1, dtype=np.uint8)
+
+    # attaches to the shared memory blocks (if not already attached within this process)
+    if shm_task['name'] != cancel_info:
+        # releases the previous shared memory blocks (the array views are removed first)
+        shm_prev, shm_task['n_sp'], shm_task['is_cancel'] = shm_task['shm'], [], None
+        for shm in shm_prev:
+            shm.close()
+
+        # attaches to the new shared memory blocks
+        shm_task = {'name': cancel_info, 'shm': [], 'n_sp': []}
+        for sh_name, sh_shape, sh_dtype in sh_info:
+            shm_task['shm'].append(attach_shared_memory(sh_name))
+            shm_task['n_sp'].append(np.ndarray(sh_shape, dtype=np.dtype(sh_dtype), buffer=shm_task['shm'][-1].buf))
+
+        # attaches to the cancellation flag
+        shm_task['shm'].append(attach_shared_memory(cancel_info))
+        shm_task['is_cancel'] = np.ndarray((1,), dtype=np.uint8, buffer=shm_task['shm'][-1].buf)
+
+    # returns the shared arrays and the cancellation flag
+    return shm_task['n_sp'], shm_task['is_cancel']
+
+
+def attach_shared_memory(sh_name):
+    '''
+
+    :param sh_name:
+    :return:
+    '''
+
+    # case is the resource tracker is not available
+    if resource_tracker is None:
+        return shared_memory.SharedMemory(name=sh_name)
+
+    # attaches to the shared memory block without registering it with the worker's resource tracker (the block is
+    # owned/unlinked by the main process, so the tracker would otherwise try to remove the block when the worker exits)
+    register = resource_tracker.register
+    resource_tracker.register = lambda *args: None
+
+    try:
+        return shared_memory.SharedMemory(name=sh_name)
+    finally:
+        resource_tracker.register = register
+
+
+def run_pooled_lda_pool(p_data):
+    '''
+
+    :param p_data:
+    :return:
+    '''
+
+    # retrieves the pool data
+    sh_info, cancel_info, lda_para, n_t, n_c, is_OTO, n_cell, seed = p_data
+
+    # initialisations (each shuffle has its own random state)
+    n_sp0, is_cancel = get_shared_spike_counts(sh_info, cancel_info)
+    r_state, n_ex, n_sh = [cf.setup_random_state(x) for x in seed], len(n_sp0), len(seed)
+    y_acc = np.nan * np.ones((n_sh, n_ex, 1 + n_c))
 
-        # calculates the direction accuracy values (over each condition)
-        for i_c in range(n_c):
-            y_acc[i_ex, 1 + i_c] = np.sum(np.multiply(BD, c_mat[(2 * i_c):(2 * (i_c + 1)), :])) / 2
+    # determines the experiments which have the required number of cells
+    n_cell_ex = np.array([np.size(x, axis=1) for x in n_sp0])
+    is_keep = n_cell_ex >= n_cell
+    if not np.any(is_keep):
+        return y_acc
 
-    if d_data is not None:
-        # sets the lda values
-        d_data.lda = lda
-        d_data.i_expt = i_expt
-        d_data.i_cell = i_cell
-        d_data.y_acc = y_acc
-        d_data.exp_name = exp_name
-        d_data.lda_trial_type = get_glob_para('lda_trial_type')
+    # runs the LDA until all shuffles have been successfully calculated
+    i_sh_run = np.arange(n_sh)
+    while not is_cancel[0]:
+        # sets the random cell subset masks for each remaining shuffle/experiment
+        cell_mask = np.empty(n_ex, dtype=object)
+        for i_ex in np.where(is_keep)[0]:
+            cell_mask[i_ex] = np.zeros((len(i_sh_run), n_cell_ex[i_ex]), dtype=bool)
+            for j, i_sh in enumerate(i_sh_run):
+                cell_mask[i_ex][j, r_state[i_sh].permutation(n_cell_ex[i_ex])[:n_cell]] = True
 
-        # sets the solver parameters
-        set_lda_para(d_data, lda_para, r_filt, n_trial_max)
+        # runs the LDA for the cell subsets of each experiment (as a single batch)
+        is_ok = np.ones(len(i_sh_run), dtype=bool)
+        for i_ex in np.where(is_keep)[0]:
+            y_acc_ex, is_ok_ex = calc_subset_lda_accuracy(n_sp0[i_ex], cell_mask[i_ex], lda_para, n_t, n_c, is_OTO)
+            y_acc[i_sh_run, i_ex, :], is_ok = y_acc_ex, np.logical_and(is_ok, is_ok_ex)
 
-        # sets the phase duration/offset parameters
-        d_data.tofs = t_ofs
-        d_data.tphase = t_phase
-        d_data.usefull = calc_para['use_full_rot']
+        # any shuffles where there was an error are re-run with new cell subsets
+        i_sh_run = i_sh_run[~is_ok]
+        if len(i_sh_run) == 0:
+            # if all the shuffles were successful, then return the accuracy values
+            return y_acc
 
-        # updates the progress bar (if provided)
-        if w_prog is not None:
-            w_prog.emit('Calculating Pairwise Correlations...', pW0 + 0.99 * pW)
+    # returns a None value (the calculations were cancelled)
+    return None
 
-        # calculates the noise correlation (if required)
-        calc_noise_correl(d_data, n_sp)
 
-        # returns a true value
-        return True
+def run_shuffled_lda_pool(p_data):
+    '''
 
-    elif is_shuffle:
-        # otherwise, return the calculated values
-        return [lda, y_acc, exp_name, n_sp]
+    :param p_data:
+    :return:
+    '''
 
-    else:
-        # otherwise, return the calculated values
-        return [lda, y_acc, exp_name]
+    # retrieves the pool data
+    sh_info, cancel_info, lda_para, n_t, n_c, is_OTO, seed = p_data
+
+    # initialisations
+    n_sp0, is_cancel = get_shared_spike_counts(sh_info, cancel_info)
+    r_state, n_ex = cf.setup_random_state(seed), len(n_sp0)
+    y_acc, n_sp = np.zeros((n_ex, 1 + n_c)), np.empty(n_ex, dtype=object)
+
+    # runs the shuffled trial LDA for each experiment
+    for i_ex in range(n_ex):
+        # if the calculations were cancelled, then exit
+        if is_cancel[0]:
+            return None
+
+        # shuffles the trial spike counts and runs the LDA
+        n_sp[i_ex] = shuffle_trial_counts(np.array(n_sp0[i_ex]), n_t, r_state)
+        y_acc_ex = calc_spike_count_lda_accuracy(n_sp[i_ex], lda_para, n_t, n_c, is_OTO)
+        if y_acc_ex is None:
+            # if there was an error, then return a False value
+            return False
+        else:
+            y_acc[i_ex, :] = y_acc_ex
+
+    # returns the accuracy values and shuffled spike counts
+    return y_acc, n_sp
 
 
 def run_part_lda_pool(p_data):
@@ -1787,90 +3550,37 @@ def run_reducing_cell_lda(w_prog, lda, lda_para, n_sp, i_grp, p_w0, p_w, w_str,
     :return:
     '''
 
-    def run_lda_predictions(lda, n_sp, i_grp):
-        '''
-
-        :param w_prog:
-        :param lda:
-        :param n_sp:
-        :param i_grp:
-        :return:
-        '''
-
-        # memory allocation
-        n_tt, n_cell = np.shape(n_sp)
-        c_mat, is_keep, n_grp = np.zeros((2, 2), dtype=int), np.ones(n_tt, dtype=bool), i_grp[-1] + 1
-        is_OTO, n_t = get_glob_para('lda_trial_type') == 'One-Trial Out', int(n_tt / n_grp)
-
-        # sets the total number of iterations (based on trial setup type)
-        if is_OTO:
-            # case is "one-trial out" setup
-            NN, xi_rmv = n_t, np.arange(0, n_tt, n_t)
-        else:
-            # case is "one-phase out" setup
-            NN = len(i_grp)
-
-        # fits the LDA model and calculates the prediction for each
-        for i_trial in range(NN):
-            # fits the one-out-trial lda model
-            if is_OTO:
-                is_keep[xi_rmv + i_trial] = False
-            else:
-                is_keep[i_trial] = False
-
-            # fits the one-out-trial lda model
-            try:
-                lda.fit(n_sp[is_keep, :], i_grp[is_keep])
-            except:
-                if w_prog is not None:
-                    e_str = 'There was an error running the LDA analysis with the current solver parameters. ' \
-                            'Either choose a different solver or alter the solver parameters before retrying'
-                    w_prog.emit('LDA Analysis Error', 0.)
-
-            if is_OTO:
-                # calculates the model prediction from the remaining trial and increments the confusion matrix
-                for i in (xi_rmv + i_trial):
-                    lda_pred = lda.predict(n_sp[i, :].reshape(1, -1))
-                    c_mat[i_grp[i], lda_pred] += 1
-
-                    # re-adds the removed trial
-                    is_keep[i] = True
-            else:
-                # calculates the model prediction from the remaining trial and increments the confusion matrix
-                lda_pred = lda.predict(n_sp[i_trial, :].reshape(1, -1))
-                c_mat[i_grp[i_trial], lda_pred] += 1
-
-                # re-adds the removed trial
-                is_keep[i_trial] = True
-
-        # returns the decoding accuracy
-        return (c_mat[0, 0] + c_mat[1, 1]) / n_tt
-
     # array indexing and memory allocation
     n_tf, n_cell = np.shape(n_sp)
-    use_cell, y_acc = np.ones(n_cell, dtype=bool), np.zeros(n_cell)
+    is_OTO, n_t = get_glob_para('lda_trial_type') == 'One-Trial Out', int(n_tf / (i_grp[-1] + 1))
 
-    for i_cell in range(n_cell):
-        # updates the progressbar
-        w_str_nw = '{0}, Cell {1}/{2})'.format(w_str, i_cell + 1, n_cell)
-        w_prog.emit(w_str_nw, 100 * (p_w0  + p_w * (i_cell / n_cell)))
+    # sets the cell subset masks for each step (the cells are removed in order of their coefficient rating)
+    cell_mask = np.tri(n_cell, dtype=bool)
+    if is_dec:
+        # case is the top rated coefficients are being removed
+        cell_mask = cell_mask[::-1, ::-1]
+    else:
+        # case is the lowest rated coefficients are being removed
+        cell_mask = cell_mask[::-1, :]
 
-        # normalises the spike counts (based on the remaining cells)
-        n_sp_norm = norm_spike_counts(n_sp[:, use_cell], n_tf, lda_para['is_norm'])
+    # updates the progressbar
+    w_prog.emit('{0}, Cells 1-{1})'.format(w_str, n_cell), 100 * p_w0)
 
-        # runs the lda predictions for the current configuration
-        y_acc[i_cell] = run_lda_predictions(lda, n_sp_norm, i_grp)
+    # normalises the spike counts (the normalisation of each cell is independent of the remaining cells) and runs the
+    # one-out-trial lda predictions for all cell subsets
+    n_sp_norm = norm_spike_counts(n_sp, n_tf, lda_para['is_norm'])
+    c_mat, is_ok = run_batch_lda_loo_predictions(lda, n_sp_norm, i_grp, n_t, is_OTO, cell_mask)
 
-        # removes the next cell from the analysis
-        if is_dec:
-            # case is the top rated coefficients are being removed
-            use_cell[i_cell] = False
-        else:
-            # case is the lowest rated coefficients are being removed
-            use_cell[-(i_cell + 1)] = False
+    # outputs an error message if any of the subset calculations failed
+    if not np.all(is_ok):
+        if w_prog is not None:
+            e_str = 'There was an error running the LDA analysis with the current solver parameters. ' \
+                    'Either choose a different solver or alter the solver parameters before retrying'
+            w_prog.emit('LDA Analysis Error', 0.)
 
     # returns the accuracy values
-    return y_acc
+    w_prog.emit('{0}, Cells 1-{1})'.format(w_str, n_cell), 100 * (p_w0 + p_w))
+    return np.where(is_ok, (c_mat[:, 0, 0] + c_mat[:, 1, 1]) / n_tf, np.nan)
 
 #######################################
 ####    KINEMATIC LDA FUNCTIONS    ####
@@ -1968,13 +3678,15 @@ def calc_binned_kinemetic_spike_freq(data, plot_para, calc_para, w_prog, roc_cal
     w_prog.emit('Spiking Frequency Calculation Complete!', 100.)
 
 
-def calc_shuffled_kinematic_spike_freq(data, calc_para, w_prog):
+def calc_shuffled_kinematic_spike_freq(data, calc_para, w_prog, pool=None, seed=None):
     '''
 
     :param data:
     :param plot_para:
     :param calc_para:
     :param w_prog:
+    :param pool:
+    :param seed:
     :return:
     '''
 
@@ -1986,50 +3698,6 @@ def calc_shuffled_kinematic_spike_freq(data, calc_para, w_prog):
         :return:
         '''
 
-        def shuffle_cell_spike_freq(calc_para, vel_sf_grp):
-            '''
-
-            :param calc_para:
-            :param n_sp_cell:
-            :return:
-            '''
-
-            # initialisations
-            n_shuffle, n_sm = calc_para['n_shuffle'], calc_para['n_smooth'] * calc_para['is_smooth']
-            n_trial, n_bin = np.shape(vel_sf_grp)
-
-            # memory allocation
-            v_sf_shuff = np.zeros((n_shuffle, n_bin, n_trial))
-
-            # sets up the shuffled spike counts over all trials/shuffles
-            for i_trial in range(n_trial):
-                for i_shuffle in range(n_shuffle):
-                    ind_shuffle = np.random.permutation(n_bin)
-                    v_sf_shuff[i_shuffle, :, i_trial] = vel_sf_grp[i_trial, ind_shuffle]
-
-            # returns the mean spiking frequencies over all trials
-            return smooth_signal(np.mean(v_sf_shuff, axis=2), n_sm)
-
-        def calc_spike_freq_corr(v_bin, v_sf, mlt):
-            '''
-
-            :param v_bin:
-            :param v_sf:
-            :param mlt:
-            :return:
-            '''
-
-            # memory allocation
-            n_sf = np.size(v_sf, axis=0)
-            v_corr = np.zeros(n_sf)
-
-            # calculate the correlation coefficients for each shuffled value
-            for i_sf in range(n_sf):
-                v_corr[i_sf] = mlt * np.corrcoef(v_sf[i_sf, :], v_bin)[0, 1]
-
-            # returns the correlation array
-            return v_corr
-
         # parameters
         p_value = 5           # SK-test SET THIS TO EITHER 2.5 or 5
 
@@ -2054,15 +3722,15 @@ def calc_shuffled_kinematic_spike_freq(data, calc_para, w_prog):
         v_sf_sh, v_sf_mu, is_sig = dcopy(A), dcopy(A), np.zeros((n_cell, n_grp), dtype=bool)
         v_corr, v_corr_sh = np.ones((n_cell, n_grp)), np.ones((n_shuffle, n_cell, n_grp))
 
-        # loops through each cell calculating the shuffled trials/correlations
-        for i_cell in range(n_cell):
-            # updates the progressbar
-            w_str = 'Shuffling Spike Frequecies ({0} - {1}/{2})'.format(tt, i_cell + 1, n_cell)
-            w_prog.emit(w_str, 100 * (pW0 + pW * i_cell / n_cell))
+        # sets the random seeds for each cell/group (ensures the shuffles are independent of the pool usage)
+        sh_seed = r_state.randint(2 ** 31 - 1, size=(n_cell, n_grp))
 
+        # sets up the binned spike counts for each cell (NB - spike counts may not necessarily be integer because the
+        # velocity spiking averages are the average of both the increasing/decreasing velocities)
+        p_data = []
+        for i_cell in range(n_cell):
             for i_grp in range(n_grp):
-                # sets up the binned spike counts for the current cell (NB - spike counts may not necessarily be integer
-                # because the velocity spiking averages are the average of both the increasing/decreasing velocities)
+                # removes the non-existent trials for the current cell
                 vel_sf_grp = vel_sf[:, :, i_cell][:, ind_grp[i_grp]]
                 vel_sf_grp = vel_sf_grp[np.logical_not(np.isnan(vel_sf_grp[:, 0])), :]
 
@@ -2070,16 +3738,34 @@ def calc_shuffled_kinematic_spike_freq(data, calc_para, w_prog):
                 v_sf_mu[i_cell, i_grp] = smooth_signal(np.mean(vel_sf_grp, axis=0), n_sm)
                 v_corr[i_cell, i_grp] = mlt[i_grp] * np.corrcoef(v_sf_mu[i_cell, i_grp], v_bin_grp[i_grp])[0, 1]
 
-                # only perforrm the shuffle analysis if there is at least one shuffle selected
-                if calc_para['n_shuffle'] > 0:
-                    # calculates the shuffled spiking frequencies
-                    v_sf_sh[i_cell, i_grp] = shuffle_cell_spike_freq(calc_para, vel_sf_grp)
-                    v_corr_sh[:, i_cell, i_grp] = \
-                                calc_spike_freq_corr(v_bin_grp[i_grp], v_sf_sh[i_cell, i_grp], mlt[i_grp])
+                # sets the shuffle calculation data
+                p_data.append([vel_sf_grp, v_bin_grp[i_grp], mlt[i_grp], n_shuffle, n_sm, sh_seed[i_cell, i_grp]])
+
+        # only perform the shuffle analysis if there is at least one shuffle selected
+        if n_shuffle > 0:
+            # calculates the shuffled spiking frequencies/correlations for each cell
+            if pool is None:
+                # case is running the calculations serially
+                w_prog.emit('Shuffling Spike Frequecies ({0})'.format(tt), 100 * pW0)
+                sh_data = map(calc_shuffled_kinematic_corr_pool, p_data)
+            else:
+                # case is running the calculations over the pool workers
+                w_prog.emit('Shuffling Spike Frequecies ({0} - Pooled)'.format(tt), 100 * pW0)
+                sh_data = pool.imap(calc_shuffled_kinematic_corr_pool, p_data)
+
+            for i_data, (v_sf_sh_nw, v_corr_sh_nw) in enumerate(sh_data):
+                # updates the progressbar
+                i_cell, i_grp = i_data // n_grp, i_data % n_grp
+                if i_grp == 0:
+                    w_str = 'Shuffling Spike Frequecies ({0} - {1}/{2})'.format(tt, i_cell + 1, n_cell)
+                    w_prog.emit(w_str, 100 * (pW0 + pW * i_cell / n_cell))
 
-                    # calculates the cell correlation significance
-                    p_tile = np.percentile(v_corr_sh[:, i_cell, i_grp], [p_value, (100 - p_value)])
-                    is_sig[i_cell, i_grp] = (v_corr[i_cell, i_grp] < p_tile[0]) or (v_corr[i_cell, i_grp] > p_tile[1])
+                # sets the shuffled spiking frequencies/correlations
+                v_sf_sh[i_cell, i_grp], v_corr_sh[:, i_cell, i_grp] = v_sf_sh_nw, v_corr_sh_nw
+
+                # calculates the cell correlation significance
+                p_tile = np.percentile(v_corr_sh[:, i_cell, i_grp], [p_value, (100 - p_value)])
+                is_sig[i_cell, i_grp] = (v_corr[i_cell, i_grp] < p_tile[0]) or (v_corr[i_cell, i_grp] > p_tile[1])
 
         # returns the shuffled spiking frequencies, correlation arrays
         return v_sf_mu, v_sf_sh, v_corr_sh, v_corr, is_sig
@@ -2091,7 +3777,7 @@ def calc_shuffled_kinematic_spike_freq(data, calc_para, w_prog):
     # initialisations
     r_data, equal_time = data.rotation, calc_para['equal_time']
     r_obj_k, vel_sf = r_data.r_obj_kine, dcopy(r_data.vel_sf_rs) if equal_time else dcopy(r_data.vel_sf)
-    n_filt = len(r_obj_k.rot_filt_tot)
+    n_filt, r_state = len(r_obj_k.rot_filt_tot), cf.setup_random_state(seed)
     pW = 1 / n_filt
 
     # initialises the correlation data fields
@@ -2127,7 +3813,72 @@ def calc_shuffled_kinematic_spike_freq(data, calc_para, w_prog):
     r_data.vel_shuffle_calc = True
 
 
-def calc_shuffled_sf_corr(f_corr, i_file, calc_para, i_prog, w_prog):
+def calc_shuffled_kinematic_corr_pool(p_data):
+    '''
+
+    :param p_data:
+    :return:
+    '''
+
+    return calc_shuffled_kinematic_corr(*p_data)
+
+
+def calc_shuffled_kinematic_corr(vel_sf_grp, v_bin, mlt, n_shuffle, n_sm, seed=None, mem_max=256):
+    '''
+
+    :param vel_sf_grp:
+    :param v_bin:
+    :param mlt:
+    :param n_shuffle:
+    :param n_sm:
+    :param seed:
+    :param mem_max:
+    :return:
+    '''
+
+    # initialisations
+    r_state = cf.setup_random_state(seed)
+    n_trial, n_bin = np.shape(vel_sf_grp)
+    i_trial = np.arange(n_trial).reshape(1, -1, 1)
+
+    # sets the number of shuffles per chunk (the noise, index and shuffled count arrays are all n_trial x n_bin)
+    n_chunk = max(1, int(mem_max * 2 ** 20 / (24 * max(1, n_trial * n_bin))))
+
+    # memory allocation
+    v_sf_sh = np.zeros((n_shuffle, n_bin))
+
+    # calculates the mean shuffled spike counts over all trials (for each chunk of shuffles)
+    for i0 in range(0, n_shuffle, n_chunk):
+        # sets the bin permutations for each trial/shuffle (argsort of uniform noise)
+        i1 = min(i0 + n_chunk, n_shuffle)
+        ind_shuffle = np.argsort(r_state.random_sample((i1 - i0, n_trial, n_bin)), axis=2)
+
+        # calculates the mean shuffled spiking frequencies over all trials
+        v_sf_sh[i0:i1, :] = np.mean(vel_sf_grp[i_trial, ind_shuffle], axis=1)
+
+    # smooths the shuffled spiking frequencies and calculates the correlations with the velocity bins
+    v_sf_sh = smooth_signal(v_sf_sh, n_sm)
+    return v_sf_sh, mlt * calc_row_corr(v_sf_sh, v_bin)
+
+
+def calc_row_corr(y, x):
+    '''
+
+    :param y:
+    :param x:
+    :return:
+    '''
+
+    # calculates the deviations from the mean
+    dy = y - np.mean(y, axis=1).reshape(-1, 1)
+    dx = x - np.mean(x)
+
+    # calculates the pearson correlation coefficient between each row and the comparison signal
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.dot(dy, dx) / np.sqrt(np.sum(dy ** 2, axis=1) * np.sum(dx ** 2))
+
+
+def calc_shuffled_sf_corr(f_corr, i_file, calc_para, i_prog, w_prog, pool=None, seed=None, mem_max=256):
     '''
 
     :param f_corr:
@@ -2135,6 +3886,9 @@ def calc_shuffled_sf_corr(f_corr, i_file, calc_para, i_prog, w_prog):
     :param calc_para:
     :param i_prog:
     :param w_prog:
+    :param pool:
+    :param seed:
+    :param mem_max:
     :return:
     '''
 
@@ -2151,26 +3905,26 @@ def calc_shuffled_sf_corr(f_corr, i_file, calc_para, i_prog, w_prog):
 
         return np.array([model.coef_[0][0],model.intercept_[0]])
 
-    def calc_cell_shuffled_corr(sf_fix, sf_free, n_sh):
+    def calc_block_shuffled_corr(p_data, p_ind):
         '''
 
-        :param sf_fix:
-        :param sf_free:
-        :param n_shuff:
+        :param p_data:
+        :param p_ind:
         :return:
         '''
 
-        # memory allocation
-        n_bin = len(sf_fix)
-        sf_corr = np.zeros(n_sh)
-
-        # calculate the correlation coefficients for each shuffled value
-        for i_sh in range(n_sh):
-            ind_sh = np.random.permutation(n_bin)
-            sf_corr[i_sh] = np.corrcoef(sf_fix, sf_free[ind_sh])[0, 1]
+        # calculates the shuffled correlations for each cell/condition/velocity grouping in the block
+        if pool is None:
+            sh_data = map(calc_shuffled_sf_corr_pool, p_data)
+        else:
+            sh_data = pool.map(calc_shuffled_sf_corr_pool, p_data)
 
-        # returns the correlation array
-        return sf_corr
+        for (i_cell, i_cond, i_grp), sf_corr_sh_nw in zip(p_ind, sh_data):
+            # calculates the cell's shuffled spiking frequency correlations and statistical significance
+            sf_corr_sh[i_cond][i_cell, :, i_grp] = sf_corr_sh_nw
+            p_tile = np.percentile(sf_corr_sh[i_cond][i_cell, :, i_grp], p_value_rng)
+            is_sig[i_cond][i_cell, i_grp] = int(sf_corr[i_cond][i_cell, i_grp] > p_tile[1]) - \
+                                            int(sf_corr[i_cond][i_cell, i_grp] < p_tile[0])
 
     # parameters
     p_value = 5       # SK-test sets this to either 2.5 or 5
@@ -2180,6 +3934,7 @@ def calc_shuffled_sf_corr(f_corr, i_file, calc_para, i_prog, w_prog):
     n_shuff, n_cond = calc_para['n_shuffle'], np.size(f_corr.sf_fix, axis=1)
     sf_fix, sf_free, sf_grad = f_corr.sf_fix[i_file, :], f_corr.sf_free[i_file, :], f_corr.sf_grad[i_file, :]
     sf_corr, sf_corr_sh, is_sig = f_corr.sf_corr[i_file, :], f_corr.sf_corr_sh[i_file, :], f_corr.sf_corr_sig[i_file, :]
+    r_state = cf.setup_random_state(seed)
 
     # memory allocation
     n_cell, n_bin = np.shape(sf_fix[0])
@@ -2195,6 +3950,9 @@ def calc_shuffled_sf_corr(f_corr, i_file, calc_para, i_prog, w_prog):
         sf_corr_sh[i_cond] = np.zeros((n_cell, n_shuff, n_grp))
         is_sig[i_cond] = np.zeros((n_cell, n_grp), dtype=int)
 
+    # sets the maximum number of shuffle index elements that are calculated at the same time
+    n_blk_max, n_blk, p_data, p_ind = max(1, int(mem_max * 2 ** 20 / 8)), 0, [], []
+
     #
     for i_cell in range(n_cell):
         # updates the progressbar
@@ -2221,12 +3979,49 @@ def calc_shuffled_sf_corr(f_corr, i_file, calc_para, i_prog, w_prog):
 
                 # calculates the cell spiking frequency correlations
                 sf_corr[i_cond][i_cell, i_grp] = np.corrcoef(sf_fix_nw, sf_free_nw)[0, 1]
-                sf_corr_sh[i_cond][i_cell, :, i_grp] = calc_cell_shuffled_corr(sf_fix_nw, sf_free_nw, n_shuff)
 
-                # calculates the cell's shuffled spiking frequency correlations and statistical significance
-                p_tile = np.percentile(sf_corr_sh[i_cond][i_cell, :, i_grp], p_value_rng)
-                is_sig[i_cond][i_cell, i_grp] = int(sf_corr[i_cond][i_cell, i_grp] > p_tile[1]) - \
-                                                int(sf_corr[i_cond][i_cell, i_grp] < p_tile[0])
+                # sets the shuffled bin permutations (drawn in the same order as the cell/condition/grouping loop)
+                n_bin_grp = len(ind_grp[i_grp])
+                ind_sh = np.array([r_state.permutation(n_bin_grp) for _ in range(n_shuff)], dtype=int)
+                p_data.append([sf_fix_nw, sf_free_nw, ind_sh.reshape(n_shuff, n_bin_grp)])
+                p_ind.append([i_cell, i_cond, i_grp])
+                n_blk += n_shuff * n_bin_grp
+
+        # calculates the shuffled correlations (once the block memory limit has been reached)
+        if n_blk >= n_blk_max:
+            calc_block_shuffled_corr(p_data, p_ind)
+            n_blk, p_data, p_ind = 0, [], []
+
+    # calculates the shuffled correlations for any remaining cells
+    if len(p_data):
+        calc_block_shuffled_corr(p_data, p_ind)
+
+
+def calc_shuffled_sf_corr_pool(p_data):
+    '''
+
+    :param p_data:
+    :return:
+    '''
+
+    return calc_perm_corr(*p_data)
+
+
+def calc_perm_corr(x, y, ind_sh):
+    '''
+
+    :param x:
+    :param y:
+    :param ind_sh:
+    :return:
+    '''
+
+    # standardises the signals (the permutations do not alter the mean/standard deviation of the shuffled signal)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        zx, zy = (x - np.mean(x)) / np.std(x), (y - np.mean(y)) / np.std(y)
+
+        # calculates the correlations between the signal and each permutation of the other signal
+        return np.dot(zy[ind_sh], zx) / len(x)
 
 
 def setup_kinematic_lda_sf(data, r_filt, calc_para, i_cell, n_trial_max, w_prog,
@@ -2901,7 +4696,7 @@ def calc_all_psychometric_curves(d_data, d_vel, use_all=True, fit_vals='Mean', f
     use_mean = fit_vals == 'Mean'
 
     # memory allocation
-    y_acc_fit, A = np.zeros((n_xi, nC, n_tt)), np.empty(n_tt, dtype=object)
+    y_acc_tt, A = np.zeros((n_xi, nC, n_tt)), np.empty(n_tt, dtype=object)
     p_acc, p_acc_lo, p_acc_hi = dcopy(A), dcopy(A), dcopy(A)
 
     # other initialisations
@@ -2914,7 +4709,7 @@ def calc_all_psychometric_curves(d_data, d_vel, use_all=True, fit_vals='Mean', f
     else:
         i_fit = np.arange(d_data.i_bin_spd + 1, n_xi).astype(int)
 
-    # calculates the psychometric fits for each condition trial type
+    # sets the accuracy values for each condition trial type
     for i_tt in range(n_tt):
         # sets the mean accuracy values (across all cell counts)
         if use_mean:
@@ -2928,10 +4723,12 @@ def calc_all_psychometric_curves(d_data, d_vel, use_all=True, fit_vals='Mean', f
             y_acc_mn = np.hstack((np.nanmedian(100. * y_acc_mn_exp[:, :, :-1], axis=0),
                                                100. * y_acc_mn_exp[0, :, -1].reshape(-1, 1)))
 
-        # calculates/sets the psychometric fit values
-        y_acc_fit[:, :, i_tt] = calc_psychometric_curves(y_acc_mn, xi_fit, nC, i_fit, i_bin_spd, f_scale)
-        # y_acc_fit[:, :, i_tt], p_acc[i_tt], p_acc_lo[i_tt], p_acc_hi[i_tt] = \
-        #                                 calc_psychometric_curves(y_acc_mn, xi_fit, nC, i_fit, i_bin_spd)
+        # sets the accuracy values for the current trial type
+        y_acc_tt[:, :, i_tt] = y_acc_mn
+
+    # calculates/sets the psychometric fit values (all trial types are fit together)
+    y_acc_fit = calc_psychometric_curves(y_acc_tt.reshape(n_xi, -1), xi_fit, nC * n_tt, i_fit, i_bin_spd, f_scale)
+    y_acc_fit = y_acc_fit.reshape(-1, nC, n_tt)
 
     # updates the class fields
     # d_data.y_acc_fit, d_data.p_acc, d_data.p_acc_lo, d_data.p_acc_hi = y_acc_fit, p_acc, p_acc_lo, p_acc_hi
@@ -2948,8 +4745,6 @@ def calc_psychometric_curves(y_acc_mn, xi, n_cond, i_fit, i_bin_spd, f_scale=1.0
     :return:
     '''
 
-    from lmfit import Model
-
     def fit_func(p, x, y=0):
         '''
 
@@ -3032,28 +4827,31 @@ def calc_psychometric_curves(y_acc_mn, xi, n_cond, i_fit, i_bin_spd, f_scale=1.0
     n_para, alpha = 4, 0.05
     # tval = t.ppf(1. - alpha / 2., max(0, len(xi) - n_para))
 
-    # memory allocation
-    y_acc_fit, A = np.empty(n_cond, dtype=object), np.zeros((n_cond, n_para))
-    # p_acc, p_acc_lo, p_acc_hi = dcopy(A), dcopy(A), dcopy(A)
-
     # sets the indices of the values to be fit
     ii = np.zeros(len(xi), dtype=bool)
     ii[i_fit] = True
     ii[i_bin_spd] = False
 
-    # loops through each of the conditions calculating the psychometric fits
-    for i_c in range(n_cond):
-        # # initialisations
-        # maxfev = 10000
+    # sets up the initial parameters for each condition
+    x_fit, y_fit = xi[ii], y_acc_mn[ii, :n_cond].T
+    p0 = np.vstack([init_fit_para(x_fit, y, n_para) for y in y_fit])
+    bounds = ((0., 0., 0., xi[0]), (100., 100., 100.0, xi[-1]))
 
-        # sets up the initial parameters
-        p0 = init_fit_para(xi[ii], y_acc_mn[ii, i_c], n_para)
-        bounds = ((0., 0., 0., xi[0]), (100., 100., 100.0, xi[-1]))
+    # runs the batch fit for all conditions (the half activation point is limited to the fitted points)
+    bounds_fit = (bounds[0][:-1] + (x_fit[0],), bounds[1][:-1] + (x_fit[-1],))
+    p_acc, is_conv = fit_psychometric_curves(x_fit, y_fit, p0, bounds_fit, f_scale)
 
-        #
-        r_fit = least_squares(fit_func, p0, loss='soft_l1', f_scale=f_scale,
-                                            args=(xi[ii], y_acc_mn[ii, i_c]), bounds=bounds)
-        y_acc_fit[i_c] = fit_func(r_fit.x, xi)
+    # runs the full solver for any conditions where the batch fit didn't converge
+    for i_c in np.where(~is_conv)[0]:
+        r_fit = least_squares(fit_func, p0[i_c], loss='soft_l1', f_scale=f_scale,
+                                            args=(x_fit, y_fit[i_c]), bounds=bounds)
+        p_acc[i_c, :] = r_fit.x
+
+    # calculates the fit values (infeasible fits are set to a high value)
+    y_acc_fit, _ = calc_psychometric_func(p_acc, xi)
+    is_inf = np.logical_or.reduce((p_acc[:, 3] < xi[0], p_acc[:, 3] > xi[-1],
+                                   y_acc_fit[:, 0] < 0, y_acc_fit[:, -1] > 100))
+    y_acc_fit[is_inf, :] = 1e6
 
         # # ensures the initial estimate is between the lower/upper bounds
         # iLB = p0 < bounds[0]; p0[iLB] = np.array(bounds[0])[iLB]
@@ -3082,7 +4880,131 @@ def calc_psychometric_curves(y_acc_mn, xi, n_cond, i_fit, i_bin_spd, f_scale=1.0
         #         maxfev *= 2
 
     # returns the fit values
-    return np.vstack(y_acc_fit).T
+    return y_acc_fit.T
+
+
+def calc_psychometric_func(p, x):
+    '''
+
+    :param p:
+    :param x:
+    :return:
+    '''
+
+    # calculates the sigmoid values for each parameter set
+    with np.errstate(over='ignore'):
+        s = 1. / (1. + np.exp(-p[:, 2:3] * (x - p[:, 3:4])))
+
+    # returns the function and sigmoid values
+    return p[:, 0:1] + p[:, 1:2] * s, s
+
+
+def fit_psychometric_curves(x, y, p0, bounds, f_scale=1.0, y_max=100., n_iter_max=200, f_tol=1e-10, x_tol=1e-10,
+                            g_tol=1e-8):
+    '''
+
+    :param x:
+    :param y:
+    :param p0:
+    :param bounds:
+    :param f_scale:
+    :param y_max:
+    :param n_iter_max:
+    :param f_tol:
+    :param x_tol:
+    :param g_tol:
+    :return:
+    '''
+
+    def calc_fit_cost(p, y, is_fin):
+        '''
+
+        :param p:
+        :param y:
+        :param is_fin:
+        :return:
+        '''
+
+        # calculates the residuals and soft-l1 loss values
+        F, s = calc_psychometric_func(p, x)
+        r = (F - y) * is_fin
+        c = (f_scale ** 2) * np.sum(np.sqrt(1. + (r / f_scale) ** 2) - 1., axis=1)
+
+        # infeasible fits (values exceed the upper limit or are undefined) are given an infinite cost
+        c[np.logical_or(F[:, -1] > y_max, ~np.isfinite(c))] = np.inf
+
+        # returns the cost, residual and sigmoid values
+        return c, r, s
+
+    # initialisations
+    lb, ub = np.array(bounds[0], dtype=float), np.array(bounds[1], dtype=float)
+    is_fin = ~np.isnan(y)
+    y, p = np.where(is_fin, y, 0.), np.clip(np.array(p0, dtype=float), lb, ub)
+
+    # memory allocation
+    n_curve, n_para = np.shape(p)
+    is_conv, lam = np.zeros(n_curve, dtype=bool), 1e-3 * np.ones(n_curve)
+    c, r, s = calc_fit_cost(p, y, is_fin)
+    is_act = np.isfinite(c)
+
+    # runs the levenberg-marquardt iterations for all active curves
+    for i_iter in range(n_iter_max):
+        # determines the active curves (exits if there are none)
+        i_act = np.where(is_act)[0]
+        if not len(i_act):
+            break
+
+        # calculates the jacobian and the (soft-l1) irls weights for the active curves
+        p_a, s_a, r_a = p[i_act], s[i_act], r[i_act]
+        ds, yA = s_a * (1. - s_a), p_a[:, 1:2]
+        J = np.stack((np.ones(np.shape(s_a)), s_a, yA * ds * (x - p_a[:, 3:4]), -yA * ds * p_a[:, 2:3]), axis=2)
+        J *= is_fin[i_act, :, None]
+        w = 1. / np.sqrt(1. + (r_a / f_scale) ** 2)
+
+        # sets the approximate hessian and gradient
+        H = np.einsum('bni,bn,bnj->bij', J, w, J)
+        g = np.einsum('bni,bn->bi', J, w * r_a)
+
+        # parameters on a bound (with the descent direction leaving the feasible region) are held fixed
+        is_fix = np.logical_or(np.logical_and(p_a <= lb, g > 0), np.logical_and(p_a >= ub, g < 0))
+        g[is_fix] = 0.
+
+        # sets up the damped/undamped systems (fixed parameters are removed from the system)
+        D = np.maximum(np.diagonal(H, axis1=1, axis2=2), 1e-12)[:, :, None] * np.eye(n_para)
+        A = np.stack((H + 1e-10 * D, H + lam[i_act, None, None] * D))
+        A[:, np.repeat(is_fix[:, :, None], n_para, axis=2)] = 0.
+        A[:, np.repeat(is_fix[:, None, :], n_para, axis=1)] = 0.
+        A[:, :, np.arange(n_para), np.arange(n_para)] += is_fix
+
+        # calculates the undamped (gauss-newton) cost decrease and the damped step
+        try:
+            dp_gn, dp = -np.linalg.solve(A, np.stack((g, g))[:, :, :, None])[:, :, :, 0]
+        except np.linalg.LinAlgError:
+            break
+
+        # calculates the new parameter estimates and their costs
+        is_min = -0.5 * np.sum(g * dp_gn, axis=1) <= g_tol * (1. + c[i_act])
+
+        p_new = np.clip(p_a + dp, lb, ub)
+        c_new, r_new, s_new = calc_fit_cost(p_new, y[i_act], is_fin[i_act])
+
+        # determines the steps which reduce the cost and the step/cost change tolerances
+        is_acc = c_new < c[i_act]
+        dp_sz = np.linalg.norm(p_new - p_a, axis=1)
+        is_dx = dp_sz <= x_tol * (x_tol + np.linalg.norm(p_a, axis=1))
+        is_df = np.logical_and(is_acc, (c[i_act] - c_new) <= f_tol * c[i_act])
+
+        # updates the parameters for the accepted steps
+        j_acc = i_act[is_acc]
+        p[j_acc], c[j_acc], r[j_acc], s[j_acc] = p_new[is_acc], c_new[is_acc], r_new[is_acc], s_new[is_acc]
+        lam[i_act] = np.where(is_acc, np.maximum(0.3 * lam[i_act], 1e-12), 10. * lam[i_act])
+
+        # stops the curves that can no longer be improved (these have only converged if at a local minimum)
+        is_stop = np.logical_or.reduce((is_df, is_dx, lam[i_act] > 1e12))
+        is_conv[i_act[is_stop]], is_act[i_act[is_stop]] = is_min[is_stop], False
+
+    # returns the parameter estimates and convergence flags
+    return p, is_conv
 
 ####################################################
 ####    LDA SOLVER PARAMETER/SETUP FUNCTIONS    ####
@@ -3919,15 +5841,8 @@ def smooth_signal(y_sig, n_sm):
             # case is there is only one signal
             return medfilt(y_sig, n_sm)
         else:
-            # case is multiple signals
-            y_sig_sm = np.zeros(np.shape(y_sig))
-
-            # calculates the median filter for each signal
-            for i_sig in range(np.size(y_sig, axis=0)):
-                y_sig_sm[i_sig, :] = medfilt(y_sig[i_sig, :], n_sm)
-
-            # returns the final array
-            return y_sig_sm
+            # case is multiple signals (calculates the median filter for each signal)
+            return medfilt(np.array(y_sig, dtype=float), [1, n_sm])
     else:
         return y_sig
 
@@ -4362,45 +6277,46 @@ def calc_posthoc_stats(y_orig, p_value=0.05, c_ofs=0):
     :return:
     '''
 
-    def calc_kw_stats(y):
+    def set_dunn_stats(p_dunn, p_value):
         '''
 
-        :param y:
+        :param p_dunn:
+        :param p_value:
         :return:
         '''
 
-        # sets the indices for the elements within each grouping
-        i_grp = cf.flat_list([[i] * len(x) for i, x in enumerate(y)])
+        # memory allocation
+        n_grp = len(p_dunn)
+        d_stats = np.empty((n_grp, n_grp), dtype=object)
+        d_stats[:] = 'N/A'
 
-        # calculates and returns the kruskal wallis test p-value
-        kw_stats = r_stats.kruskal_test(FloatVector(cf.flat_list(y)), FloatVector(i_grp))
-        return cf.get_r_stats_values(kw_stats, 'p.value')
+        # sets the statistics strings for each grouping
+        for i_grp in range(n_grp):
+            for j_grp in range(i_grp + 1, n_grp):
+                d_stats[i_grp, j_grp] = d_stats[j_grp, i_grp] = cf.set_pvalue_string(p_dunn[i_grp, j_grp], p_value)
 
+        # returns the stats array
+        return d_stats
 
-    def calc_dunn_stats(y, p_kw_stats, p_value):
+    def set_posthoc_stats(y_test, p_value):
         '''
 
-        :param y:
-        :param is_sig:
+        :param y_test:
+        :param p_value:
         :return:
         '''
 
-        # memory allocation
-        n_grp = len(y)
-        d_stats = np.empty((n_grp, n_grp), dtype=object)
-        d_stats[:] = 'N/A'
-
-        # calculates the dunn posthoc test values
-        p_dunn = sp.posthoc_dunn(y, p_adjust='bonferroni')
+        # calculates the kruskal-wallis/dunn test values for all tests
+        p_kw, p_dunn = calc_kw_dunn_stats(y_test)
 
-        # sets the statistics strings for each grouping
-        for i_grp in range(n_grp):
-            for j_grp in range(i_grp + 1, n_grp):
-                p_val = p_dunn[i_grp + 1][j_grp + 1]
-                d_stats[i_grp, j_grp] = d_stats[j_grp, i_grp] = cf.set_pvalue_string(p_val, p_value)
+        # sets the kruskal-wallis p-values/dunn statistics strings for each test
+        p_stats = np.empty((len(y_test), 2), dtype=object)
+        for i_test in range(len(y_test)):
+            p_stats[i_test, 0] = p_kw[i_test]
+            p_stats[i_test, 1] = set_dunn_stats(p_dunn[i_test], p_value)
 
         # returns the stats array
-        return d_stats
+        return p_stats
 
     # initialisations and memory allocation
     p_within, p_btwn = None, None
@@ -4408,30 +6324,77 @@ def calc_posthoc_stats(y_orig, p_value=0.05, c_ofs=0):
 
     # determines if the between filter type statistics need to be calculated (n_filt > 1)
     if n_grp > 1:
-        # memory allocation
-        p_within = np.empty((n_filt, 2), dtype=object)
-        y_within = rmv_nan_elements([[list(x[:, i_f]) for x in y_orig[c_ofs:]] for i_f in range(n_filt)])
-
         # calculates the within filter type statistics for each group type
-        for i_filt in range(n_filt):
-            p_within[i_filt, 0] = calc_kw_stats(y_within[i_filt])
-            p_within[i_filt, 1] = calc_dunn_stats(y_within[i_filt], p_within[i_filt, 0], p_value)
+        y_within = rmv_nan_elements([[list(x[:, i_f]) for x in y_orig[c_ofs:]] for i_f in range(n_filt)])
+        p_within = set_posthoc_stats(y_within, p_value)
 
     # determines if the between filter type statistics need to be calculated (n_filt > 1)
     if n_filt > 1:
-        # memory allocation
-        p_btwn = np.empty((n_grp, 2), dtype=object)
-        y_btwn = rmv_nan_elements([[list(y_orig[i + c_ofs][:, j]) for j in range(n_filt)] for i in range(n_grp)])
-
         # calculates the between filter type statistics for each group type
-        for i_grp in range(n_grp):
-            p_btwn[i_grp, 0] = calc_kw_stats(y_btwn[i_grp])
-            p_btwn[i_grp, 1] = calc_dunn_stats(y_btwn[i_grp], p_btwn[i_grp, 0], p_value)
+        y_btwn = rmv_nan_elements([[list(y_orig[i + c_ofs][:, j]) for j in range(n_filt)] for i in range(n_grp)])
+        p_btwn = set_posthoc_stats(y_btwn, p_value)
 
     # returns the
     return [p_within, p_btwn]
 
 
+def calc_kw_dunn_stats(y_test):
+    '''
+
+    :param y_test:
+    :return:
+    '''
+
+    # array dimensioning
+    n_test, n_grp = len(y_test), len(y_test[0])
+    n_pts = [np.array([len(x) for x in y]) for y in y_test]
+    n_max = max(1, np.max([np.sum(x) for x in n_pts]))
+
+    # sets up the padded value/group index arrays for each test (padded values are placed at the end of the ranks)
+    y_pad, i_grp = np.inf * np.ones((n_test, n_max)), -np.ones((n_test, n_max), dtype=int)
+    for i_test, y in enumerate(y_test):
+        if np.sum(n_pts[i_test]):
+            y_pad[i_test, :np.sum(n_pts[i_test])] = np.hstack(y)
+            i_grp[i_test, :np.sum(n_pts[i_test])] = np.repeat(np.arange(n_grp), n_pts[i_test])
+
+    # ranks all the tests values together
+    is_ok = i_grp >= 0
+    y_rank = stats.rankdata(y_pad, axis=1)
+
+    # calculates the group rank sums/counts
+    i_grp_oh = (i_grp[:, :, None] == np.arange(n_grp)).astype(float)
+    R, n_g = np.einsum('ij,ijk->ik', y_rank, i_grp_oh), np.array(n_pts, dtype=float)
+    N = np.sum(n_g, axis=1)
+
+    # calculates the tie counts (the t^3 - t sum) for each test
+    y_sort = np.sort(y_pad, axis=1)
+    is_new = np.hstack((np.ones((n_test, 1), dtype=bool), np.diff(y_sort, axis=1) != 0))
+    i_run = np.cumsum(is_new, axis=1) - 1 + n_max * np.arange(n_test)[:, None]
+    n_tie = np.bincount(i_run[is_ok], minlength=n_test * n_max).reshape(n_test, n_max)
+    tie_sum = np.sum(n_tie ** 3 - n_tie, axis=1).astype(float)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        # calculates the kruskal-wallis statistics (tie corrected, empty groups are ignored)
+        n_grp_ok, R_mn = np.sum(n_g > 0, axis=1), R / n_g
+        H = (12. / (N * (N + 1))) * np.sum(np.where(n_g > 0, R * R_mn, 0.), axis=1) - 3. * (N + 1)
+        H /= 1. - tie_sum / (N ** 3 - N)
+        p_kw = stats.chi2.sf(H, n_grp_ok - 1)
+        p_kw[n_grp_ok < 2] = np.nan
+
+        # calculates the dunn test z-scores for each group pair
+        A = N * (N + 1) / 12. - tie_sum / (12. * (N - 1))
+        B = 1. / n_g[:, :, None] + 1. / n_g[:, None, :]
+        z_dunn = np.abs(R_mn[:, :, None] - R_mn[:, None, :]) / np.sqrt(A[:, None, None] * B)
+
+    # calculates the (bonferroni corrected) dunn test p-values
+    n_comp = max(1, n_grp * (n_grp - 1) / 2)
+    p_dunn = np.minimum(1., n_comp * 2. * stats.norm.sf(z_dunn))
+    p_dunn[:, np.arange(n_grp), np.arange(n_grp)] = 1.
+
+    # returns the kruskal-wallis/dunn test p-values
+    return p_kw, p_dunn
+
+
 def calc_event_correlation(y_evnt, sp_evnt, indiv_cell=True):
     '''
 
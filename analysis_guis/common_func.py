@@ -3,6 +3,7 @@ import os
 import re
 import sys
 import copy
+import hashlib
 import functools
 import math as m
 import numpy as np
@@ -30,6 +31,9 @@ from PyQt5.QtWidgets import (QGroupBox, QPushButton, QListWidget, QComboBox, QMe
 from scipy.optimize import curve_fit
 from matplotlib.colors import to_rgba_array
 
+# custom module import
+import analysis_guis.data_store as ds
+
 import rpy2.robjects as ro
 import rpy2.robjects.numpy2ri
 from rpy2.robjects import FloatVector, BoolVector, StrVector, IntVector
@@ -1508,6 +1512,53 @@ def combine_nd_arrays(A, B, dim=1, dim_append=0):
     return np.append(A, B, axis=dim_append)
 
 
+def flatten_ragged_array(A):
+    '''
+
+    :param A:
+    :return:
+    '''
+
+    # determines the non-empty elements of the object array and their lengths
+    A_flat = np.asarray(A, dtype=object).ravel()
+    is_set = np.fromiter((x is not None for x in A_flat), dtype=bool, count=len(A_flat))
+    n_count = np.zeros(len(A_flat), dtype=int)
+
+    # combines the values from all the set elements into a single array
+    if np.any(is_set):
+        n_count[is_set] = np.fromiter(map(len, A_flat[is_set]), dtype=int, count=np.sum(is_set))
+        x_flat = np.concatenate(list(A_flat[is_set]))
+    else:
+        x_flat = np.array([])
+
+    # returns the flattened values, element counts and set element flags
+    return x_flat, n_count, is_set
+
+
+def setup_ragged_array(x_flat, n_count, is_set, sz):
+    '''
+
+    :param x_flat:
+    :param n_count:
+    :param is_set:
+    :param sz:
+    :return:
+    '''
+
+    # sets the start/end indices of each element within the flattened array
+    i_end = np.cumsum(n_count, dtype=int)
+    i_start = i_end - n_count
+
+    # splits the flattened values into the separate elements (elements are views into the flattened array)
+    A = np.empty(len(n_count), dtype=object)
+    if len(n_count):
+        A[:] = np.frompyfunc(lambda i0, i1: x_flat[i0:i1], 2, 1)(i_start, i_end)
+        A[np.logical_not(is_set)] = None
+
+    # returns the reshaped object array
+    return A.reshape(sz)
+
+
 def create_general_group_plot(ax, y_plt, grp_plot_type, col):
     '''
 
@@ -2885,16 +2936,41 @@ def get_cfig_line(cfig_file, fld_name):
     return next(c.rstrip('\n').split('|')[1] for c in open(cfig_file) if fld_name in c)
 
 
-def save_single_file(f_name, data):
+def save_single_file(f_name, data, compress=False):
     '''
 
     :param f_name:
     :param data:
+    :param compress:
     :return:
     '''
 
-    with open(f_name, 'wb') as fw:
-        p.dump(data, fw)
+    # outputs the data to the columnar data store file (large arrays are stored separately)
+    ds.save_data_store(f_name, data, compress=compress)
+
+
+def load_single_file(f_name, mmap_mode='c', lazy=False):
+    '''
+
+    :param f_name:
+    :param mmap_mode:
+    :param lazy:
+    :return:
+    '''
+
+    if ds.is_data_store(f_name):
+        # case is a columnar data store file (large arrays are memory-mapped and/or only read when first accessed)
+        return ds.load_data_store(f_name, mmap_mode=mmap_mode, lazy=lazy)
+    elif ds.is_segment_file(f_name):
+        # case is a segmented multi-experiment data file
+        return ds.load_segment_file(f_name)
+    elif ds.is_buffer_file(f_name):
+        # case is a comparison data file (with out-of-band array buffers)
+        return ds.load_buffer_file(f_name)
+    else:
+        # case is an older pickled data file
+        with open(f_name, 'rb') as fp:
+            return p.load(fp)
 
 
 def save_multi_comp_file(main_obj, out_info, force_update=False):
@@ -2945,9 +3021,8 @@ def save_single_comp_file(main_obj, out_info, force_update=False):
         if hasattr(main_obj.data.externd, 'free_data'):
             data_out['ex_data'] = main_obj.data.externd.free_data
 
-    # outputs the data to file
-    with open(out_file, 'wb') as fw:
-        p.dump(data_out, fw)
+    # outputs the data to file (the arrays are written directly from memory)
+    ds.save_buffer_file(out_file, data_out, compress=out_info.get('compress', False))
 
 
 def save_multi_data_file(main_obj, out_info, is_multi=True, force_update=False):
@@ -3650,4 +3725,90 @@ def get_scatterplot_colour(c, x):
         return c
     else:
         # colour is an array, so repeat for as many elements being plotted
-        return repmat(c, len(x), 1)
\ No newline at end of file
+        return repmat(c, len(x), 1)
+
+
+def get_user_cache_dir(*sub_dir):
+    '''
+
+    :param sub_dir:
+    :return:
+    '''
+
+    if 'SPIKEGUI_CACHE_DIR' in os.environ:
+        # case is the cache directory has been set by the user
+        cache_dir = os.environ['SPIKEGUI_CACHE_DIR']
+    elif sys.platform == 'win32':
+        # case is windows (uses the local application data directory)
+        cache_dir = os.path.join(os.environ.get('LOCALAPPDATA', os.path.expanduser('~')), 'spikeGUI', 'Cache')
+    else:
+        # case is linux/mac (uses the user cache directory)
+        cache_dir = os.path.join(os.environ.get('XDG_CACHE_HOME', os.path.expanduser('~/.cache')), 'spikeGUI')
+
+    # returns the cache directory path
+    return os.path.join(cache_dir, *sub_dir)
+
+
+def get_canonical_value(x):
+    '''
+
+    :param x:
+    :return:
+    '''
+
+    # converts the value into a hashable form (dictionary keys are sorted so that key order has no effect)
+    if isinstance(x, dict):
+        return tuple((str(k), get_canonical_value(x[k])) for k in sorted(x.keys(), key=str))
+    elif isinstance(x, (list, tuple, ndarray)):
+        return tuple(get_canonical_value(y) for y in x)
+    elif isinstance(x, np.generic):
+        return x.item()
+    else:
+        return x
+
+
+def get_canonical_hash(*args):
+    '''
+
+    :param args:
+    :return:
+    '''
+
+    # returns the hash string of the canonical form of the input values
+    return hashlib.md5(repr(get_canonical_value(list(args))).encode('utf-8')).hexdigest()
+
+
+def calc_object_size(x):
+    '''
+
+    :param x:
+    :return:
+    '''
+
+    # determines the size of the array (recursively checks the elements of the object arrays)
+    if isinstance(x, ndarray):
+        if x.dtype == object:
+            return x.nbytes + sum([calc_object_size(y) for y in x.flat])
+        else:
+            return x.nbytes
+    elif isinstance(x, (list, tuple)):
+        return sum([calc_object_size(y) for y in x])
+    elif isinstance(x, dict):
+        return sum([calc_object_size(y) for y in x.values()])
+    else:
+        return 0
+
+
+def setup_random_state(seed=None):
+    '''
+
+    :param seed:
+    :return:
+    '''
+
+    if isinstance(seed, np.random.RandomState):
+        # case is a random state object has been provided
+        return seed
+    else:
+        # case is a seed value (or None for an unseeded generator)
+        return np.random.RandomState(seed)
@@ -0,0 +1,1313 @@
+# module import
+import io
+import os
+import gc
+import zlib
+import time
+import copy
+import struct
+import hashlib
+import weakref
+import zipfile
+import types
+import platform
+import threading
+import numpy as np
+import pickle as p
+from collections import OrderedDict
+
+# format parameters
+store_version = 1
+header_name = 'header.pkl'
+zip_magic = b'PK\x03\x04'
+seg_magic = b'SGMDATA\x01'
+seg_foot_magic = b'SGMINDEX'
+seg_footer = struct.Struct('<8sQQ16s')
+buf_magic = b'SGMBUFF\x01'
+buf_header = struct.Struct('<QQB')
+buf_size = struct.Struct('<Q')
+mmap_min_bytes = 2 ** 20
+lru_max_bytes = 2 ** 31
+is_windows = platform.system() == 'Windows'
+
+########################################################################################################################
+########################################################################################################################
+
+
+class ArrayRef(object):
+    def __init__(self, name, shape, dtype):
+        '''
+
+        :param name:
+        :param shape:
+        :param dtype:
+        '''
+
+        # sets the array entry name and array dimensions/type
+        self.name = name
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+
+    @property
+    def nbytes(self):
+        '''
+
+        :return:
+        '''
+
+        return int(np.prod(self.shape)) * self.dtype.itemsize
+
+########################################################################################################################
+####                                         STORE WRITING FUNCTIONS                                               ####
+########################################################################################################################
+
+
+def save_data_store(f_name, data, compress=False, min_bytes=4096):
+    '''
+
+    :param f_name:
+    :param data:
+    :param compress:
+    :param min_bytes:
+    :return:
+    '''
+
+    # any lazy fields/arrays mapped from the output file are read into memory (as the file is about to be replaced)
+    for d in [x for x in list(lazy_dicts.values()) if x.s_read.f_name == os.path.abspath(f_name)]:
+        d.load_all()
+        detach_file_arrays(d, f_name)
+
+    detach_file_arrays(data, f_name)
+    gc.collect()
+
+    # splits the large numerical arrays from the data object
+    arr_data = []
+    header = {'version': store_version, 'data': split_data_arrays(data, [], arr_data, min_bytes, set())}
+
+    # outputs the data to a temporary file (the original file is only replaced once the write is complete)
+    tmp_name = '{0}.tmp'.format(f_name)
+    c_type = zipfile.ZIP_DEFLATED if compress else zipfile.ZIP_STORED
+    with zipfile.ZipFile(tmp_name, 'w', compression=zipfile.ZIP_STORED, allowZip64=True) as zf:
+        # outputs the header (small fields are pickled, large arrays are replaced by references)
+        zf.writestr(header_name, p.dumps(header, protocol=p.HIGHEST_PROTOCOL))
+
+        # outputs each of the large arrays as separate .npy entries
+        for a_name, arr in arr_data:
+            z_info = zipfile.ZipInfo(a_name, date_time=(1980, 1, 1, 0, 0, 0))
+            z_info.compress_type = c_type
+            with zf.open(z_info, 'w', force_zip64=(arr.nbytes >= 2 ** 31)) as fw:
+                np.lib.format.write_array(fw, arr, allow_pickle=False)
+
+    # replaces the original file
+    os.replace(tmp_name, f_name)
+
+
+def split_data_arrays(data, d_path, arr_data, min_bytes, arr_name):
+    '''
+
+    :param data:
+    :param d_path:
+    :param arr_data:
+    :param min_bytes:
+    :param arr_name:
+    :return:
+    '''
+
+    if type(data) in [np.ndarray, np.memmap]:
+        if data.dtype.hasobject:
+            # case is an object array (the elements are split separately)
+            data_nw = np.empty(data.shape, dtype=object)
+            for i_d in np.ndindex(data.shape):
+                i_path = d_path + ['_'.join([str(x) for x in i_d])]
+                data_nw[i_d] = split_data_arrays(data[i_d], i_path, arr_data, min_bytes, arr_name)
+
+            return data_nw
+
+        elif data.nbytes < min_bytes:
+            # case is a small array (this is kept within the header)
+            return np.array(data)
+
+        else:
+            # case is a large numerical array (this is output as a separate entry)
+            a_name = set_array_name(d_path, arr_name)
+            arr_data.append((a_name, np.asarray(data)))
+            return ArrayRef(a_name, data.shape, data.dtype)
+
+    elif type(data) in [dict, LazyDataDict]:
+        # case is a dictionary (lazy dictionaries are output as normal dictionaries)
+        return {k: split_data_arrays(v, d_path + [str(k)], arr_data, min_bytes, arr_name) for k, v in data.items()}
+
+    elif type(data) in [list, tuple]:
+        # case is a list/tuple
+        data_nw = [split_data_arrays(x, d_path + [str(i)], arr_data, min_bytes, arr_name) for i, x in enumerate(data)]
+        return data_nw if type(data) == list else tuple(data_nw)
+
+    else:
+        # case is any other object type, including array/dictionary sub-classes (this is pickled within the header)
+        return data
+
+
+def set_array_name(d_path, arr_name):
+    '''
+
+    :param d_path:
+    :param arr_name:
+    :return:
+    '''
+
+    # sets the base array entry name (from the field path)
+    a_name0 = '/'.join([x.replace('/', '_') for x in d_path]) if len(d_path) else 'array'
+    a_name, i_dup = '{0}.npy'.format(a_name0), 0
+
+    # ensures the array entry name is unique
+    while a_name in arr_name:
+        i_dup += 1
+        a_name = '{0}~{1}.npy'.format(a_name0, i_dup)
+
+    # returns the array entry name
+    arr_name.add(a_name)
+    return a_name
+
+
+def detach_file_arrays(data, f_name):
+    '''
+
+    :param data:
+    :param f_name:
+    :return:
+    '''
+
+    # initialisations
+    f_path = os.path.abspath(f_name)
+
+    def is_file_array(x):
+        return isinstance(x, np.memmap) and (x.filename is not None) and (os.path.abspath(x.filename) == f_path)
+
+    if isinstance(data, dict):
+        # case is a dictionary (any unread lazy fields are ignored)
+        for k in [x for x in data if x not in getattr(data, 'f_unload', [])]:
+            if is_file_array(data[k]):
+                data[k] = np.array(data[k])
+            else:
+                detach_file_arrays(data[k], f_name)
+
+    elif (type(data) == list) or (isinstance(data, np.ndarray) and data.dtype.hasobject):
+        # case is a list/object array
+        for i in (range(len(data)) if type(data) == list else np.ndindex(data.shape)):
+            if is_file_array(data[i]):
+                data[i] = np.array(data[i])
+            else:
+                detach_file_arrays(data[i], f_name)
+
+    elif type(data) == tuple:
+        # case is a tuple (tuples are immutable, so only the contents are searched)
+        for x in data:
+            detach_file_arrays(x, f_name)
+
+########################################################################################################################
+####                                         STORE READING FUNCTIONS                                               ####
+########################################################################################################################
+
+
+def is_data_store(f_name):
+    '''
+
+    :param f_name:
+    :return:
+    '''
+
+    with open(f_name, 'rb') as fp:
+        return fp.read(len(zip_magic)) == zip_magic
+
+
+def load_data_store(f_name, mmap_mode='c', lazy=False):
+    '''
+
+    :param f_name:
+    :param mmap_mode:
+    :param lazy:
+    :return:
+    '''
+
+    # reads the header and array entry information
+    s_read = StoreReader(f_name, mmap_mode)
+    data = s_read.header['data']
+
+    if lazy and (type(data) == dict):
+        # case is lazy loading (the large fields are only read when first accessed)
+        return LazyDataDict(data, s_read)
+    else:
+        # otherwise, read all the large arrays
+        return join_data_arrays(data, s_read.read_array)
+
+
+def join_data_arrays(data, read_fcn):
+    '''
+
+    :param data:
+    :param read_fcn:
+    :return:
+    '''
+
+    if isinstance(data, ArrayRef):
+        # case is an array reference
+        return read_fcn(data)
+
+    elif isinstance(data, np.ndarray) and data.dtype.hasobject:
+        # case is an object array
+        for i_d in np.ndindex(data.shape):
+            data[i_d] = join_data_arrays(data[i_d], read_fcn)
+
+    elif type(data) == dict:
+        # case is a dictionary
+        for k in data:
+            data[k] = join_data_arrays(data[k], read_fcn)
+
+    elif type(data) == list:
+        # case is a list
+        for i in range(len(data)):
+            data[i] = join_data_arrays(data[i], read_fcn)
+
+    elif type(data) == tuple:
+        # case is a tuple
+        return tuple([join_data_arrays(x, read_fcn) for x in data])
+
+    # returns the data object
+    return data
+
+
+def get_ref_bytes(data):
+    '''
+
+    :param data:
+    :return:
+    '''
+
+    if isinstance(data, ArrayRef):
+        # case is an array reference
+        return data.nbytes
+
+    elif isinstance(data, np.ndarray) and data.dtype.hasobject:
+        # case is an object array
+        return sum([get_ref_bytes(data[i_d]) for i_d in np.ndindex(data.shape)])
+
+    elif type(data) == dict:
+        # case is a dictionary
+        return sum([get_ref_bytes(x) for x in data.values()])
+
+    elif type(data) in [list, tuple]:
+        # case is a list/tuple
+        return sum([get_ref_bytes(x) for x in data])
+
+    else:
+        # case is any other object type
+        return 0
+
+
+def set_array_write(data, is_write):
+    '''
+
+    :param data:
+    :param is_write:
+    :return:
+    '''
+
+    if isinstance(data, np.ndarray):
+        # case is an array (the contents of object arrays are also set)
+        if data.dtype.hasobject:
+            for i_d in np.ndindex(data.shape):
+                set_array_write(data[i_d], is_write)
+
+        try:
+            data.setflags(write=is_write)
+        except ValueError:
+            # arrays mapped from read-only files can't be made writable
+            pass
+
+    elif type(data) == dict:
+        # case is a dictionary
+        for x in data.values():
+            set_array_write(x, is_write)
+
+    elif type(data) in [list, tuple]:
+        # case is a list/tuple
+        for x in data:
+            set_array_write(x, is_write)
+
+
+def read_store_array(f_name, z_info, mmap_mode='c'):
+    '''
+
+    :param f_name:
+    :param z_info:
+    :param mmap_mode:
+    :return:
+    '''
+
+    if z_info.compress_type != zipfile.ZIP_STORED:
+        # case is a compressed entry (these can't be memory-mapped)
+        with zipfile.ZipFile(f_name, 'r') as zf, zf.open(z_info, 'r') as fr:
+            return np.lib.format.read_array(fr, allow_pickle=False)
+
+    with open(f_name, 'rb') as fp:
+        # determines the start of the entry data (from the local file header)
+        fp.seek(z_info.header_offset)
+        h_local = fp.read(30)
+        fp.seek(z_info.header_offset + 30 + int.from_bytes(h_local[26:28], 'little') +
+                int.from_bytes(h_local[28:30], 'little'))
+
+        # reads the .npy header and determines the array data offset
+        n_ver = np.lib.format.read_magic(fp)
+        if n_ver == (1, 0):
+            shape, is_fortran, dtype = np.lib.format.read_array_header_1_0(fp)
+        else:
+            shape, is_fortran, dtype = np.lib.format.read_array_header_2_0(fp)
+
+        # small arrays are read directly (this limits the number of open memory maps). arrays are always read
+        # directly on windows, as a file can't be replaced while any memory maps of the file are open
+        n_byte, order = int(np.prod(shape)) * dtype.itemsize, 'F' if is_fortran else 'C'
+        if (mmap_mode is None) or is_windows or (n_byte < mmap_min_bytes):
+            arr = np.fromfile(fp, dtype=dtype, count=int(np.prod(shape)))
+            return arr.reshape(shape, order=order)
+        else:
+            i_ofs = fp.tell()
+
+    # returns the memory-mapped array
+    return np.memmap(f_name, dtype=dtype, mode=mmap_mode, offset=i_ofs, shape=shape, order=order)
+
+
+class StoreReader(object):
+    def __init__(self, f_name, mmap_mode='c'):
+        '''
+
+        :param f_name:
+        :param mmap_mode:
+        '''
+
+        # sets the input fields
+        self.f_name = os.path.abspath(f_name)
+        self.mmap_mode = mmap_mode
+
+        # reads the header and array entry information
+        with zipfile.ZipFile(f_name, 'r') as zf:
+            self.header = p.loads(zf.read(header_name))
+            self.z_info = {z.filename: z for z in zf.infolist()}
+
+    def read_array(self, a_ref):
+        '''
+
+        :param a_ref:
+        :return:
+        '''
+
+        return read_store_array(self.f_name, self.z_info[a_ref.name], self.mmap_mode)
+
+########################################################################################################################
+####                                            LAZY LOADING CLASSES                                               ####
+########################################################################################################################
+
+
+class FieldCache(object):
+    def __init__(self, n_max_bytes):
+        '''
+
+        :param n_max_bytes:
+        '''
+
+        # sets the input fields
+        self.n_max_bytes = n_max_bytes
+
+        # memory allocation
+        self.n_bytes = 0
+        self.fld = OrderedDict()
+        self.d_ref = {}
+
+        # lock for the cache and the lazy dictionary fields (a field is loaded/unloaded under the lock, so another
+        # thread can't be given an array reference for a field it is reading or be evicted part way through a read)
+        self.lock = threading.RLock()
+
+    def add_field(self, d, k, n_bytes):
+        '''
+
+        :param d:
+        :param k:
+        :param n_bytes:
+        :return:
+        '''
+
+        with self.lock:
+            # adds the field to the cache (a weak reference is used so the cache doesn't keep the dictionary alive)
+            d_id = id(d)
+            if d_id not in self.d_ref:
+                self.d_ref[d_id] = weakref.ref(d, lambda _, i=d_id: self.remove_dict(i))
+
+            self.fld[(d_id, k)] = n_bytes
+            self.n_bytes += n_bytes
+
+            # removes the least recently used fields until the cache is within the memory limit
+            while (self.n_bytes > self.n_max_bytes) and (len(self.fld) > 1):
+                d_id_lru, k_lru = next(iter(self.fld))
+                d_lru = self.d_ref[d_id_lru]()
+                if d_lru is None:
+                    # case is the dictionary has been deleted (but the weak reference callback has not yet been run)
+                    self.remove_dict(d_id_lru)
+                else:
+                    d_lru.unload_field(k_lru)
+
+    def touch_field(self, d, k):
+        '''
+
+        :param d:
+        :param k:
+        :return:
+        '''
+
+        with self.lock:
+            if (id(d), k) in self.fld:
+                self.fld.move_to_end((id(d), k))
+
+    def remove_field(self, d, k):
+        '''
+
+        :param d:
+        :param k:
+        :return:
+        '''
+
+        # removes the field from the cache (if it exists)
+        with self.lock:
+            if (id(d), k) in self.fld:
+                self.n_bytes -= self.fld.pop((id(d), k))
+
+    def remove_dict(self, d_id):
+        '''
+
+        :param d_id:
+        :return:
+        '''
+
+        # removes all fields belonging to a deleted dictionary
+        with self.lock:
+            self.d_ref.pop(d_id, None)
+            for d_key in [x for x in self.fld if x[0] == d_id]:
+                self.n_bytes -= self.fld.pop(d_key)
+
+
+# sets up the global field cache and lazy dictionary register
+field_cache = FieldCache(lru_max_bytes)
+lazy_dicts = weakref.WeakValueDictionary()
+
+
+class LazyDataDict(dict):
+    def __init__(self, data, s_read, cache=None):
+        '''
+
+        :param data:
+        :param s_read:
+        :param cache:
+        '''
+
+        # initialises the dictionary with the header data
+        dict.__init__(self, data)
+
+        # sets the input fields
+        self.s_read = s_read
+        self.cache = field_cache if cache is None else cache
+
+        # determines the fields that contain large arrays (these are only read when accessed)
+        self.f_skel = {k: v for k, v in data.items() if get_ref_bytes(v) > 0}
+        self.f_unload = set(self.f_skel.keys())
+        lazy_dicts[id(self)] = self
+
+    def __getitem__(self, k):
+        '''
+
+        :param k:
+        :return:
+        '''
+
+        with self.cache.lock:
+            if k in self.f_unload:
+                # case is the field has not been read, so read it from file
+                self.load_field(k)
+            else:
+                # otherwise, flag the field as being the most recently used
+                self.cache.touch_field(self, k)
+
+            return dict.__getitem__(self, k)
+
+    def __setitem__(self, k, v):
+        '''
+
+        :param k:
+        :param v:
+        :return:
+        '''
+
+        # overwritten fields are no longer linked to the file
+        with self.cache.lock:
+            self.release_field(k)
+            dict.__setitem__(self, k, v)
+
+    def __delitem__(self, k):
+        '''
+
+        :param k:
+        :return:
+        '''
+
+        with self.cache.lock:
+            self.release_field(k)
+            dict.__delitem__(self, k)
+
+    def __iter__(self):
+        return dict.__iter__(self)
+
+    def __copy__(self):
+        return self.copy_dict(lambda x: x)
+
+    def __deepcopy__(self, memo):
+        # the copy is added to the memo dictionary before the fields are copied
+        return self.copy_dict(lambda x: copy.deepcopy(x, memo), memo)
+
+    def __reduce_ex__(self, protocol):
+        '''
+
+        :param protocol:
+        :return:
+        '''
+
+        # pickled dictionaries are output as plain dictionaries (with all fields read)
+        return dict, (), None, None, iter([(k, self[k]) for k in self])
+
+    def get(self, k, default=None):
+        return self[k] if k in self else default
+
+    def items(self):
+        return [(k, self[k]) for k in self]
+
+    def values(self):
+        return [self[k] for k in self]
+
+    def copy(self):
+        return dict(self.items())
+
+    def pop(self, k, *default):
+        '''
+
+        :param k:
+        :param default:
+        :return:
+        '''
+
+        with self.cache.lock:
+            if k in self:
+                v = self[k]
+                del self[k]
+                return v
+            else:
+                return dict.pop(self, k, *default)
+
+    def setdefault(self, k, default=None):
+        if k not in self:
+            self[k] = default
+
+        return self[k]
+
+    def update(self, *args, **kwargs):
+        for k, v in dict(*args, **kwargs).items():
+            self[k] = v
+
+    def copy_dict(self, copy_fcn, memo=None):
+        '''
+
+        :param copy_fcn:
+        :param memo:
+        :return:
+        '''
+
+        # creates the copy of the dictionary
+        d_copy = LazyDataDict.__new__(LazyDataDict)
+        if memo is not None:
+            memo[id(self)] = d_copy
+
+        with self.cache.lock:
+            # sets the class fields (only the unread fields of the original dictionary are lazy in the copy)
+            d_copy.s_read, d_copy.cache = self.s_read, self.cache
+            d_copy.f_skel = {k: self.f_skel[k] for k in self.f_unload}
+            d_copy.f_unload = set(self.f_unload)
+            lazy_dicts[id(d_copy)] = d_copy
+
+            # copies the dictionary fields (the unread fields are kept as array references)
+            for k in self:
+                if k in self.f_unload:
+                    dict.__setitem__(d_copy, k, self.f_skel[k])
+                else:
+                    dict.__setitem__(d_copy, k, copy_fcn(dict.__getitem__(self, k)))
+                    if (memo is not None) and (k in self.f_skel):
+                        # deep copies of the read-only fields are not linked to the file, so can be altered in place
+                        set_array_write(dict.__getitem__(d_copy, k), True)
+
+        # returns the copied dictionary
+        return d_copy
+
+    def load_field(self, k):
+        '''
+
+        :param k:
+        :return:
+        '''
+
+        with self.cache.lock:
+            # reads the field arrays from file
+            d_val = join_data_arrays(copy.deepcopy(self.f_skel[k]), self.s_read.read_array)
+            dict.__setitem__(self, k, d_val)
+            self.f_unload.remove(k)
+
+            if isinstance(d_val, np.ndarray):
+                # array fields can be released from memory (these are re-read from file when next accessed). any
+                # in-place changes would be lost when the field is released, so the arrays are read-only (altered
+                # fields must be reassigned to the dictionary, which removes the link between the field and the file)
+                set_array_write(d_val, False)
+                self.cache.add_field(self, k, get_ref_bytes(self.f_skel[k]))
+            else:
+                # other fields may have been altered in place, so these are kept in memory
+                self.f_skel.pop(k)
+
+    def unload_field(self, k):
+        '''
+
+        :param k:
+        :return:
+        '''
+
+        # resets the field to the array references
+        with self.cache.lock:
+            self.cache.remove_field(self, k)
+            dict.__setitem__(self, k, self.f_skel[k])
+            self.f_unload.add(k)
+
+    def release_field(self, k):
+        '''
+
+        :param k:
+        :return:
+        '''
+
+        with self.cache.lock:
+            # read fields are no longer released from memory, so these can be altered in place
+            if (k in self.f_skel) and (k not in self.f_unload):
+                set_array_write(dict.__getitem__(self, k), True)
+
+            # removes the link between the field and the file
+            self.cache.remove_field(self, k)
+            self.f_skel.pop(k, None)
+            self.f_unload.discard(k)
+
+    def load_all(self):
+        '''
+
+        :return:
+        '''
+
+        # reads all the unread fields and removes the link between the fields and the file
+        with self.cache.lock:
+            for k in list(self.f_skel.keys()):
+                dict.__setitem__(self, k, self[k])
+                self.release_field(k)
+
+########################################################################################################################
+####                                       SEGMENTED DATA FILE FUNCTIONS                                           ####
+########################################################################################################################
+
+
+class RecordPickler(p.Pickler):
+    def __init__(self, fw, obj_ref):
+        '''
+
+        :param fw:
+        :param obj_ref:
+        '''
+
+        # initialises the pickler object
+        p.Pickler.__init__(self, fw, protocol=p.HIGHEST_PROTOCOL)
+
+        # sets the input fields
+        self.obj_ref = obj_ref
+
+        # memory allocation
+        self.obj_id = set()
+
+    def persistent_id(self, obj):
+        '''
+
+        :param obj:
+        :return:
+        '''
+
+        # records the mutable objects that are pickled (other objects are either immutable or pickled by reference).
+        # the objects are also stored so their ids aren't reused by other objects while the records are being pickled
+        if isinstance(obj, (dict, list, set, bytearray, np.ndarray)) or \
+                (hasattr(obj, '__dict__') and not isinstance(obj, (type, types.FunctionType,
+                                                                    types.BuiltinFunctionType, types.ModuleType))):
+            self.obj_id.add(id(obj))
+            self.obj_ref.append(obj)
+
+        # the objects are always pickled as normal
+        return None
+
+
+def is_segment_file(f_name):
+    '''
+
+    :param f_name:
+    :return:
+    '''
+
+    with open(f_name, 'rb') as fp:
+        return fp.read(len(seg_magic)) == seg_magic
+
+
+def save_segment_file(f_name, data, r_compact=2.):
+    '''
+
+    :param f_name:
+    :param data:
+    :param r_compact:
+    :return:
+    '''
+
+    # reads the record index from the existing file (if it is a segmented file)
+    is_append = os.path.isfile(f_name) and is_segment_file(f_name)
+    if is_append:
+        with open(f_name, 'rb') as fp:
+            rec_info = read_segment_index(fp)['records']
+    else:
+        rec_info = {}
+
+    # opens the output file (new records are appended onto existing segmented files. otherwise, a new file is created)
+    out_file = f_name if is_append else '{0}.tmp'.format(f_name)
+    with open(out_file, 'r+b' if is_append else 'wb') as fw:
+        if is_append:
+            fw.seek(0, os.SEEK_END)
+        else:
+            fw.write(seg_magic)
+
+        def write_record(obj):
+            # pickles the object and outputs the record
+            return write_payload(p.dumps(obj, protocol=p.HIGHEST_PROTOCOL))
+
+        def write_payload(payload):
+            # determines the record checksum
+            r_key = hashlib.blake2b(payload, digest_size=16).hexdigest()
+
+            # outputs the record (only if the record has been altered)
+            if r_key not in rec_info:
+                rec_info[r_key] = (fw.tell(), len(payload))
+                fw.write(payload)
+
+            return r_key
+
+        # outputs the experiment/filtered cluster records
+        c_data = data.__dict__
+        layout = {
+            'version': store_version,
+            'expt': [(get_expt_name(c, i), write_record(c)) for i, c in enumerate(c_data.get('_cluster', []))],
+            'clust': None if c_data.get('cluster') is None else [write_record(c) for c in c_data['cluster']],
+        }
+
+        # outputs the other data fields. each result/data field is a separate record, except for fields which share
+        # objects (e.g., the exclusion filters), which are output to the same record. otherwise, the shared objects
+        # would be read back as separate copies. the experiment/filtered cluster records are always kept separate
+        f_data = {k: v for k, v in c_data.items() if k not in ['_cluster', 'cluster']}
+        f_payload, f_group = get_field_payloads(f_data)
+
+        layout['fields'], layout['group'] = {}, {}
+        for f_grp in f_group:
+            if len(f_grp) == 1:
+                # case is a field which doesn't share objects with any other field
+                layout['fields'][f_grp[0]] = write_payload(f_payload[f_grp[0]])
+            else:
+                # case is a group of fields which share objects
+                r_key = write_record({k: f_data[k] for k in f_grp})
+                layout['group'][r_key] = f_grp
+                layout['fields'].update({k: r_key for k in f_grp})
+
+        # outputs the data object (with the data fields removed)
+        d_shell = copy.copy(data)
+        d_shell.__dict__ = {}
+        layout['shell'] = write_record(d_shell)
+
+        # removes any unused records from the index
+        r_live = set(layout['fields'].values()) | set([x[1] for x in layout['expt']]) | set(layout['clust'] or [])
+        r_live.add(layout['shell'])
+        rec_info = {k: rec_info[k] for k in r_live}
+
+        # outputs the record index and file footer
+        write_segment_index(fw, {'layout': layout, 'records': rec_info})
+        fw.flush()
+        os.fsync(fw.fileno())
+        n_file = fw.tell()
+
+    if not is_append:
+        # replaces the original file
+        os.replace(out_file, f_name)
+
+    elif n_file > r_compact * sum([x[1] for x in rec_info.values()]) + (1 << 20):
+        # if there are too many unused records within the file, then compact the file
+        compact_segment_file(f_name)
+
+
+def get_field_payloads(f_data):
+    '''
+
+    :param f_data:
+    :return:
+    '''
+
+    # memory allocation
+    f_payload, obj_ref, obj_fld = {}, [], {}
+    f_link = {k: k for k in f_data}
+
+    def get_group_field(k):
+        # determines the field that the field's group is linked to
+        while f_link[k] != k:
+            k = f_link[k]
+
+        return k
+
+    for k, v in f_data.items():
+        # pickles the field (recording the objects that are pickled)
+        with io.BytesIO() as fw:
+            r_pkl = RecordPickler(fw, obj_ref)
+            r_pkl.dump(v)
+            f_payload[k] = fw.getvalue()
+
+        # links the field to the groups of any previous fields that share an object with it
+        for obj_id in r_pkl.obj_id:
+            if obj_id in obj_fld:
+                k_grp, k_grp_prev = get_group_field(k), get_group_field(obj_fld[obj_id])
+                if k_grp != k_grp_prev:
+                    f_link[k_grp] = k_grp_prev
+            else:
+                obj_fld[obj_id] = k
+
+    # sets the field groups (in the original field order)
+    f_group = OrderedDict()
+    for k in f_data:
+        f_group.setdefault(get_group_field(k), []).append(k)
+
+    # returns the field payloads and groups
+    return f_payload, list(f_group.values())
+
+
+def compact_segment_file(f_name):
+    '''
+
+    :param f_name:
+    :return:
+    '''
+
+    # initialisations
+    tmp_name = '{0}.tmp'.format(f_name)
+
+    with open(f_name, 'rb') as fp, open(tmp_name, 'wb') as fw:
+        # reads the record index
+        s_index = read_segment_index(fp)
+        fw.write(seg_magic)
+
+        # copies the current records over to the new file
+        rec_info = {}
+        for r_key in s_index['records']:
+            rec_info[r_key] = (fw.tell(), s_index['records'][r_key][1])
+            fw.write(read_segment_record(fp, s_index['records'], r_key))
+
+        # outputs the record index and file footer
+        write_segment_index(fw, {'layout': s_index['layout'], 'records': rec_info})
+        fw.flush()
+        os.fsync(fw.fileno())
+
+    # replaces the original file
+    os.replace(tmp_name, f_name)
+
+
+def load_segment_file(f_name, expt=None, fields=None):
+    '''
+
+    :param f_name:
+    :param expt:
+    :param fields:
+    :return:
+    '''
+
+    with open(f_name, 'rb') as fp:
+        # reads the file record index
+        s_index = read_segment_index(fp)
+        layout, rec_info = s_index['layout'], s_index['records']
+        read_obj = lambda r_key: p.loads(read_segment_record(fp, rec_info, r_key))
+
+        # determines the experiments that are to be read
+        i_expt = [i for i, x in enumerate(layout['expt']) if (expt is None) or (x[0] in expt)]
+
+        # reads the data object and the other data fields (fields which share objects are read from the same record)
+        data, r_group = read_obj(layout['shell']), {}
+        for k, r_key in layout['fields'].items():
+            if (fields is None) or (k in fields):
+                if r_key in layout.get('group', {}):
+                    # case is a field group (the group record is only read once)
+                    if r_key not in r_group:
+                        r_group[r_key] = read_obj(r_key)
+
+                    setattr(data, k, r_group[r_key][k])
+                else:
+                    # case is a separate field
+                    setattr(data, k, read_obj(r_key))
+
+        # reads the experiment data
+        if (fields is None) or ('_cluster' in fields):
+            data._cluster = [read_obj(layout['expt'][i][1]) for i in i_expt]
+
+        # reads the filtered cluster data
+        if (fields is None) or ('cluster' in fields):
+            if layout['clust'] is None:
+                data.cluster = None
+            else:
+                data.cluster = [read_obj(layout['clust'][i]) for i in i_expt]
+
+    # returns the data object
+    return data
+
+
+def read_segment_info(f_name):
+    '''
+
+    :param f_name:
+    :return:
+    '''
+
+    with open(f_name, 'rb') as fp:
+        layout = read_segment_index(fp)['layout']
+
+    # returns the experiment names and data field names
+    return [x[0] for x in layout['expt']], list(layout['fields'].keys())
+
+
+def read_segment_record(fp, rec_info, r_key):
+    '''
+
+    :param fp:
+    :param rec_info:
+    :param r_key:
+    :return:
+    '''
+
+    # reads the record from file
+    fp.seek(rec_info[r_key][0])
+    payload = fp.read(rec_info[r_key][1])
+
+    # ensures the record checksum is correct
+    if hashlib.blake2b(payload, digest_size=16).hexdigest() != r_key:
+        raise IOError('Data file record is corrupt: {0}'.format(r_key))
+
+    # returns the record
+    return payload
+
+
+def write_segment_index(fw, s_index):
+    '''
+
+    :param fw:
+    :param s_index:
+    :return:
+    '''
+
+    # outputs the record index
+    i_ofs, payload = fw.tell(), p.dumps(s_index, protocol=p.HIGHEST_PROTOCOL)
+    fw.write(payload)
+
+    # outputs the file footer (this points to the record index)
+    fw.write(seg_footer.pack(seg_foot_magic, i_ofs, len(payload), hashlib.blake2b(payload, digest_size=16).digest()))
+
+
+def read_segment_index(fp, n_blk=1 << 20):
+    '''
+
+    :param fp:
+    :param n_blk:
+    :return:
+    '''
+
+    def read_index(i_foot):
+        # reads the footer and the record index it points to
+        fp.seek(i_foot)
+        f_magic, i_ofs, n_index, i_digest = seg_footer.unpack(fp.read(seg_footer.size))
+        if (f_magic != seg_foot_magic) or (i_ofs + n_index > i_foot):
+            return None
+
+        fp.seek(i_ofs)
+        payload = fp.read(n_index)
+        if hashlib.blake2b(payload, digest_size=16).digest() != i_digest:
+            return None
+        else:
+            return p.loads(payload)
+
+    # reads the record index from the footer at the end of the file
+    n_file = fp.seek(0, os.SEEK_END)
+    s_index = read_index(n_file - seg_footer.size) if n_file >= seg_footer.size + len(seg_magic) else None
+
+    # if the last save was incomplete, then search back through the file for the last complete footer
+    i_end = n_file
+    while (s_index is None) and (i_end > len(seg_magic)):
+        i_start = max(len(seg_magic), i_end - n_blk)
+        fp.seek(i_start)
+        f_blk = fp.read(i_end - i_start + len(seg_foot_magic) - 1)
+
+        i_foot = f_blk.rfind(seg_foot_magic)
+        while (s_index is None) and (i_foot >= 0):
+            if i_start + i_foot + seg_footer.size <= n_file:
+                s_index = read_index(i_start + i_foot)
+
+            i_foot = f_blk.rfind(seg_foot_magic, 0, i_foot)
+
+        i_end = i_start
+
+    if s_index is None:
+        raise IOError('No valid record index was found within the data file')
+
+    # returns the record index
+    return s_index
+
+
+def get_expt_name(c, i_expt):
+    '''
+
+    :param c:
+    :param i_expt:
+    :return:
+    '''
+
+    if isinstance(c, dict) and ('expFile' in c):
+        return os.path.splitext(os.path.basename(c['expFile']))[0]
+    else:
+        return str(i_expt)
+
+########################################################################################################################
+####                                        BUFFER DATA FILE FUNCTIONS                                             ####
+########################################################################################################################
+
+
+def is_buffer_file(f_name):
+    '''
+
+    :param f_name:
+    :return:
+    '''
+
+    with open(f_name, 'rb') as fp:
+        return fp.read(len(buf_magic)) == buf_magic
+
+
+def save_buffer_file(f_name, data, compress=False, n_chunk=1 << 24):
+    '''
+
+    :param f_name:
+    :param data:
+    :param compress:
+    :param n_chunk:
+    :return:
+    '''
+
+    # pickles the data object (the large array buffers are kept out-of-band so they aren't copied)
+    buf_data = []
+    payload = p.dumps(data, protocol=5, buffer_callback=buf_data.append)
+
+    with open(f_name, 'wb') as fw:
+        # outputs the file header and the pickled data object
+        fw.write(buf_magic)
+        fw.write(buf_header.pack(len(payload), len(buf_data), int(compress)))
+        fw.write(payload)
+
+        # outputs the array buffers
+        for b in buf_data:
+            b_raw = b.raw()
+            fw.write(buf_size.pack(b_raw.nbytes))
+            if compress:
+                # case is the buffers are compressed (each chunk is compressed separately)
+                for i_ofs in range(0, b_raw.nbytes, n_chunk):
+                    b_comp = zlib.compress(b_raw[i_ofs:(i_ofs + n_chunk)], 1)
+                    fw.write(buf_size.pack(len(b_comp)))
+                    fw.write(b_comp)
+            else:
+                # case is the buffers are output directly
+                fw.write(b_raw)
+
+            b.release()
+
+
+def load_buffer_file(f_name):
+    '''
+
+    :param f_name:
+    :return:
+    '''
+
+    with open(f_name, 'rb') as fp:
+        # reads the file header and the pickled data object
+        fp.seek(len(buf_magic))
+        n_payload, n_buf, is_comp = buf_header.unpack(fp.read(buf_header.size))
+        payload = fp.read(n_payload)
+
+        # reads the array buffers
+        buf_data = []
+        for _ in range(n_buf):
+            n_raw = buf_size.unpack(fp.read(buf_size.size))[0]
+            b_raw, i_ofs = bytearray(n_raw), 0
+            if is_comp:
+                # case is the buffers are compressed
+                while i_ofs < n_raw:
+                    b_chunk = zlib.decompress(fp.read(buf_size.unpack(fp.read(buf_size.size))[0]))
+                    b_raw[i_ofs:(i_ofs + len(b_chunk))] = b_chunk
+                    i_ofs += len(b_chunk)
+            else:
+                # case is the buffers are read directly into memory
+                b_view = memoryview(b_raw)
+                while i_ofs < n_raw:
+                    n_read = fp.readinto(b_view[i_ofs:])
+                    if n_read == 0:
+                        raise IOError('Data file is truncated: {0}'.format(f_name))
+
+                    i_ofs += n_read
+
+            buf_data.append(b_raw)
+
+    # returns the data object (the arrays use the buffer memory directly)
+    return p.loads(payload, buffers=buf_data)
+
+
+def calc_buffer_file_throughput(data, f_name, n_rep=3):
+    '''
+
+    :param data:
+    :param f_name:
+    :param n_rep:
+    :return:
+    '''
+
+    def save_pickle(f, x):
+        with open(f, 'wb') as fw:
+            p.dump(x, fw)
+
+    def load_pickle(f):
+        with open(f, 'rb') as fp:
+            return p.load(fp)
+
+    # serialisation methods to be tested
+    s_type = {
+        'Pickle (Default)': (save_pickle, load_pickle),
+        'Pickle 5 (Out-of-Band)': (lambda f, x: save_buffer_file(f, x), load_buffer_file),
+        'Pickle 5 (Out-of-Band, Compressed)': (lambda f, x: save_buffer_file(f, x, True), load_buffer_file),
+    }
+
+    # calculates the read/write throughput for each method (in MB/s, using the best time over all repetitions)
+    t_perf = {}
+    for s_name, (save_fcn, load_fcn) in s_type.items():
+        t_write, t_read = np.inf, np.inf
+        for _ in range(n_rep):
+            t0 = time.perf_counter()
+            save_fcn(f_name, data)
+            t1 = time.perf_counter()
+            load_fcn(f_name)
+            t2 = time.perf_counter()
+            t_write, t_read = min(t_write, t1 - t0), min(t_read, t2 - t1)
+
+        # sets the data size, file size and throughput values
+        n_data, n_file = len(p.dumps(data, protocol=p.HIGHEST_PROTOCOL)), os.path.getsize(f_name)
+        t_perf[s_name] = {'file_mb': n_file / 2 ** 20,
+                          'write_mbs': n_data / 2 ** 20 / t_write, 'read_mbs': n_data / 2 ** 20 / t_read}
+
+    # removes the test file and returns the throughput values
+    os.remove(f_name)
+    return t_perf
+
+########################################################################################################################
+####                                          FILE CONVERSION FUNCTIONS                                            ####
+########################################################################################################################
+
+
+def convert_cdata_file(f_in, f_out=None, compress=False):
+    '''
+
+    :param f_in:
+    :param f_out:
+    :param compress:
+    :return:
+    '''
+
+    # if the file is already a data store file, then exit
+    if is_data_store(f_in):
+        return False
+
+    # loads the pickled data from the original file
+    with open(f_in, 'rb') as fp:
+        data = p.load(fp)
+
+    # outputs the data to a temporary data store file
+    f_out = f_in if f_out is None else f_out
+    f_conv = '{0}.conv'.format(f_out)
+    save_data_store(f_conv, data, compress=compress)
+
+    # ensures the converted data matches the original data (the output file is only replaced if this is the case)
+    if not is_data_equal(data, load_data_store(f_conv, mmap_mode=None)):
+        os.remove(f_conv)
+        raise ValueError('Converted data file does not match the original file: {0}'.format(f_in))
+
+    # replaces the output file with the converted file
+    os.replace(f_conv, f_out)
+
+    # returns a flag indicating the file was converted
+    return True
+
+
+def is_data_equal(x1, x2):
+    '''
+
+    :param x1:
+    :param x2:
+    :return:
+    '''
+
+    if type(x1) != type(x2):
+        # case is the object types are different
+        return False
+
+    elif isinstance(x1, np.ndarray) and (type(x1) not in [np.ndarray, np.memmap]):
+        # case is an array sub-class (the array values and the sub-class fields, e.g. masks, are compared)
+        return is_data_equal(np.asarray(x1), np.asarray(x2)) and is_data_equal(vars(x1), vars(x2))
+
+    elif isinstance(x1, np.ndarray):
+        # case is an array
+        if (x1.dtype != x2.dtype) or (x1.shape != x2.shape):
+            return False
+        elif x1.dtype.hasobject:
+            return all([is_data_equal(x1[i], x2[i]) for i in np.ndindex(x1.shape)])
+        else:
+            return np.array_equal(x1, x2, equal_nan=(x1.dtype.kind in 'fc'))
+
+    elif isinstance(x1, dict):
+        # case is a dictionary
+        return (list(x1.keys()) == list(x2.keys())) and all([is_data_equal(x1[k], x2[k]) for k in x1])
+
+    elif type(x1) in [list, tuple]:
+        # case is a list/tuple
+        return (len(x1) == len(x2)) and all([is_data_equal(_x1, _x2) for _x1, _x2 in zip(x1, x2)])
+
+    else:
+        # case is any other object type (the pickled objects are compared)
+        return p.dumps(x1, protocol=p.HIGHEST_PROTOCOL) == p.dumps(x2, protocol=p.HIGHEST_PROTOCOL)
+
+
+if __name__ == '__main__':
+    # converts the pickled cluster data files provided on the command line
+    import sys
+    for f in sys.argv[1:]:
+        print('{0}: {1}'.format(f, 'Converted' if convert_cdata_file(f) else 'Already Converted'))
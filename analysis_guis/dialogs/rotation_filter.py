@@ -2,6 +2,7 @@
 import copy
 import functools
 import numpy as np
+from collections import OrderedDict
 
 # pyqt5 module import
 from PyQt5.QtCore import QRect, Qt
@@ -748,27 +749,33 @@ class RotationFilteredData(object):
         self.n_trial, self.s_freq, self.t_spike, self.i_expt = dcopy(A), dcopy(A), dcopy(A), dcopy(A)
         for i_filt in range(self.n_filt):
             if len(self.i_expt0[i_filt]):
-                for ii, j_expt in enumerate(self.i_expt0[i_filt]):
-                    # sets the number of cells
-                    nC = n_cell[i_filt][ii]
-
-                    # stores the spike times for the current filter/experiment
-                    tSp = self.t_spike0[i_filt][ii] / s_freq[i_filt][ii]
-                    if self.is_single_cell:
-                        tSp = tSp[clust_ind[i_filt][ii], :, :]
-                    self.t_spike[i_filt] = cf.combine_nd_arrays(self.t_spike[i_filt], tSp)
-
-                    # sets the values for the other field values
-                    if ii == 0:
-                        # case is the storage array is empty, so assign the values
-                        self.n_trial[i_filt] = np.array([n_trial[i_filt][ii]] * nC)
-                        self.s_freq[i_filt] = np.array([s_freq[i_filt][ii]] * nC)
-                        self.i_expt[i_filt] = np.array([j_expt] * nC, dtype=int)
-                    else:
-                        # otherwise, append the new values to the existing arrays
-                        self.n_trial[i_filt] = np.append(self.n_trial[i_filt], np.array([n_trial[i_filt][ii]] * nC))
-                        self.s_freq[i_filt] = np.append(self.s_freq[i_filt], np.array([s_freq[i_filt][ii]] * nC))
-                        self.i_expt[i_filt] = np.append(self.i_expt[i_filt] , np.array([j_expt] * nC, dtype=int))
+                # retrieves the spike time arrays for each experiment within the filter
+                if self.is_single_cell:
+                    t_sp0 = [x[y, :, :] for x, y in zip(self.t_spike0[i_filt], clust_ind[i_filt])]
+                else:
+                    t_sp0 = list(self.t_spike0[i_filt])
+
+                # determines the dimensions of the combined spike time array (trials are padded to the max count)
+                sz_sp = np.array([np.shape(x) for x in t_sp0])
+                n_row, n_trial_max, n_ph = np.sum(sz_sp[:, 0]), np.max(sz_sp[:, 1]), sz_sp[0, 2]
+                i_row = np.cumsum([0] + list(sz_sp[:, 0]))
+
+                # sets the spike time arrays for each experiment into the combined array
+                t_sp = np.empty((n_row, n_trial_max, n_ph), dtype=object)
+                for ii, x in enumerate(t_sp0):
+                    t_sp[i_row[ii]:i_row[ii + 1], :sz_sp[ii, 1], :] = x
+
+                # converts the spike times (for all cells/trials/phases) from sample indices to time
+                x_sp, n_sp, is_set = cf.flatten_ragged_array(t_sp)
+                s_freq_sp = np.repeat(np.repeat(np.array(s_freq[i_filt], dtype=float), sz_sp[:, 0]), n_trial_max * n_ph)
+                self.t_spike[i_filt] = cf.setup_ragged_array(x_sp / np.repeat(s_freq_sp, n_sp), n_sp, is_set,
+                                                             np.shape(t_sp))
+
+                # sets the values for the other field values
+                nC = np.array(n_cell[i_filt], dtype=int)
+                self.n_trial[i_filt] = np.repeat(np.array(n_trial[i_filt], dtype=int), nC)
+                self.s_freq[i_filt] = np.repeat(np.array(s_freq[i_filt]), nC)
+                self.i_expt[i_filt] = np.repeat(np.array(self.i_expt0[i_filt], dtype=int), nC)
             else:
                 # if there are no elements in the array
                 self.n_trial[i_filt], self.s_freq[i_filt] = [], []
@@ -857,20 +864,19 @@ class RotationFilteredData(object):
                     n_cell, n_trial, n_phase = np.shape(self.t_spike[i_filt])
                     self.t_phase[i_filt][0] = self._t_phase
 
-                    #
-                    for i_phase in range(n_phase):
-                        for i_trial in range(n_trial):
-                            for i_cell in range(n_cell):
-                                # reshapes the other time-spike arrays
-                                t_sp = self.t_spike[i_filt][i_cell, i_trial, i_phase]
-                                if t_sp is not None:
-                                    if i_phase == 0:
-                                        ii = t_sp >= (t_phase0 - self._t_phase)
-                                    else:
-                                        ii = np.logical_and(t_sp >= self._t_ofs, t_sp <= (self._t_ofs + self._t_phase))
-
-                                    self.t_spike[i_filt][i_cell, i_trial, i_phase] = \
-                                                            self.t_spike[i_filt][i_cell, i_trial, i_phase][ii]
+                    # flattens the spike times and sets the phase/element index of each spike
+                    t_sp, n_sp, is_set = cf.flatten_ragged_array(self.t_spike[i_filt])
+                    i_ele = np.repeat(np.arange(len(n_sp)), n_sp)
+                    is_bl = (i_ele % n_phase) == 0
+
+                    # determines the spikes within the baseline (end of phase) or stimuli (offset/duration) windows
+                    is_keep = np.where(is_bl, t_sp >= (t_phase0 - self._t_phase),
+                                       np.logical_and(t_sp >= self._t_ofs, t_sp <= (self._t_ofs + self._t_phase)))
+
+                    # resets the spike time arrays with the reduced spike times
+                    n_sp_keep = np.bincount(i_ele[is_keep], minlength=len(n_sp))
+                    self.t_spike[i_filt] = cf.setup_ragged_array(t_sp[is_keep], n_sp_keep, is_set,
+                                                                 (n_cell, n_trial, n_phase))
 
     #######################################
     ####    MISCELLANEOUS FUNCTIONS    ####
@@ -884,4 +890,160 @@ class RotationFilteredData(object):
         :return:
         '''
 
-        return [y if (t_key[x] is None) else t_key[x][y] for x, y in zip(f_key, f_perm)]
\ No newline at end of file
+        return [y if (t_key[x] is None) else t_key[x][y] for x, y in zip(f_key, f_perm)]
+
+########################################################################################################################
+########################################################################################################################
+
+
+class RotationFilteredDataCache(object):
+    def __init__(self, n_max=20, mem_max=1024):
+
+        # initialisations
+        self.n_max = n_max
+        self.mem_max = mem_max
+        self.r_obj = OrderedDict()
+        self.r_size = OrderedDict()
+
+        # other initialisations
+        self.n_hit = 0
+        self.n_miss = 0
+
+    def get_data(self, data, rot_filt, cell_id, plot_exp_name, plot_all_expt, plot_scope, is_ud, **kwargs):
+        '''
+
+        :param data:
+        :param rot_filt:
+        :param cell_id:
+        :param plot_exp_name:
+        :param plot_all_expt:
+        :param plot_scope:
+        :param is_ud:
+        :param kwargs:
+        :return:
+        '''
+
+        # determines the key for the current filter/plotting configuration
+        r_key = self.get_key(data, rot_filt, cell_id, plot_exp_name, plot_all_expt, plot_scope, is_ud, **kwargs)
+        if r_key in self.r_obj:
+            # if the filtered data has already been calculated, then move it to the end of the queue
+            self.n_hit += 1
+            self.r_obj.move_to_end(r_key)
+            self.r_size.move_to_end(r_key)
+        else:
+            # otherwise, create the filtered data object
+            self.n_miss += 1
+            r_obj = RotationFilteredData(data, rot_filt, cell_id, plot_exp_name, plot_all_expt, plot_scope, is_ud,
+                                         **kwargs)
+
+            # only store the filtered data if it was created successfully
+            if not r_obj.is_ok:
+                return r_obj
+
+            # stores the filtered data and removes any entries that exceed the count/memory limits
+            self.r_obj[r_key], self.r_size[r_key] = r_obj, self.calc_size(r_obj)
+            self.reduce_cache()
+
+            # if the new object was removed from the cache (too large), then return the original object
+            if r_key not in self.r_obj:
+                return r_obj
+
+        # returns a shallow copy of the stored object (so field resets do not alter the stored values)
+        r_obj = copy.copy(self.r_obj[r_key])
+        r_obj.rot_filt = rot_filt if rot_filt is not None else r_obj.rot_filt
+        return r_obj
+
+    def get_key(self, data, rot_filt, cell_id, plot_exp_name, plot_all_expt, plot_scope, is_ud, **kwargs):
+        '''
+
+        :param data:
+        :param rot_filt:
+        :param cell_id:
+        :param plot_exp_name:
+        :param plot_all_expt:
+        :param plot_scope:
+        :param is_ud:
+        :param kwargs:
+        :return:
+        '''
+
+        # sets the loaded data version (the data object id and the current data update index)
+        data_ver = [id(data), id(data.cluster), getattr(data, 'data_ver', 0)]
+
+        # returns the canonical hash of the filter/plotting configuration
+        return cf.get_canonical_hash(rot_filt, cell_id, plot_exp_name, bool(plot_all_expt), plot_scope,
+                                     bool(is_ud), kwargs, data_ver)
+
+    def reduce_cache(self):
+        '''
+
+        :return:
+        '''
+
+        # removes the least recently used objects until the object count/memory size is within the limits
+        while len(self.r_obj) and ((len(self.r_obj) > self.n_max) or (self.get_cache_size() > self.mem_max)):
+            r_key = next(iter(self.r_obj))
+            self.r_obj.pop(r_key)
+            self.r_size.pop(r_key)
+
+    def clear(self):
+        '''
+
+        :return:
+        '''
+
+        # clears all the stored filtered data objects
+        self.r_obj.clear()
+        self.r_size.clear()
+
+    def get_cache_size(self):
+        '''
+
+        :return:
+        '''
+
+        # returns the total size of the stored filtered data objects (in MB)
+        return sum(self.r_size.values())
+
+    @staticmethod
+    def calc_size(r_obj):
+        '''
+
+        :param r_obj:
+        :return:
+        '''
+
+        # returns the size (in MB) of the spike time arrays (these make up the bulk of the object memory)
+        return (cf.calc_object_size(r_obj.t_spike) + cf.calc_object_size(r_obj.t_spike0)) / 2 ** 20
+
+
+# the rotation filtered data object cache
+r_obj_cache = RotationFilteredDataCache()
+
+
+def get_rotation_filtered_data(data, rot_filt, cell_id, plot_exp_name, plot_all_expt, plot_scope, is_ud, **kwargs):
+    '''
+
+    :param data:
+    :param rot_filt:
+    :param cell_id:
+    :param plot_exp_name:
+    :param plot_all_expt:
+    :param plot_scope:
+    :param is_ud:
+    :param kwargs:
+    :return:
+    '''
+
+    # retrieves the filtered data object from the cache (creates it if not already stored)
+    return r_obj_cache.get_data(data, rot_filt, cell_id, plot_exp_name, plot_all_expt, plot_scope, is_ud, **kwargs)
+
+
+def clear_rotation_filtered_data():
+    '''
+
+    :return:
+    '''
+
+    # clears the rotation filtered data object cache
+    r_obj_cache.clear()
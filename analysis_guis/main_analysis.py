@@ -76,7 +76,8 @@ import analysis_guis.calc_functions as cfcn
 import analysis_guis.rotational_analysis as rot
 from analysis_guis.dialogs.file_dialog import FileDialogModal
 from analysis_guis.dialogs import load_expt, config_dialog, expt_compare
-from analysis_guis.dialogs.rotation_filter import RotationFilter, RotationFilteredData
+from analysis_guis.dialogs.rotation_filter import (RotationFilter, RotationFilteredData, get_rotation_filtered_data,
+                                                   clear_rotation_filtered_data)
 from analysis_guis.dialogs.info_dialog import InfoDialog, ParaFieldDialog
 from analysis_guis.dialogs.lda_para import LDASolverPara
 from analysis_guis.threads import thread_workers
@@ -163,6 +164,9 @@ class AnalysisGUI(QMainWindow):
             # otherwise, set the initial data to None
             self.def_data = self.init_def_data()
 
+        # sets the spike count tensor disk cache directory (within the user cache directory)
+        cfcn.sp_count_cache.set_cache_dir(cf.get_user_cache_dir('Spike Count Cache'))
+
         # initialises each part of the analysis GUI
         self.init_main_window()
         self.init_expt_info()
@@ -822,6 +826,9 @@ class AnalysisGUI(QMainWindow):
                 if not hasattr(self.data, 'force_calc'):
                     self.data.force_calc = False
 
+                # updates the loaded data version (clears any previously filtered rotation data)
+                self.data.update_data_ver()
+
                 # determines which experimental types are available
                 has_rot_expt = any(cf.det_valid_rotation_expt(self.data))
                 has_vis_expt, has_ud_expt, has_md_expt = cf.det_valid_vis_expt(self.data)
@@ -916,6 +923,9 @@ class AnalysisGUI(QMainWindow):
                 self.calc_cancel = False
                 self.data.force_calc = False
 
+                # updates the data version (calculated classification/matching data can alter the filtered cells)
+                self.data.update_data_ver()
+
                 # sets the data based on the calculation function that was run
                 if self.worker[iw].thread_job_secondary == 'Cluster Cross-Correlogram':
                     # case is calculating the cross-correlogram
@@ -2001,7 +2011,8 @@ class AnalysisGUI(QMainWindow):
             if self.worker[iw].thread_job_primary == 'run_calc_func':
                 self.calc_cancel = True
 
-            # terminates the worker object and updates the GUI properties
+            # terminates the worker object (and any of its pool tasks) and updates the GUI properties
+            self.worker[iw].cancel_pool_jobs()
             self.worker[iw].terminate()
             self.finished_thread_job(iw)
             self.worker[iw].wait()
@@ -4876,7 +4887,7 @@ class AnalysisGUI(QMainWindow):
         r_data = self.data.rotation
 
         # if there was an error setting up the rotation calculation object, then exit the function with an error
-        r_obj_wc = RotationFilteredData(self.data, rot_filt, None, None, True, 'Whole Experiment', False)
+        r_obj_wc = get_rotation_filtered_data(self.data, rot_filt, None, None, True, 'Whole Experiment', False)
         if not r_obj_wc.is_ok:
             self.calc_ok = False
             return
@@ -5161,7 +5172,7 @@ class AnalysisGUI(QMainWindow):
             ###################################
 
             # if there was an error setting up the rotation calculation object, then exit the function with an error
-            r_obj_wc = RotationFilteredData(self.data, rot_filt, None, None, True, 'Whole Experiment', False)
+            r_obj_wc = get_rotation_filtered_data(self.data, rot_filt, None, None, True, 'Whole Experiment', False)
             if not r_obj_wc.is_ok:
                 self.calc_ok = False
                 return
@@ -5401,7 +5412,7 @@ class AnalysisGUI(QMainWindow):
             ###################################
 
             # if there was an error setting up the rotation calculation object, then exit the function with an error
-            r_obj_wc = RotationFilteredData(self.data, rot_filt, None, None, True, 'Whole Experiment', False)
+            r_obj_wc = get_rotation_filtered_data(self.data, rot_filt, None, None, True, 'Whole Experiment', False)
             if not r_obj_wc.is_ok:
                 # if there was an error, then exit with an error flag
                 self.calc_ok = False
@@ -6034,7 +6045,7 @@ class AnalysisGUI(QMainWindow):
         '''
 
         # applies the rotation filter to the dataset
-        r_obj = RotationFilteredData(self.data, rot_filt, i_cluster, plot_exp_name, plot_all_expt, plot_scope, False)
+        r_obj = get_rotation_filtered_data(self.data, rot_filt, i_cluster, plot_exp_name, plot_all_expt, plot_scope, False)
         self.create_spike_heatmap(r_obj, norm_type, mean_type, sort_cond, sort_type_ahv, dt, float(dv), hist_type)
 
     #############################################
@@ -6050,7 +6061,7 @@ class AnalysisGUI(QMainWindow):
         '''
 
         # applies the rotation filter to the dataset
-        r_obj = RotationFilteredData(self.data, rot_filt, cell_id, plot_exp_name, plot_all_expt, plot_scope, False)
+        r_obj = get_rotation_filtered_data(self.data, rot_filt, cell_id, plot_exp_name, plot_all_expt, plot_scope, False)
         self.create_raster_hist(r_obj, n_bin, show_pref_dir, show_err, plot_grid)
 
     def plot_phase_spike_freq(self, rot_filt, cell_id, plot_exp_name, plot_all_expt, ms_prop, grp_plot_type, plot_scope,
@@ -6067,7 +6078,7 @@ class AnalysisGUI(QMainWindow):
         '''
 
         # applies the rotation filter to the dataset
-        r_obj = RotationFilteredData(self.data, rot_filt, cell_id, plot_exp_name, plot_all_expt, plot_scope, False)
+        r_obj = get_rotation_filtered_data(self.data, rot_filt, cell_id, plot_exp_name, plot_all_expt, plot_scope, False)
 
         # checks to see if the current configuration is feasible (exit function if not)
         if not self.check_group_plot_feas(grp_plot_type, grp_by_filt, show_stats):
@@ -6091,7 +6102,7 @@ class AnalysisGUI(QMainWindow):
         '''
 
         # applies the rotation filter to the dataset
-        r_obj = RotationFilteredData(self.data, rot_filt, cell_id, plot_exp_name, plot_all_expt, plot_scope, False)
+        r_obj = get_rotation_filtered_data(self.data, rot_filt, cell_id, plot_exp_name, plot_all_expt, plot_scope, False)
         self.create_spike_heatmap(r_obj, norm_type, mean_type, sort_cond, sort_type, dt)
 
     def plot_motion_direction_selectivity(self, rot_filt, cell_id, plot_exp_name, plot_all_expt, plot_scope,
@@ -6502,7 +6513,7 @@ class AnalysisGUI(QMainWindow):
             return
 
         # filters the rotational data and runs the analysis function
-        r_obj = RotationFilteredData(self.data, rot_filt, cell_id, plot_exp_name, plot_all_expt, plot_scope, False)
+        r_obj = get_rotation_filtered_data(self.data, rot_filt, cell_id, plot_exp_name, plot_all_expt, plot_scope, False)
         if plot_scope == 'Individual Cell':
             create_single_selectivity_plot(r_obj, plot_grid, rot_filt['t_type'], plot_even_axis)
         else:
@@ -6535,7 +6546,7 @@ class AnalysisGUI(QMainWindow):
             rot_filt = cf.init_rotation_filter_data(False)
 
         # if there was an error setting up the rotation calculation object, then exit the function with an error
-        r_obj = RotationFilteredData(self.data, rot_filt, None, plot_exp_name, plot_all_expt, 'Whole Experiment', False)
+        r_obj = get_rotation_filtered_data(self.data, rot_filt, None, plot_exp_name, plot_all_expt, 'Whole Experiment', False)
         if not r_obj.is_ok:
             self.calc_ok = False
             return
@@ -6823,7 +6834,7 @@ class AnalysisGUI(QMainWindow):
                 return
 
         # applies the rotation filter to the dataset
-        r_obj = RotationFilteredData(self.data, rot_filt, cell_id, plot_exp_name, plot_all_expt, plot_scope, False)
+        r_obj = get_rotation_filtered_data(self.data, rot_filt, cell_id, plot_exp_name, plot_all_expt, plot_scope, False)
         if not r_obj.is_ok:
             # if there was an error setting up the rotation calculation object, then exit the function with an error
             self.calc_ok = False
@@ -7013,7 +7024,7 @@ class AnalysisGUI(QMainWindow):
                 return
 
         # applies the rotation filter to the dataset
-        r_obj = RotationFilteredData(self.data, rot_filt, None, None, True, plot_scope, False)
+        r_obj = get_rotation_filtered_data(self.data, rot_filt, None, None, True, plot_scope, False)
         create_kinematic_plot(r_obj, vel_bin, n_smooth, is_smooth, norm_type, plot_grid)
 
     def plot_overall_direction_bias(self, rot_filt, grp_plot_type, plot_grid, p_value, grp_by_filt, show_stats, plot_scope,
@@ -7063,7 +7074,7 @@ class AnalysisGUI(QMainWindow):
             rot_filt = cf.init_rotation_filter_data(False)
 
         # if there was an error setting up the rotation calculation object, then exit the function with an error
-        r_obj = RotationFilteredData(self.data, rot_filt, None, plot_exp_name, plot_all_expt, 'Whole Experiment', False)
+        r_obj = get_rotation_filtered_data(self.data, rot_filt, None, plot_exp_name, plot_all_expt, 'Whole Experiment', False)
         if not r_obj.is_ok:
             self.calc_ok = False
             return
@@ -7200,7 +7211,7 @@ class AnalysisGUI(QMainWindow):
         '''
 
         # applies the rotation filter to the dataset
-        r_obj = RotationFilteredData(self.data, rot_filt, None, plot_exp_name, plot_all_expt, 'Whole Experiment', False)
+        r_obj = get_rotation_filtered_data(self.data, rot_filt, None, plot_exp_name, plot_all_expt, 'Whole Experiment', False)
         self.create_depth_dirsel_plot(r_obj, plot_grid)
 
     ##################################/##############
@@ -7217,7 +7228,7 @@ class AnalysisGUI(QMainWindow):
         '''
 
         # applies the rotation filter to the dataset
-        r_obj = RotationFilteredData(self.data, rot_filt, cell_id, plot_exp_name, plot_all_expt, plot_scope, True)
+        r_obj = get_rotation_filtered_data(self.data, rot_filt, cell_id, plot_exp_name, plot_all_expt, plot_scope, True)
         self.create_raster_hist(r_obj, n_bin, show_pref_dir, show_err, plot_grid)
 
     def plot_unidrift_spike_freq(self, rot_filt, cell_id, plot_exp_name, plot_all_expt, ms_prop, grp_plot_type,
@@ -7277,7 +7288,7 @@ class AnalysisGUI(QMainWindow):
         '''
 
         # applies the rotation filter to the dataset
-        r_obj = RotationFilteredData(self.data, rot_filt, cell_id, plot_exp_name, plot_all_expt, plot_scope, True)
+        r_obj = get_rotation_filtered_data(self.data, rot_filt, cell_id, plot_exp_name, plot_all_expt, plot_scope, True)
         self.create_spike_heatmap(r_obj, norm_type, mean_type, 'Own Condition', sort_type, dt)
 
     ######################################
@@ -7327,7 +7338,7 @@ class AnalysisGUI(QMainWindow):
             rot_filt = cf.init_rotation_filter_data(False)
 
         # if there was an error setting up the rotation calculation object, then exit the function with an error
-        r_obj = RotationFilteredData(self.data, rot_filt, cell_id, plot_exp_name, False, 'Individual Cell', False)
+        r_obj = get_rotation_filtered_data(self.data, rot_filt, cell_id, plot_exp_name, False, 'Individual Cell', False)
         if not r_obj.is_ok:
             self.calc_ok = False
             return
@@ -7458,7 +7469,7 @@ class AnalysisGUI(QMainWindow):
             rot_filt = cf.init_rotation_filter_data(False)
 
         # if there was an error setting up the rotation calculation object, then exit the function with an error
-        r_obj = RotationFilteredData(self.data, rot_filt, None, plot_exp_name, plot_all_expt, 'Whole Experiment', False)
+        r_obj = get_rotation_filtered_data(self.data, rot_filt, None, plot_exp_name, plot_all_expt, 'Whole Experiment', False)
         if not r_obj.is_ok:
             self.calc_ok = False
             return
@@ -7531,7 +7542,7 @@ class AnalysisGUI(QMainWindow):
         '''
 
         # applies the rotation filter to the dataset
-        r_obj = RotationFilteredData(self.data, rot_filt, i_cluster, plot_exp_name, plot_all_expt, plot_scope, False)
+        r_obj = get_rotation_filtered_data(self.data, rot_filt, i_cluster, plot_exp_name, plot_all_expt, plot_scope, False)
         self.create_spike_heatmap(r_obj, norm_type, mean_type, sort_cond, sort_type_auc, dt)
 
     def plot_velocity_roc_curves_single(self, rot_filt, cell_id, plot_exp_name, vel_y_rng,
@@ -7574,7 +7585,7 @@ class AnalysisGUI(QMainWindow):
             rot_filt = cf.init_rotation_filter_data(False)
 
         # if there was an error setting up the rotation calculation object, then exit the function with an error
-        r_obj = RotationFilteredData(self.data, rot_filt, cell_id, plot_exp_name, False, 'Individual Cell', False)
+        r_obj = get_rotation_filtered_data(self.data, rot_filt, cell_id, plot_exp_name, False, 'Individual Cell', False)
         if not r_obj.is_ok:
             self.calc_ok = False
             return
@@ -7611,7 +7622,7 @@ class AnalysisGUI(QMainWindow):
             # sets up the comparison rotational object
             r_filt_k = cf.init_rotation_filter_data(False)
             r_filt_k['t_type'] = [t_type_base[i_match]]
-            r_obj_k = RotationFilteredData(self.data, r_filt_k, 0, None, True, 'Whole Experiment', False)
+            r_obj_k = get_rotation_filtered_data(self.data, r_filt_k, 0, None, True, 'Whole Experiment', False)
 
             # finds the corresponding cell types between the overall and user-specified filters
             i_cell_b, _ = cf.det_cell_match_indices(r_obj_k, [0, i_filt], r_obj)
@@ -7705,7 +7716,7 @@ class AnalysisGUI(QMainWindow):
             rot_filt = cf.init_rotation_filter_data(False)
 
         # if there was an error setting up the rotation calculation object, then exit the function with an error
-        r_obj = RotationFilteredData(self.data, rot_filt, None, plot_exp_name, plot_all_expt, 'Whole Experiment', False)
+        r_obj = get_rotation_filtered_data(self.data, rot_filt, None, plot_exp_name, plot_all_expt, 'Whole Experiment', False)
         if not r_obj.is_ok:
             self.calc_ok = False
             return
@@ -7743,7 +7754,7 @@ class AnalysisGUI(QMainWindow):
             rot_filt = cf.init_rotation_filter_data(False)
 
         # if there was an error setting up the rotation calculation object, then exit the function with an error
-        r_obj = RotationFilteredData(self.data, rot_filt, None, plot_exp_name, plot_all_expt, 'Whole Experiment', False)
+        r_obj = get_rotation_filtered_data(self.data, rot_filt, None, plot_exp_name, plot_all_expt, 'Whole Experiment', False)
         if not r_obj.is_ok:
             self.calc_ok = False
             return
@@ -7804,7 +7815,7 @@ class AnalysisGUI(QMainWindow):
             rot_filt = cf.init_rotation_filter_data(False)
 
         # if there was an error setting up the rotation calculation object, then exit the function with an error
-        r_obj = RotationFilteredData(self.data, rot_filt, None, plot_exp_name, True, 'Whole Experiment', False)
+        r_obj = get_rotation_filtered_data(self.data, rot_filt, None, plot_exp_name, True, 'Whole Experiment', False)
         if not r_obj.is_ok:
             # sets the exit flag and exits the function
             self.calc_ok = False
@@ -8111,7 +8122,7 @@ class AnalysisGUI(QMainWindow):
             return
 
         # filters the rotational data and runs the analysis function
-        r_obj = RotationFilteredData(self.data, _rot_filt, 0, plot_exp_name, plot_all_expt, 'Whole Experiment', False)
+        r_obj = get_rotation_filtered_data(self.data, _rot_filt, 0, plot_exp_name, plot_all_expt, 'Whole Experiment', False)
         if not r_obj.is_ok:
             self.calc_ok = False
             return
@@ -8312,7 +8323,7 @@ class AnalysisGUI(QMainWindow):
             return
 
         # filters the rotational data and runs the analysis function
-        r_obj = RotationFilteredData(self.data, rot_filt, None, plot_exp_name, plot_all_expt, 'Whole Experiment', False)
+        r_obj = get_rotation_filtered_data(self.data, rot_filt, None, plot_exp_name, plot_all_expt, 'Whole Experiment', False)
         if not r_obj.is_ok:
             self.calc_ok = False
             return
@@ -8333,7 +8344,7 @@ class AnalysisGUI(QMainWindow):
             # sets up a base filter with only the
             r_filt_base = cf.init_rotation_filter_data(False)
             r_filt_base['t_type'] = r_obj.rot_filt_tot[i_filt]['t_type']
-            r_obj_tt[i_filt] = RotationFilteredData(self.data, r_filt_base, None, plot_exp_name,
+            r_obj_tt[i_filt] = get_rotation_filtered_data(self.data, r_filt_base, None, plot_exp_name,
                                             True, 'Whole Experiment', False)
 
             # finds the corresponding cell types between the overall and user-specified filters
@@ -8590,7 +8601,7 @@ class AnalysisGUI(QMainWindow):
             # sets up the comparison rotational object
             r_filt_k = cf.init_rotation_filter_data(False)
             r_filt_k['t_type'] = [t_type_base[i_match]]
-            r_obj_k = RotationFilteredData(self.data, r_filt_k, 0, None, True, 'Whole Experiment', False)
+            r_obj_k = get_rotation_filtered_data(self.data, r_filt_k, 0, None, True, 'Whole Experiment', False)
 
             # finds the corresponding cell types between the overall and user-specified filters
             i_cell_b, _ = cf.det_cell_match_indices(r_obj_k, [0, i_filt], r_obj)
@@ -8912,7 +8923,7 @@ class AnalysisGUI(QMainWindow):
         # creates the rotation filter object (force setting the trial types)
         r_filt_auc = cf.init_rotation_filter_data(False)
         r_filt_auc['t_type'] = tt_auc
-        r_obj_auc_full = RotationFilteredData(self.data, r_filt_auc, None, None, True, 'Whole Experiment', False)
+        r_obj_auc_full = get_rotation_filtered_data(self.data, r_filt_auc, None, None, True, 'Whole Experiment', False)
 
         # sets the base/comparison trial condition cell group type values (for the current match)
         i_cell_auc, r_obj_auc = cfcn.get_common_filtered_cell_indices(self.data, r_obj_auc_full, tt_auc, use_vel)
@@ -9392,7 +9403,7 @@ class AnalysisGUI(QMainWindow):
         data_all = np.empty(n_filt, dtype=object)
 
         # creates the rotation filter object
-        r_obj = RotationFilteredData(self.data, rot_filt, None, None, True, 'Whole Experiment', False)
+        r_obj = get_rotation_filtered_data(self.data, rot_filt, None, None, True, 'Whole Experiment', False)
 
         # combines the data for each filter type
         for i in range(n_filt):
@@ -11701,8 +11712,7 @@ class AnalysisGUI(QMainWindow):
                     # calculates the psychometric curves
                     d_vel, vel_mx = float(float(d_data.vel_bin)), 80.
                     xi_fit = np.arange(d_vel, vel_mx + 0.01, d_vel)
-                    y_acc_fit, _, _, _ = cfcn.calc_psychometric_curves(y_acc_fit, xi_fit, n_cond,
-                                                                       i_fit, d_data.i_bin_spd)
+                    y_acc_fit = cfcn.calc_psychometric_curves(y_acc_fit, xi_fit, n_cond, i_fit, d_data.i_bin_spd)
 
                 ################################
                 ####    SUBPLOT CREATION    ####
@@ -12369,7 +12379,7 @@ class AnalysisGUI(QMainWindow):
 
         # creates the rotational filter object
         free_ctype = rot_filt_final['free_ctype']
-        r_obj = RotationFilteredData(self.data, rot_filt_final, None, None, True, 'Whole Experiment', False)
+        r_obj = get_rotation_filtered_data(self.data, rot_filt_final, None, None, True, 'Whole Experiment', False)
         cl_id = dcopy(r_obj.clust_ind)
 
         # determines the common cell indices for each filter types
@@ -14097,7 +14107,7 @@ class AnalysisGUI(QMainWindow):
             rot_filt = cf.init_rotation_filter_data(False)
 
         # if there was an error setting up the rotation calculation object, then exit the function with an error
-        r_obj = RotationFilteredData(self.data, rot_filt, None, plot_exp_name, plot_all_expt, 'Whole Experiment', False)
+        r_obj = get_rotation_filtered_data(self.data, rot_filt, None, plot_exp_name, plot_all_expt, 'Whole Experiment', False)
         if not r_obj.is_ok:
             self.calc_ok = False
             return
@@ -14617,7 +14627,7 @@ class AnalysisGUI(QMainWindow):
             r_data = self.data.rotation
 
             # applies the rotation filter to the dataset
-            r_obj = RotationFilteredData(self.data, rot_filt, None, None, True, 'Whole Experiment', False)
+            r_obj = get_rotation_filtered_data(self.data, rot_filt, None, None, True, 'Whole Experiment', False)
             lg_str = [lg_fcn(x.split('\n')) for x in r_obj.lg_str]
 
             # retrieves the slope/peak firing rate arrays
@@ -14814,7 +14824,7 @@ class AnalysisGUI(QMainWindow):
             r_data = self.data.rotation
 
             # applies the rotation filter to the dataset
-            r_obj = RotationFilteredData(self.data, rot_filt, None, None, True, 'Whole Experiment', False)
+            r_obj = get_rotation_filtered_data(self.data, rot_filt, None, None, True, 'Whole Experiment', False)
             lg_str, n_cond, c_id = [lg_fcn(x.split('\n')) for x in r_obj.lg_str], r_obj.n_filt, r_obj.cl_id
             x_tick_lbl = ['#{0} - {1}'.format(i+1,lg_fcn_cr(x.split('\n'))) for i, x in enumerate(r_obj.lg_str)]
             col_hdr, n_filt_ax = ['#{0}'.format(i+1) for i in range(len(r_obj.lg_str))], r_obj.n_filt
@@ -15272,7 +15282,7 @@ class AnalysisGUI(QMainWindow):
 
         # if there was an error setting up the rotation calculation object, then exit the function with an error
         # rot_filt_corr = cf.init_rotation_filter_data(False)
-        r_obj_wc = RotationFilteredData(self.data, rot_filt, None, None, True, 'Whole Experiment', False)
+        r_obj_wc = get_rotation_filtered_data(self.data, rot_filt, None, None, True, 'Whole Experiment', False)
         if not r_obj_wc.is_ok:
             # if there was an error, then exit with an error flag
             self.calc_ok = False
@@ -15339,7 +15349,7 @@ class AnalysisGUI(QMainWindow):
             tt_key_rev['Black'] = 'DARK'
 
         # retrieves the rotation filter class object
-        r_obj_wc = RotationFilteredData(self.data, rot_filt, None, None, True, 'Whole Experiment', False, rmv_empty=0)
+        r_obj_wc = get_rotation_filtered_data(self.data, rot_filt, None, None, True, 'Whole Experiment', False, rmv_empty=0)
 
         # determines the indices of the experiments (matching the fixed experiments to free experiments)
         i_fix0 = np.where(cf.det_valid_rotation_expt(self.data))[0]
@@ -16526,6 +16536,7 @@ class AnalysisGUI(QMainWindow):
         # sets a copy of the data class
         self.update_thread_job('Removing Excluded Cells...', 0.)
         self.data.cluster = dcopy(self.data._cluster)
+        self.data.update_data_ver()
 
         # if the function is not
         for i, c in enumerate(self.data.cluster):
@@ -16716,6 +16727,7 @@ class AnalysisFunctions(object):
         # initialisations
         is_split = True
         m_type = ['New Method', 'Old Method']
+        match_solver = ['Optimal', 'Greedy']
         scope_txt = ['Individual Cell', 'Whole Experiment']
         plt_list = ['Intersection', 'Wasserstein Distance', 'Bhattacharyya Distance']
         vel_dir = ['Negative', 'Positive']
@@ -16820,6 +16832,13 @@ class AnalysisFunctions(object):
                 'gtype': 'C', 'text': 'ISI Score Weight', 'def_val': def_clust_para['w_isi'],
                 'min_val': 0.0, 'max_val': 1.0
             },
+            'match_solver': {
+                'gtype': 'C', 'type': 'L', 'text': 'Cluster Match Solver', 'def_val': match_solver[0],
+                'list': match_solver
+            },
+            'match_score_min': {
+                'gtype': 'C', 'text': 'Min Cluster Match Score', 'def_val': 0.0, 'min_val': 0.0
+            },
 
             # plotting parameters
             'cell_id': {
@@ -22933,6 +22952,18 @@ class AnalysisData(object):
         self.req_update = True
         self.force_calc = True
         self.files = None
+        self.data_ver = 0
+
+    def update_data_ver(self):
+        '''
+
+        :return:
+        '''
+
+        # increments the data version counter and clears the stored rotation filtered data/spike count objects
+        self.data_ver = getattr(self, 'data_ver', 0) + 1
+        clear_rotation_filtered_data()
+        cfcn.clear_spike_count_cache()
 
     def check_missing_fields(self):
         '''
@@ -23031,6 +23062,8 @@ class ComparisonDataObj(object):
         self.w_sig_feat = float(cfcn.get_glob_para('w_sig_feat'))
         self.w_sig_comp = float(cfcn.get_glob_para('w_sig_comp'))
         self.w_isi = float(cfcn.get_glob_para('w_isi'))
+        self.match_solver = 'Optimal'
+        self.match_score_min = 0.
 
     def init_class_fields(self, ind, n_fix, n_free, n_pts, fix_name, free_name):
         '''
@@ -23434,6 +23467,7 @@ class SubDiscriminationData(object):
         self.y_acc = None
         self.exp_name = None
         self.pw_corr = None
+        self.pw_corr_p = None
         self.z_corr = None
         self.lda_trial_type = None
 
@@ -1,5 +1,6 @@
 # module import
 import copy
+import threading
 import peakutils
 import math as m
 import numpy as np
@@ -620,16 +621,220 @@ def recreate_waveform(s_para, calc_deriv=False):
     return y_sig
 
 
-def setup_filter_permutations(d_clust, rot_filt):
+#########################################
+####    ROTATION FILTER FUNCTIONS    ####
+#########################################
+
+
+class RotationFilterIndex(object):
+    def __init__(self, n_max=64):
+
+        # initialisations
+        self.n_max = n_max
+        self.c_index = OrderedDict()
+        self.d_ver = None
+        self.lock = threading.RLock()
+
+        # cell/trial/experiment index field keys
+        self.cell_fld = {'region_name': 'chRegion', 'record_layer': 'chLayer'}
+        self.trial_fld = {'t_freq': 'tFreq', 't_freq_dir': 'yDir', 't_cycle': 'tCycle'}
+        self.expt_fld = ['lesion', 'record_state', 'record_coord']
+
+    def update(self, d_clust, data=None):
+        '''
+
+        :param d_clust:
+        :param data:
+        :return:
+        '''
+
+        with self.lock:
+            if data is not None:
+                # clears the index if the data object/version has changed
+                d_ver = (id(data), getattr(data, 'data_ver', 0))
+                if d_ver != self.d_ver:
+                    self.c_index.clear()
+                    self.d_ver = d_ver
+
+                # removes the index entries for any experiments that are no longer loaded
+                exp_file = set([c.get('expFile') for c in data._cluster])
+                for ck in [x for x in self.c_index if x[0] not in exp_file]:
+                    self.c_index.pop(ck)
+
+            # retrieves/adds the index entries for each experiment (keyed by the experiment file and field signature)
+            c_ind = []
+            for c in d_clust:
+                c_sig, sig_obj = self.get_signature(c)
+                ck = (c.get('expFile'), c_sig)
+                if ck not in self.c_index:
+                    self.c_index[ck] = self.setup_expt_index(c, sig_obj)
+
+                self.c_index.move_to_end(ck)
+                c_ind.append(self.c_index[ck])
+
+            # removes the least recently used entries (if the index is too large)
+            while len(self.c_index) > max(self.n_max, len(d_clust)):
+                self.c_index.popitem(last=False)
+
+        # returns the experiment index entries
+        return c_ind
+
+    def setup_expt_index(self, c, sig_obj):
+        '''
+
+        :param c:
+        :param sig_obj:
+        :return:
+        '''
+
+        # memory allocation (the signature fields are stored so their object ids can't be reused)
+        c_ind = {'sig_obj': sig_obj, 'n_cell': c['nC'], 'cell': {}, 'trial': {}, 'expt': {},
+                 't_type': [] if c['rotInfo'] is None else list(c['rotInfo']['trial_type'])}
+
+        # sets the experiment-wide field values
+        for e_fld in self.expt_fld:
+            c_ind['expt'][e_fld] = c['expInfo'][e_fld] if e_fld in c['expInfo'] else None
+
+        # sets the cell field bitmaps
+        for c_fld, c_fld_d in self.cell_fld.items():
+            c_ind['cell'][c_fld] = self.setup_bitmaps(c[c_fld_d])
+
+        # sets the trial field bitmaps for each trial type
+        for tt in c_ind['t_type']:
+            wfm_para, c_ind['trial'][tt] = c['rotInfo']['wfm_para'][tt], {'n_trial': len(c['rotInfo']['wfm_para'][tt])}
+            for t_fld, t_fld_d in self.trial_fld.items():
+                if t_fld_d in wfm_para.dtype.names:
+                    c_ind['trial'][tt][t_fld] = self.setup_bitmaps(wfm_para[t_fld_d])
+
+        # returns the experiment index
+        return c_ind
+
+    def get_expt_value(self, ck, e_fld):
+        '''
+
+        :param ck:
+        :param e_fld:
+        :return:
+        '''
+
+        return ck['expt'][e_fld]
+
+    def get_trial_types(self, ck):
+        '''
+
+        :param ck:
+        :return:
+        '''
+
+        return ck['t_type']
+
+    def get_cell_mask(self, ck, c_fld, c_func):
+        '''
+
+        :param ck:
+        :param c_fld:
+        :param c_func:
+        :return:
+        '''
+
+        # returns the cells which have a field value that meets the criteria function
+        return self.get_bitmap_mask(ck['cell'][c_fld], c_func, ck['n_cell'])
+
+    def get_trial_mask(self, ck, t_type, t_fld, t_func):
+        '''
+
+        :param ck:
+        :param t_type:
+        :param t_fld:
+        :param t_func:
+        :return:
+        '''
+
+        # returns the trials which have a field value that meets the criteria function
+        t_ind = ck['trial'][t_type]
+        return self.get_bitmap_mask(t_ind[t_fld], t_func, t_ind['n_trial'])
+
+    @staticmethod
+    def setup_bitmaps(x):
+        '''
+
+        :param x:
+        :return:
+        '''
+
+        # determines the indices of each unique value (values can be of mixed type so np.unique is not used)
+        x_grp = {}
+        for i, xx in enumerate(x):
+            x_grp.setdefault(xx, []).append(i)
+
+        # sets the packed boolean vector for each unique value
+        b_map = {}
+        for xx, i_grp in x_grp.items():
+            is_grp = np.zeros(len(x), dtype=bool)
+            is_grp[i_grp] = True
+            b_map[xx] = np.packbits(is_grp)
+
+        # returns the bitmap dictionary
+        return b_map
+
+    @staticmethod
+    def get_bitmap_mask(b_map, b_func, n_ele):
+        '''
+
+        :param b_map:
+        :param b_func:
+        :param n_ele:
+        :return:
+        '''
+
+        # combines the bitmaps of all values that meet the criteria function
+        b_match = [b for x, b in b_map.items() if b_func(x)]
+        if len(b_match):
+            return np.unpackbits(np.bitwise_or.reduce(b_match, axis=0), count=n_ele).astype(bool)
+        else:
+            return np.zeros(n_ele, dtype=bool)
+
+    def get_signature(self, c):
+        '''
+
+        :param c:
+        :return:
+        '''
+
+        # sets the field array ids (arrays are replaced, not altered, when the cluster dictionaries are reduced)
+        sig_obj = [c['chRegion'], c['chLayer']]
+        if c['rotInfo'] is not None:
+            sig_obj += list(c['rotInfo']['wfm_para'].values())
+
+        c_sig = [c['nC']] + [id(x) for x in sig_obj]
+        c_sig += [str(c['expInfo'][x]) if x in c['expInfo'] else None for x in self.expt_fld]
+
+        # returns the signature tuple and the signature field objects
+        return tuple(c_sig), sig_obj
+
+
+# the rotation filter cell/trial bitmap index
+r_filt_index = RotationFilterIndex()
+
+
+def setup_filter_permutations(d_clust, rot_filt, f_index=None, c_key=None):
     '''
 
+    :param d_clust:
     :param rot_filt:
+    :param f_index:
+    :param c_key:
     :return:
     '''
 
     # ensures all trial types are included (if running a rotational analysis expt with 'all' trial types)
     if ('All' in rot_filt['t_type']) and (not rot_filt['is_ud'][0]):
-        t_type = np.unique(cf.flat_list([x['rotInfo']['trial_type'] if x['rotInfo'] is not None else [] for x in d_clust]))
+        if f_index is None:
+            t_type = np.unique(
+                cf.flat_list([x['rotInfo']['trial_type'] if x['rotInfo'] is not None else [] for x in d_clust]))
+        else:
+            t_type = np.unique(cf.flat_list([f_index.get_trial_types(ck) for ck in c_key]))
+
         rot_filt['t_type'] = t_type[t_type != 'UniformDrifting']
 
     # determines which fields have multiple selections
@@ -703,8 +908,11 @@ def apply_rot_filter(data, rot_filt, expt_filter_lvl, exp_name, use_raw, rmv_emp
             i_expt_match = [cf.get_expt_index(exp_name, data.cluster)]
             d_clust = [data.cluster[i_expt_match[0]]]
 
+    # updates the cell/trial bitmap index for the filtered experiments
+    c_key = r_filt_index.update(d_clust, data)
+
     # sets up the filter permutation array
-    rot_filt_p, f_perm, f_key = setup_filter_permutations(d_clust, copy.deepcopy(rot_filt))
+    rot_filt_p, f_perm, f_key = setup_filter_permutations(d_clust, copy.deepcopy(rot_filt), r_filt_index, c_key)
 
     # memory allocation
     n_filt, d_copy = len(rot_filt_p), copy.deepcopy
@@ -715,7 +923,8 @@ def apply_rot_filter(data, rot_filt, expt_filter_lvl, exp_name, use_raw, rmv_emp
     is_ok = np.zeros(n_filt, dtype=bool)
     for i_filt in range(n_filt):
         t_spike[i_filt], wvm_para[i_filt], trial_ind[i_filt], clust_ind[i_filt], i_expt[i_filt] = \
-                    apply_single_rot_filter(data, d_clust, rot_filt_p[i_filt], expt_filter_lvl, i_expt_match, use_raw)
+                    apply_single_rot_filter(data, d_clust, rot_filt_p[i_filt], expt_filter_lvl, i_expt_match, use_raw,
+                                            r_filt_index, c_key)
         is_ok[i_filt] = not np.all([x is None for x in t_spike[i_filt]])
 
     # determines if any of the filters failed to turn up a match, then output an error message to screen
@@ -740,14 +949,21 @@ def apply_rot_filter(data, rot_filt, expt_filter_lvl, exp_name, use_raw, rmv_emp
     # returns the spike time/waveform parameter/filter parameter arrays
     return t_spike, wvm_para, trial_ind, clust_ind, i_expt, f_perm, f_key, rot_filt_p
 
-def apply_single_rot_filter(data, d_clust, rot_filt, expt_filter_lvl, i_expt_match, use_raw):
+def apply_single_rot_filter(data, d_clust, rot_filt, expt_filter_lvl, i_expt_match, use_raw, f_index=None, c_key=None):
     '''
 
     :param data:
     :param rot_filt:
+    :param f_index:
+    :param c_key:
     :return:
     '''
 
+    # sets up the cell/trial bitmap index (if not provided)
+    if f_index is None:
+        f_index = RotationFilterIndex()
+        c_key = f_index.update(d_clust)
+
     # import declaration
     import analysis_guis.calc_functions as cfcn
 
@@ -780,7 +996,7 @@ def apply_single_rot_filter(data, d_clust, rot_filt, expt_filter_lvl, i_expt_mat
     for i_expt in range(n_expt):
         # determines if the trial type exists in the current experiment
         if 'rotInfo' in d_clust[i_expt]:
-            is_ok[i_expt] = t_type in d_clust[i_expt]['rotInfo']['trial_type']
+            is_ok[i_expt] = t_type in f_index.get_trial_types(c_key[i_expt])
 
         if not is_ok[i_expt]:
             # if not, then continue
@@ -790,7 +1006,7 @@ def apply_single_rot_filter(data, d_clust, rot_filt, expt_filter_lvl, i_expt_mat
         # the check if the user is searching for a specific filter (i.e., not "All"))
         for c_type in chk_str:
             if rot_filt[c_type][0] != 'All':
-                is_ok[i_expt] = d_clust[i_expt]['expInfo'][c_type] in rot_filt[c_type]
+                is_ok[i_expt] = f_index.get_expt_value(c_key[i_expt], c_type) in rot_filt[c_type]
 
     # if there are no valid experiments which meet the trial/experiment filter conditions then exit with None values
     if not np.any(is_ok):
@@ -879,37 +1095,28 @@ def apply_single_rot_filter(data, d_clust, rot_filt, expt_filter_lvl, i_expt_mat
                                 c_data = data.comp.data[i_comp]
                                 cv = ['Matched Clusters' if x else 'Unmatched Clusters' for x in c_data.is_accept]
 
-                        elif ccf == 'region_name':
-                            # case is the region name
-                            cv, is_cl = d_clust[i_expt]['chRegion'], True
-
-                        elif ccf == 'record_layer':
-                            # case is the recording layer
-                            cv, is_cl = d_clust[i_expt]['chLayer'], True
-
-                        elif ccf == 'lesion':
-                            # case is the lesion type
-                            is_cl = True
-                            ind_cl_nw = [d_clust[i_expt]['expInfo']['lesion']
-                                                            not in exc_filt[ccf]] * d_clust[i_expt]['nC']
+                        elif ccf in ['region_name', 'record_layer']:
+                            # case is the region name or recording layer
+                            is_calc, is_cl = False, True
+                            ind_cl_nw = ~f_index.get_cell_mask(c_key[i_expt], ccf, lambda x: x in exc_filt[ccf])
 
-                        elif ccf == 'record_state':
-                            # case is the lesion type
-                            is_cl = True
-                            ind_cl_nw = [d_clust[i_expt]['expInfo']['record_state']
+                        elif ccf in ['lesion', 'record_state']:
+                            # case is the lesion type or recording state
+                            is_calc, is_cl = False, True
+                            ind_cl_nw = [f_index.get_expt_value(c_key[i_expt], ccf)
                                                             not in exc_filt[ccf]] * d_clust[i_expt]['nC']
 
                         elif ccf == 't_freq':
                             # case is the temporal frequency
-                            cv, is_tr = [str(x) for x in wfm_para[i_expt]['tFreq']], True
-
-                        elif ccf == 't_freq_dir':
-                            # case is the temporal direction (-1/CW or 1/CCW)
-                            cv, is_tr = [str(int(x)) for x in wfm_para[i_expt]['yDir']], True
+                            is_calc, is_tr = False, True
+                            ind_tr_nw = ~f_index.get_trial_mask(c_key[i_expt], t_type, ccf,
+                                                                lambda x: str(x) in exc_filt[ccf])
 
-                        elif ccf == 't_cycle':
-                            # case is the temporal cycle frequency
-                            cv, is_tr = [str(int(x)) for x in wfm_para[i_expt]['tCycle']], True
+                        elif ccf in ['t_freq_dir', 't_cycle']:
+                            # case is the temporal direction (-1/CW or 1/CCW) or the temporal cycle frequency
+                            is_calc, is_tr = False, True
+                            ind_tr_nw = ~f_index.get_trial_mask(c_key[i_expt], t_type, ccf,
+                                                                lambda x: str(int(x)) in exc_filt[ccf])
 
                         elif ccf == 'free_ctype':
                             # case is the freely moving cell types
@@ -966,28 +1173,16 @@ def apply_single_rot_filter(data, d_clust, rot_filt, expt_filter_lvl, i_expt_mat
                         # ind_cl_nw = list(np.where(data.comp.data[i_expt].is_accept == m_flag)[0])
                         ind_cl_nw = data.comp.data[i_expt].is_accept == m_flag
 
-                    elif ccf == 'region_name':
-                        ind_cl_nw = [x == rot_filt[ccf][0] for x in d_clust[i_expt]['chRegion']]
-
-                    elif ccf == 'record_layer':
-                        ind_cl_nw = [x == rot_filt[ccf][0] for x in d_clust[i_expt]['chLayer']]
+                    elif ccf in ['region_name', 'record_layer']:
+                        ind_cl_nw = f_index.get_cell_mask(c_key[i_expt], ccf, lambda x: x == rot_filt[ccf][0])
 
-                    elif ccf == 'lesion':
-                        ind_cl_nw = [d_clust[i_expt]['expInfo']['lesion'] ==
+                    elif ccf in ['lesion', 'record_state']:
+                        ind_cl_nw = [f_index.get_expt_value(c_key[i_expt], ccf) ==
                                                                 rot_filt[ccf][0]] * d_clust[i_expt]['nC']
 
-                    elif ccf == 'record_state':
-                        ind_cl_nw = [d_clust[i_expt]['expInfo']['record_state'] ==
-                                                                rot_filt[ccf][0]] * d_clust[i_expt]['nC']
-
-                    elif ccf == 't_freq':
-                        ind_tr_nw = np.abs(wfm_para[i_expt]['tFreq'] - float(rot_filt[ccf][0])) < 1e-6
-
-                    elif ccf == 't_freq_dir':
-                        ind_tr_nw = np.abs(wfm_para[i_expt]['yDir'] - float(rot_filt[ccf][0])) < 1e-6
-
-                    elif ccf == 't_cycle':
-                        ind_tr_nw = np.abs(wfm_para[i_expt]['tCycle'] - float(rot_filt[ccf][0])) < 1e-6
+                    elif ccf in ['t_freq', 't_freq_dir', 't_cycle']:
+                        ind_tr_nw = f_index.get_trial_mask(c_key[i_expt], t_type, ccf,
+                                                           lambda x: np.abs(x - float(rot_filt[ccf][0])) < 1e-6)
 
                     elif ccf == 'free_ctype':
                         # retrieves the free-to-fixed cell indices
@@ -1114,43 +1309,19 @@ def calc_kinematic_bin_times(b_sz, k_rng, w, calc_type=2):
         return xi_bin0, xi_bin, t_bin, i_bin
 
 
-def calc_resampled_vel_spike_freq(data, w_prog, r_obj, b_sz, n_sample, indD=None, r_data=None):
+def calc_resampled_vel_spike_freq(data, w_prog, r_obj, b_sz, n_sample, indD=None, r_data=None, use_exp=False,
+                                  seed=None):
     '''
 
     :param data:
     :param r_obj:
     :param b_sz:
     :param n_sample:
+    :param use_exp:
+    :param seed:
     :return:
     '''
 
-    def calc_resampled_counts(t_sp, t_bin, dt_min, n_sample):
-        '''
-
-        :param t_sp:
-        :param t_bin:
-        :param t_bin_min:
-        :param n_sample:
-        :return:
-        '''
-
-        # calculates the residual gap between the time bin duration and the min time bin duration
-        dt_gap = np.diff(t_bin)[0] - dt_min
-
-        # determines if there are any spikes not completely covered by the min time duration
-        if (t_sp[0] < (t_bin[0] + dt_gap)) or (t_sp[-1] > (t_bin[1] - dt_gap)):
-            # if so, then calculate the resampled frequency
-            t_count, t_bin_min = np.zeros(n_sample), np.array([0, dt_min])
-            for i_sample in range(n_sample):
-                # sets the new randomly sample time bins and determines the spikes within this reduced bin
-                t_bin_rs = (t_bin[0] + rnd() * dt_gap) + t_bin_min
-                t_count[i_sample] = sum(np.logical_and(t_sp > t_bin_rs[0], t_sp <= t_bin_rs[1]))
-
-            # returns the average resampled time bin counts
-            return np.mean(t_count)
-        else:
-            return len(t_sp)
-
     # initialises the RotationData class object (if not provided)
     if r_data is None:
         r_data = data.rotation
@@ -1159,6 +1330,7 @@ def calc_resampled_vel_spike_freq(data, w_prog, r_obj, b_sz, n_sample, indD=None
     v_rng, w, is_full_rs = 80, np.pi / r_obj.t_phase[0][0], indD is None
     xi_bin0, xi_bin, t_bin, i_grp = calc_kinematic_bin_times([10, b_sz[0]], [90, v_rng], w, calc_type=1)
     n_vbin, sd_vel = np.size(xi_bin, axis=0), np.sign(np.diff(xi_bin0))
+    r_state = cf.setup_random_state(seed)
 
     # # sets up the
     # A, B = np.arange(0, v_rng + 1e-6, b_sz[0]), np.arange(v_rng, -(v_rng + 1e-6), -b_sz[0])
@@ -1173,19 +1345,8 @@ def calc_resampled_vel_spike_freq(data, w_prog, r_obj, b_sz, n_sample, indD=None
         ind_bin = range(len(t_bin) - 1)
         ind_filt = range(len(r_data.r_obj_kine.rot_filt_tot))
     else:
-        # case is the single bin calculations
-        _xi, ind_bin = -B[indD['ind_bin']:(indD['ind_bin'] + 2)].astype(int), []
-        for i_m in np.where(xi_bin == _xi[0])[0]:
-            if i_m > 0:
-                if xi_bin[i_m - 1] == _xi[1]:
-                    ind_bin.append(i_m - 1)
-
-            if (i_m + 1) < len(xi_bin):
-                if xi_bin[i_m + 1] == _xi[1]:
-                    ind_bin.append(i_m)
-
-        # sets the filter index and the bin resample duration
-        ind_filt, dt_min = [indD['ind_filt']], (t_bin[ind_bin[0] + 1] - t_bin[ind_bin[0]] ) / 2.
+        # case is the single bin calculations (only the filter index is required as no resampling is performed)
+        ind_filt = [indD['ind_filt']]
 
     # memory allocation
     n_filt, f_keys = len(ind_filt), list(r_data.vel_sf_rs.keys())
@@ -1204,102 +1365,38 @@ def calc_resampled_vel_spike_freq(data, w_prog, r_obj, b_sz, n_sample, indD=None
         n_cell = np.size(r_obj.t_spike[i_filt], axis=0)
         n_trial_max = np.max([np.size(x, axis=0) for x in r_obj.wvm_para[i_filt]])
 
+        if not is_full_rs:
+            # case is calculating for a single cell (the single cell values are not set, so the resampling is skipped)
+            vel_f[i_filt] = np.empty(n_trial_max)
+            vel_f[i_filt][:] = np.nan
+            continue
+
         # sets the experiment indices that belong to the current trial type
         tt = r_obj.rot_filt_tot[i_filt]['t_type'][0]
         valid_ind = np.where(valid_ind_func(data.cluster, tt))[0]
-        is_md_expt = tt == 'MotorDrifting'
 
-        # sets the cell indices to be analysed
-        if is_full_rs:
-            ind_cell = range(n_cell)
-            w_str, w0 = 'Resampling Calculations ({0})'.format(tt), i_filt / n_filt
-        else:
-            ind_cell = [indD['ind_cell']]
-
-        # calculates the position/velocity for each cell
-        for ii, i_cell in enumerate(ind_cell):
-            # updates the progress bar
-            if is_full_rs:
-                w_prog.emit(w_str, 100. * (w0 + (1. / n_filt) * (i_cell / n_cell)))
-
-            # retrieves the experiment index, sampling frequency and phase duration
-            i_expt = np.where(r_obj.i_expt[i_filt][i_cell] == valid_ind)[0][0]
-            wvm_p = r_obj.wvm_para[i_filt][i_expt]
-
-            # calculates the position/velocity for each of the trials
-            t_phase = r_obj.t_phase[i_filt][i_expt]
-            t_sp, n_trial_c, y_dir = r_obj.t_spike[i_filt][i_cell, :, :], np.size(wvm_p, axis=0), wvm_p['yDir']
-
-            # memory allocation for the position/velocity bins (first cell only)
-            if ii == 0:
-                if is_full_rs:
-                    # case is calculating the resampling for all cells
-                    vel_f[i_filt] = np.empty((n_trial_max, n_vbin, n_cell, 2))
-                else:
-                    # case is calculating for a single cell
-                    vel_f[i_filt] = np.empty(n_trial_max)
-
-                # sets all values to NaNs
-                vel_f[i_filt][:] = np.nan
-
-            # memory allocation
-            vel_bin = np.zeros((n_trial_c, n_vbin, 2))
-            for i_trial in range(n_trial_c):
-                # sets the spike times in the correct order for the current trial
-                if t_sp[i_trial, 1] is None:
-                    continue
-
-                if (y_dir[i_trial] == -1 and not is_md_expt) or (y_dir[i_trial] == 1 and is_md_expt):
-                    # case is a CW => CCW trial
-                    t_sp_trial, m = np.concatenate((t_sp[i_trial, 1], t_sp[i_trial, 2] + t_phase)), -1
-                else:
-                    # case is a CCW => CW trial
-                    t_sp_trial, m = np.concatenate((t_sp[i_trial, 2], t_sp[i_trial, 1] + t_phase)), 1
-
-                # if there are no spikes for the current trial, then continue
-                if len(t_sp_trial) == 0:
-                    continue
-
-                # sets the bin indices and allocates memory for the bin spike counts
-                n_sp_bin = np.zeros(len(t_bin))
-                for i_bin in ind_bin:
-                    # determines the indices of the time spikes within the current time bin
-                    i_sp_bin = np.logical_and(t_sp_trial > t_bin[i_bin], t_sp_trial <= t_bin[i_bin + 1])
-                    if np.any(i_sp_bin):
-                        # if there are spikes within the time bin, then calculate the resampled count
-                        n_sp_bin[i_bin] = calc_resampled_counts(
-                            t_sp_trial[i_sp_bin], t_bin[i_bin:i_bin + 2], dt_min, n_sample
-                        )
-
-                # sets the position/velocity values
-                vel_bin_tmp = reorder_array(n_sp_bin, i_grp, sd_vel, m=-m, dtype=float)
-                for k in range(2):
-                    vel_bin[i_trial, :, k] = vel_bin_tmp[k, :]
-
-            # calculates the position/velocity spiking frequencies over all trials
-            for k in range(2):
-                if is_full_rs:
-                    # case is setting all spiking frequencies
-
-                    # sets the trial indices
-                    if k == 0:
-                        ind_t = np.array(range(n_trial_c))
-
-                    # sets the full velocity/position spiking rates
-                    vel_f[i_filt][ind_t, :, i_cell, k] = vel_bin[:, :, k] / dt_min
-                else:
-                    # case is calculating the average spiking frequency
-                    a = 1
-                    # pos_f[i_filt][i_cell, :, k] = np.mean(pos_bin[:, :, k], axis=0) / pos_dt
-                    # vel_f[i_filt][i_cell, :, k] = np.mean(vel_bin[:, :, k], axis=0) / vel_dt
-
-            # #
-            # if is_full_rs:
-            #     for i_bin in range(np.size(vel_n[i_filt], axis=1)):
-            #         vel_n[i_filt][i_trial, :, i_cell] = np.array(
-            #             [np.sum(n_sp_bin[ind_inv == i]) for i in range(np.size(vel_n[i_filt], axis=1))])
-            # else:
-            #     vel_n[i_filt][i_trial] = np.mean(n_sp_bin[np.array(ind_bin)])
+        # updates the progress bar
+        w_prog.emit('Resampling Calculations ({0})'.format(tt), 100. * i_filt / n_filt)
+
+        # sets the experiment index of each cell (relative to the experiments which contain the trial type)
+        i_ex = np.searchsorted(valid_ind, r_obj.i_expt[i_filt])
+
+        # calculates the resampled spike counts for all cells/trials within the filter
+        x_sp, i_seg, m_dir, is_trial = setup_kinematic_trial_spikes(r_obj, i_filt, i_ex)
+        n_sp_bin = calc_resampled_bin_counts(x_sp, i_seg, np.size(m_dir), t_bin, ind_bin, dt_min, n_sample,
+                                             use_exp=use_exp, r_state=r_state)
+
+        # sets the velocity bin counts (trials with no spikes have zero counts)
+        vel_bin = reorder_batch_array(n_sp_bin, i_grp, sd_vel, -m_dir.ravel(), dtype=float)
+        vel_bin[np.bincount(i_seg, minlength=np.size(m_dir)) == 0, :, :] = 0
+        vel_bin[~is_trial.ravel(), :, :] = np.nan
+        vel_bin = np.transpose(vel_bin.reshape(list(np.shape(m_dir)) + [2, -1]), (1, 3, 0, 2))
+
+        # sets the full velocity spiking rates
+        n_trial = min(n_trial_max, np.size(vel_bin, axis=0))
+        vel_f[i_filt] = np.empty((n_trial_max, n_vbin, n_cell, 2))
+        vel_f[i_filt][:] = np.nan
+        vel_f[i_filt][:n_trial] = vel_bin[:n_trial] / dt_min
 
     # returns the values
     if is_full_rs:
@@ -1308,6 +1405,84 @@ def calc_resampled_vel_spike_freq(data, w_prog, r_obj, b_sz, n_sample, indD=None
         return vel_f
 
 
+def calc_resampled_bin_counts(x_sp, i_seg, n_seg, t_bin, ind_bin, dt_min, n_sample, use_exp=False, r_state=None):
+    '''
+
+    :param x_sp:
+    :param i_seg:
+    :param n_seg:
+    :param t_bin:
+    :param ind_bin:
+    :param dt_min:
+    :param n_sample:
+    :param use_exp:
+    :param r_state:
+    :return:
+    '''
+
+    # initialisations
+    n_bin, n_sz_max = len(t_bin) - 1, 2 ** 22
+    r_state = cf.setup_random_state(r_state)
+
+    # determines the time bin (where the bins are open on the lower edge) for each spike
+    i_bin = np.searchsorted(t_bin, x_sp, side='left') - 1
+    is_bin = np.zeros(n_bin + 1, dtype=bool)
+    is_bin[np.array(ind_bin, dtype=int)] = True
+    is_in = np.logical_and(i_bin >= 0, i_bin < n_bin)
+    is_in[is_in] = is_bin[i_bin[is_in]]
+
+    # sets the trial/bin group index for each spike (within the selected bins)
+    x_sp, i_seg, i_bin = x_sp[is_in], i_seg[is_in], i_bin[is_in]
+    i_grp = i_seg * n_bin + i_bin
+    n_sp_grp = np.bincount(i_grp, minlength=n_seg * n_bin).astype(float)
+
+    # calculates the residual gap between the time bin duration and the min time bin duration. spikes not
+    # completely covered by the min time duration have their counts resampled
+    dt_gap = np.diff(t_bin) - dt_min
+    is_out = np.logical_or(x_sp < (t_bin[:-1] + dt_gap)[i_bin], x_sp > (t_bin[1:] - dt_gap)[i_bin])
+    is_rs = np.bincount(i_grp[is_out], minlength=n_seg * n_bin) > 0
+    if not np.any(is_rs):
+        # if no bins need resampling, then return the original counts
+        return n_sp_grp.reshape(n_seg, n_bin)
+
+    # reduces the spikes to those within the resampled trial/bins
+    is_sp_rs = is_rs[i_grp]
+    x_sp, i_seg, i_bin, i_grp = x_sp[is_sp_rs], i_seg[is_sp_rs], i_bin[is_sp_rs], i_grp[is_sp_rs]
+
+    if use_exp:
+        # case is using the expected resampled count. for a resampled bin start time of t0 + u * dt_gap (where u is
+        # uniform over [0, 1]), the spike at time t is within the bin for u within [t - t0 - dt_min, t - t0) / dt_gap
+        t0, dt_gap_sp = t_bin[i_bin], dt_gap[i_bin]
+        p_u = lambda x: np.clip((x_sp - t0 - x) / dt_gap_sp, 0., 1.)
+        n_sp_grp[is_rs] = np.bincount(i_grp, weights=p_u(0.) - p_u(dt_min), minlength=n_seg * n_bin)[is_rs]
+
+    else:
+        # case is randomly sampling the bin start times. the spike times are sorted by trial (with each trial offset
+        # by the total bin duration) so all resampled bins can be searched at the same time
+        t_ofs = (t_bin[-1] - t_bin[0]) + 1.
+        t_key = np.sort(i_seg * t_ofs + (x_sp - t_bin[0]))
+
+        # sets the trial/bin indices of the resampled bins
+        j_grp = np.where(is_rs)[0]
+        j_seg, j_bin = j_grp // n_bin, j_grp % n_bin
+        n_chunk = max(1, int(n_sz_max / n_sample))
+
+        # calculates the mean resampled counts (in chunks of bins so as to limit the memory footprint)
+        for i0 in range(0, len(j_grp), n_chunk):
+            # sets the randomly sampled time bins (relative to each trial's offset)
+            i1 = min(i0 + n_chunk, len(j_grp))
+            t_rs0 = (t_bin[j_bin[i0:i1]] - t_bin[0]).reshape(-1, 1)
+            t_rs = t_rs0 + r_state.random_sample((i1 - i0, n_sample)) * dt_gap[j_bin[i0:i1]].reshape(-1, 1)
+            t_rs += (j_seg[i0:i1] * t_ofs).reshape(-1, 1)
+
+            # determines the spikes within each of the reduced bins
+            t_count = np.searchsorted(t_key, t_rs + dt_min, side='right') - np.searchsorted(t_key, t_rs, side='right')
+            n_sp_grp[j_grp[i0:i1]] = np.mean(t_count, axis=1)
+
+    # returns the trial/bin counts
+    return n_sp_grp.reshape(n_seg, n_bin)
+
+
 def calc_kinemetic_spike_freq(data, r_obj, b_sz, calc_type=2):
     '''
 
@@ -1319,107 +1494,40 @@ def calc_kinemetic_spike_freq(data, r_obj, b_sz, calc_type=2):
 
     # initialisations and memory allocation
     k_rng, n_filt, calc_avg_sf = [90, 80], len(r_obj.t_spike), calc_type == 2
-    t_bin = np.zeros(2, dtype=object)
     pos_f, vel_f = np.empty(n_filt, dtype=object), np.empty(n_filt, dtype=object)
 
-    # calculates the position/velocity for each filter type
-    for i_filt in range(n_filt):
-        # memory allocation for the current filter
-        n_cell = np.size(r_obj.t_spike[i_filt], axis=0)
-        n_trial_max = np.max([np.size(x, axis=0) for x in r_obj.wvm_para[i_filt]])
-        i_expt_uniq = np.unique(r_obj.i_expt[i_filt]) if not r_obj.is_single_cell else None
+    # retrieves the experiment indices for each cell (over all filters)
+    i_ex = [get_kinematic_expt_index(r_obj, i_filt) for i_filt in range(n_filt)]
 
-        # determines the experiments which contain the trial type
-        tt = r_obj.rot_filt_tot[i_filt]['t_type'][0]
-        is_md_expt = tt == 'MotorDrifting'
+    # retrieves the time/value bins and index groupings (based on the phase duration of the first cell)
+    w = np.pi / r_obj.t_phase[0][i_ex[0][0]]
+    xi_bin0, xi_bin, t_bin, i_grp = calc_kinematic_bin_times(b_sz, k_rng, w)
 
-        # calculates the position/velocity for each cell
-        for i_cell in range(n_cell):
-            # retrieves the experiment index, sampling frequency and phase duration
-            if r_obj.is_single_cell:
-                i_expt = 0
-            else:
-                i_expt = np.where(i_expt_uniq == r_obj.i_expt[i_filt][i_cell])[0][0]
-
-            # calculates the position/velocity for each of the trials
-            t_phase, wvm_p = r_obj.t_phase[i_filt][i_expt], r_obj.wvm_para[i_filt][i_expt]
-            y_dir, y_amp = wvm_p['yDir'], wvm_p['yAmp'][0]
-            t_sp, w, n_trial_c = r_obj.t_spike[i_filt][i_cell, :, :], np.pi / t_phase, np.size(wvm_p, axis=0)
-
-            # calculates the time-bins (only required for first iteration pass)
-            if (i_filt == 0) and (i_cell == 0):
-                # retrieves the time/value bins and index groupings
-                xi_bin0, xi_bin, t_bin, i_grp = calc_kinematic_bin_times(b_sz, k_rng, w)
-
-                # memory allocation
-                n_pbin, n_vbin = np.size(xi_bin[0], axis=0), np.size(xi_bin[1], axis=0)
-                sd_pos, sd_vel = np.sign(np.diff(xi_bin0[0])), np.sign(np.diff(np.abs(xi_bin0[1])))
-
-                # calculates the position/velocity time bin durations
-                pos_dt = reorder_array(np.diff(t_bin[0]), i_grp[0], sd_pos, dtype=float)[0, :]
-                vel_dt = reorder_array(np.diff(t_bin[1]), i_grp[1], sd_vel, dtype=float)[0, :]
-
-            # memory allocation for the position/velocity bins (first cell only)
-            if i_cell == 0:
-                # allocates memory for the inner arrays (dependent on type)
-                if calc_avg_sf:
-                    # case is calculating the average spiking frequency
-                    pos_f[i_filt] = np.zeros((n_cell, n_pbin, 2))
-                    vel_f[i_filt] = np.zeros((n_cell, n_vbin, 2))
-                else:
-                    # case is calculating individual spiking frequencies
-                    pos_f[i_filt] = np.empty((n_trial_max, n_pbin, n_cell, 2))
-                    vel_f[i_filt] = np.empty((n_trial_max, n_vbin, n_cell, 2))
-                    vel_f[i_filt][:], pos_f[i_filt][:] = np.nan, np.nan
-
-            # memory allocation for the position/velocity bins
-            pos_bin = np.zeros((n_trial_c, n_pbin, 2))
-            vel_bin = np.zeros((n_trial_c, n_vbin, 2))
-
-            for i_trial in range(n_trial_c):
-                # sets the spike times in the correct order for the current trial
-                if t_sp[i_trial, 1] is None:
-                    continue
-
-                if (y_dir[i_trial] == -1 and not is_md_expt) or (y_dir[i_trial] == 1 and is_md_expt):
-                    # case is a CW => CCW trial
-                    t_sp_trial, m = np.concatenate((t_sp[i_trial, 1], t_sp[i_trial, 2] + t_phase)), -1
-                else:
-                    # case is a CCW => CW trial
-                    t_sp_trial, m = np.concatenate((t_sp[i_trial, 2], t_sp[i_trial, 1] + t_phase)), 1
-
-                # calculates the counts for each of the time bins
-                if len(t_sp_trial):
-                    # calculates the position/velocity histogram bin values
-                    pos_bin_tmp = reorder_array(np.histogram(t_sp_trial, bins=t_bin[0])[0], i_grp[0], sd_pos, m=m)
-                    vel_bin_tmp = reorder_array(np.histogram(t_sp_trial, bins=t_bin[1])[0], i_grp[1], sd_vel, m=-m)
-
-                    # h_vel = np.arange(64)
-                    # vel_bin_tmp = reorder_array(h_vel, i_grp[1], sd_vel)
-
-                    # sets the position/velocity values
-                    for k in range(2):
-                        pos_bin[i_trial, :, k] = pos_bin_tmp[k, :]
-                        vel_bin[i_trial, :, k] = vel_bin_tmp[k, :]
-
-            # calculates the position/velocity spiking frequencies over all trials
-            for k in range(2):
-                if calc_avg_sf:
-                    # case is calculating the average spiking frequency
-                    pos_f[i_filt][i_cell, :, k] = np.nanmean(pos_bin[:, :, k], axis=0) / pos_dt
-                    vel_f[i_filt][i_cell, :, k] = np.nanmean(vel_bin[:, :, k], axis=0) / vel_dt
-                else:
-                    # case is setting all spiking frequencies
+    # memory allocation
+    n_pbin, n_vbin = np.size(xi_bin[0], axis=0), np.size(xi_bin[1], axis=0)
+    sd_pos, sd_vel = np.sign(np.diff(xi_bin0[0])), np.sign(np.diff(np.abs(xi_bin0[1])))
 
-                    # sets the trial indices
-                    if k == 0:
-                        ind_t = np.array(range(n_trial_c))
-                        _pos_dt = np.matlib.repmat(dcopy(pos_dt), len(ind_t), 1)
-                        _vel_dt = np.matlib.repmat(dcopy(vel_dt), len(ind_t), 1)
+    # calculates the position/velocity time bin durations
+    pos_dt = reorder_array(np.diff(t_bin[0]), i_grp[0], sd_pos, dtype=float)[0, :]
+    vel_dt = reorder_array(np.diff(t_bin[1]), i_grp[1], sd_vel, dtype=float)[0, :]
 
-                    # sets the full velocity/position spiking rates
-                    pos_f[i_filt][ind_t, :, i_cell, k] = pos_bin[:, :, k] / _pos_dt
-                    vel_f[i_filt][ind_t, :, i_cell, k] = vel_bin[:, :, k] / _vel_dt
+    # calculates the position/velocity bin counts for all filters/cells/trials
+    k_bin = calc_kinematic_bin_counts(r_obj, i_ex, t_bin, i_grp, [sd_pos, sd_vel], [1, -1])
+
+    # calculates the position/velocity for each filter type
+    for i_filt in range(n_filt):
+        # retrieves the position/velocity bin counts (trials not in the cell's experiment are NaN values)
+        pos_bin, vel_bin = k_bin[0][i_filt], k_bin[1][i_filt]
+        n_trial_max = np.max([np.size(x, axis=0) for x in r_obj.wvm_para[i_filt]])
+
+        if calc_avg_sf:
+            # case is calculating the average spiking frequency
+            pos_f[i_filt] = np.transpose(np.nanmean(pos_bin, axis=1), (0, 2, 1)) / pos_dt.reshape(1, -1, 1)
+            vel_f[i_filt] = np.transpose(np.nanmean(vel_bin, axis=1), (0, 2, 1)) / vel_dt.reshape(1, -1, 1)
+        else:
+            # case is setting all spiking frequencies
+            pos_f[i_filt] = np.transpose(pos_bin, (1, 3, 0, 2))[:n_trial_max] / pos_dt.reshape(1, -1, 1, 1)
+            vel_f[i_filt] = np.transpose(vel_bin, (1, 3, 0, 2))[:n_trial_max] / vel_dt.reshape(1, -1, 1, 1)
 
     # sets the bin duration times
     dt = [pos_dt, vel_dt]
@@ -1439,6 +1547,117 @@ def calc_kinemetic_spike_freq(data, r_obj, b_sz, calc_type=2):
         return [pos_f, vel_f], xi_bin, dt
 
 
+def get_kinematic_expt_index(r_obj, i_filt):
+    '''
+
+    :param r_obj:
+    :param i_filt:
+    :return:
+    '''
+
+    if r_obj.is_single_cell:
+        # case is a single cell (only one experiment)
+        return np.zeros(np.size(r_obj.t_spike[i_filt], axis=0), dtype=int)
+    else:
+        # case is multiple cells (maps each cell to the index of its experiment within the filter)
+        return np.searchsorted(np.unique(r_obj.i_expt[i_filt]), r_obj.i_expt[i_filt])
+
+
+def setup_kinematic_trial_spikes(r_obj, i_filt, i_ex):
+    '''
+
+    :param r_obj:
+    :param i_filt:
+    :param i_ex:
+    :return:
+    '''
+
+    # initialisations
+    t_sp = r_obj.t_spike[i_filt]
+    n_cell, n_trial = np.shape(t_sp)[:2]
+    is_md_expt = r_obj.rot_filt_tot[i_filt]['t_type'][0] == 'MotorDrifting'
+
+    # retrieves the trial count, phase duration and trial direction for each cell's experiment
+    wvm_p, t_phase0 = r_obj.wvm_para[i_filt], np.array(r_obj.t_phase[i_filt], dtype=float)
+    y_dir0 = np.vstack([np.pad(np.array(x['yDir'], dtype=float), (0, n_trial - len(x)), 'constant',
+                               constant_values=np.nan) for x in wvm_p])
+    n_trial_c, t_phase, y_dir = np.array([len(x) for x in wvm_p])[i_ex], t_phase0[i_ex], y_dir0[i_ex, :]
+
+    # determines the cell's experiment trials, and the trials which have spike information
+    is_trial = np.arange(n_trial).reshape(1, -1) < n_trial_c.reshape(-1, 1)
+    is_valid = dcopy(is_trial)
+    is_valid[is_trial] = np.array([x is not None for x in t_sp[:, :, 1][is_trial]], dtype=bool)
+
+    # determines the trial directions (CW => CCW trials have a direction multiplier of -1)
+    is_cw = np.logical_or(np.logical_and(y_dir == -1, not is_md_expt), np.logical_and(y_dir == 1, is_md_expt))
+    m_dir = np.where(is_cw, -1, 1)
+
+    # flattens the spike times for the 1st/2nd stimuli phases (invalid trials are ignored)
+    x_sp, i_seg = [], []
+    for i_phase, t_ofs_cw in zip([1, 2], [0, 1]):
+        t_sp_ph = t_sp[:, :, i_phase] if np.all(is_valid) else np.where(is_valid, t_sp[:, :, i_phase], None)
+        x_ph, n_ph, _ = cf.flatten_ragged_array(t_sp_ph)
+
+        # offsets the phase spike times so they are aligned with the CW => CCW/CCW => CW trial order
+        t_ofs = np.where(is_cw == bool(t_ofs_cw), t_phase.reshape(-1, 1), 0.).ravel()
+        i_seg_ph = np.repeat(np.arange(len(n_ph)), n_ph)
+        x_sp.append(x_ph + t_ofs[i_seg_ph])
+        i_seg.append(i_seg_ph)
+
+    # returns the combined spike times, trial segment indices and trial direction/validity arrays
+    return np.concatenate(x_sp), np.concatenate(i_seg), m_dir, is_trial
+
+
+def calc_kinematic_bin_counts(r_obj, i_ex, t_bin, i_grp, sd, m_sgn):
+    '''
+
+    :param r_obj:
+    :param i_ex:
+    :param t_bin:
+    :param i_grp:
+    :param sd:
+    :param m_sgn:
+    :return:
+    '''
+
+    # sets up the trial spike times for each filter
+    n_filt = len(r_obj.t_spike)
+    k_sp = [setup_kinematic_trial_spikes(r_obj, i_filt, i_ex[i_filt]) for i_filt in range(n_filt)]
+
+    # combines the spike times from all filters (trial segment indices are offset by the filter)
+    n_seg = [np.size(x[2]) for x in k_sp]
+    i_seg_ofs = np.cumsum([0] + n_seg)
+    x_sp = np.concatenate([x[0] for x in k_sp])
+    i_seg = np.concatenate([x[1] + i_ofs for x, i_ofs in zip(k_sp, i_seg_ofs)])
+    m_dir = np.concatenate([x[2].ravel() for x in k_sp])
+    is_trial = np.concatenate([x[3].ravel() for x in k_sp])
+
+    # determines the trials which have spikes (trials with no spikes are not reordered)
+    has_sp = np.bincount(i_seg, minlength=i_seg_ofs[-1]) > 0
+
+    # calculates the bin counts for each kinematic type
+    k_bin = []
+    for i_k in range(len(t_bin)):
+        # calculates the histogram counts for all trials (equivalent to np.histogram for each trial)
+        n_bin = len(t_bin[i_k]) - 1
+        i_bin = np.searchsorted(t_bin[i_k], x_sp, side='right') - 1
+        i_bin[x_sp == t_bin[i_k][-1]] = n_bin - 1
+        is_in = np.logical_and(x_sp >= t_bin[i_k][0], x_sp <= t_bin[i_k][-1])
+        h = np.bincount(i_seg[is_in] * n_bin + i_bin[is_in], minlength=i_seg_ofs[-1] * n_bin)
+
+        # reorders the bin counts into the kinematic bins (trials with no spikes have zero counts)
+        y_bin = reorder_batch_array(h.reshape(-1, n_bin), i_grp[i_k], sd[i_k], m_sgn[i_k] * m_dir).astype(float)
+        y_bin[~has_sp, :, :] = 0
+        y_bin[~is_trial, :, :] = np.nan
+
+        # splits the bin counts by filter (arrays are dimensioned as cell x trial x direction x bin)
+        k_bin.append([y_bin[i0:i1].reshape(list(np.shape(x[2])) + list(np.shape(y_bin)[1:]))
+                                                        for i0, i1, x in zip(i_seg_ofs[:-1], i_seg_ofs[1:], k_sp)])
+
+    # returns the bin counts
+    return k_bin
+
+
 def reorder_array(h, i_grp, sd, dtype=int, m=1):
     '''
 
@@ -1468,6 +1687,35 @@ def reorder_array(h, i_grp, sd, dtype=int, m=1):
     return y_arr
 
 
+
+def reorder_batch_array(h, i_grp, sd, m, dtype=int):
+    '''
+
+    :param h:
+    :param i_grp:
+    :param sd:
+    :param m:
+    :param dtype:
+    :return:
+    '''
+
+    # memory allocation
+    nH, i_row = int(len(i_grp) / 2), ((sd + 1) / 2).astype(int)
+    y_arr = -np.ones((np.size(h, axis=0), 2, nH), dtype=dtype)
+
+    # sets the values into the array for each trial direction (index array is reversed if m != 1)
+    for is_fwd in [True, False]:
+        is_m = (m == 1) == is_fwd
+        if np.any(is_m):
+            j_grp, j_row = (i_grp, i_row) if is_fwd else (max(i_grp) - i_grp, 1 - i_row)
+            y_m = y_arr[is_m]
+            y_m[:, j_row, j_grp] = h[is_m]
+            y_arr[is_m] = y_m
+
+    # returns the ordered array
+    return y_arr
+
+
 # def calc_wave_kinematic_times(wvm_para, s_freq, i_expt, kb_sz, is_pos, yDir=1):
 #     '''
 #
@@ -9,6 +9,7 @@ import pickle as p
 import pandas as pd
 import multiprocessing as mp
 from numpy.matlib import repmat
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # scipy module imports
 from scipy.stats import norm, linregress
@@ -33,6 +34,7 @@ from PyQt5.QtCore import QThread, pyqtSignal
 import analysis_guis.common_func as cf
 import analysis_guis.calc_functions as cfcn
 import analysis_guis.rotational_analysis as rot
+import analysis_guis.data_store as ds
 from analysis_guis.dialogs.rotation_filter import RotationFilteredData
 from analysis_guis.cluster_read import ClusterRead
 from probez.spike_handling import spike_io
@@ -70,6 +72,7 @@ class WorkerThread(QThread):
         self.sub_job = None
         self.is_ok = True
         self.data = None
+        self.sh_data = None
 
         # other initialisations
         self.main_gui = main_gui
@@ -153,7 +156,7 @@ class WorkerThread(QThread):
                 self.check_altered_para(data, calc_para, plot_para, g_para, ['clust'])
 
                 # case is determining the cluster matches
-                self.det_cluster_matches(data, calc_para, w_prog)
+                self.det_cluster_matches(data, calc_para, w_prog, pool=pool)
 
             elif self.thread_job_secondary == 'Cluster Cross-Correlogram':
                 # case is the cc-gram type determinations
@@ -187,7 +190,7 @@ class WorkerThread(QThread):
 
                 # calculates the shuffled kinematic spiking frequencies
                 cfcn.calc_binned_kinemetic_spike_freq(data, plot_para, dcopy(calc_para), w_prog, roc_calc=False)
-                cfcn.calc_shuffled_kinematic_spike_freq(data, dcopy(calc_para), w_prog)
+                cfcn.calc_shuffled_kinematic_spike_freq(data, dcopy(calc_para), w_prog, pool=pool)
 
                 # runs any specific additional function
                 fit_func = ['Correlation Comparison (Fixed)',
@@ -226,7 +229,7 @@ class WorkerThread(QThread):
 
                 # calculates the fixed/free correlations (if not already set)
                 if not data.comp.ff_corr.is_set:
-                    self.calc_fix_free_correlation(data, calc_para, w_prog)
+                    self.calc_fix_free_correlation(data, calc_para, w_prog, pool=pool)
 
             ################################################
             ####    FREELY MOVING ANALYSIS FUNCTIONS    ####
@@ -643,7 +646,7 @@ class WorkerThread(QThread):
                         return
 
                 # runs the shuffled LDA
-                if not self.run_shuffled_lda(data, calc_para, r_filt, i_expt, i_cell, n_trial_max):
+                if not self.run_shuffled_lda(pool, data, calc_para, r_filt, i_expt, i_cell, n_trial_max):
                     # if there was an error in the calculations, then return an error flag
                     self.is_ok = False
                     self.work_finished.emit(thread_data)
@@ -937,89 +940,39 @@ class WorkerThread(QThread):
             # if there are no new experiments to load, then exit the function
             return None
         else:
-            n_file = len(load_dlg.exp_files)
-            dpw, p_rlx, data = 1.0 / n_file, 0.05, []
-            _, f_extn = os.path.splitext(load_dlg.exp_files[0])
+            # determines the new files to be loaded
+            i_new = [i for i, x in enumerate(load_dlg.exp_name) if x not in loaded_exp]
+            n_file, data = len(i_new), [None] * len(i_new)
+
+        # loads the new data files over a thread pool. data store files only have their header read (the large arrays
+        # are read when first accessed), while older pickled files are read in full. threads are used (rather than the
+        # process pool) as the loaded data doesn't then need to be pickled back from the workers
+        t_pool = ThreadPoolExecutor(max_workers=min(n_file, mp.cpu_count()))
+        f_load = {t_pool.submit(cfcn.load_expt_file, load_dlg.exp_files[i_file]): i for i, i_file in enumerate(i_new)}
+        f_done = as_completed(f_load)
+
+        try:
+            for i_load in range(n_file):
+                if not self.is_running:
+                    # if the user cancelled, then exit
+                    return None
+                else:
+                    # updates the progress bar string
+                    p_str = 'Loading File {0} of {1}'.format(i_load + 1, n_file)
+                    self.work_progress.emit(p_str, 100.0 * i_load / n_file)
 
-        #
-        for i_file in range(n_file):
-            if not self.is_running:
-                # if the user cancelled, then exit
-                return None
-            else:
-                # updates the progress bar string
-                p_str, pw0 = 'Loading File {0} of {1}'.format(i_file+1, n_file), i_file / n_file
-                self.work_progress.emit(p_str, 100.0 * pw0)
-
-            # sets the experiment file and name
-            if load_dlg.exp_name[i_file] not in loaded_exp:
-                # loads the data from the data file
-                with open(load_dlg.exp_files[i_file], 'rb') as fp:
-                    data_nw = p.load(fp)
-
-                # setting of other fields
-                if isinstance(data_nw, dict):
-                    data_nw['expFile'] = load_dlg.exp_files[i_file]
-
-                # re-calculates the signal features (single experiment only)
-                if f_extn == '.cdata':
-                    if np.shape(data_nw['sigFeat'])[1] == 5:
-                        # memory allocation for the signal features
-                        xi = np.array(range(data_nw['nPts']))
-                        sFeat = np.zeros((data_nw['nC'], 2))
-
-                        for i in range(data_nw['nC']):
-                            # creates the piecewise-polynomial of the mean signal
-                            pp, t_max = pchip(xi, data_nw['vMu'][:, i]), data_nw['sigFeat'][i, 2]
-                            t_min = np.argmin(data_nw['vMu'][int(t_max):, i]) + t_max
-                            v_max_2 = data_nw['vMu'][int(t_max), i] / 2.0
-                            v_min = np.min(data_nw['vMu'][int(t_max):, i])
-                            v_half = data_nw['vMu'][int(data_nw['sigFeat'][i, 1]), i] / 2.0
-
-                            ##################################################
-                            ####    POST-STIMULI SPIKE HALF-WIDTH TIME    ####
-                            ##################################################
-
-                            # determines the point/voltage of the pmaximum proceding the minimum
-                            bnd_1 = [(data_nw['sigFeat'][i, 0], data_nw['sigFeat'][i, 1])]
-                            bnd_2 = [(data_nw['sigFeat'][i, 1], data_nw['sigFeat'][i, 2])]
-                            bnd_3 = [(data_nw['sigFeat'][i, 2], t_min)]
-
-                            # determines the location of the half-width points
-                            t_hw1_lo = cfcn.opt_time_to_y0((pp, v_half), bnd_1)
-                            t_hw1_hi = cfcn.opt_time_to_y0((pp, v_half), bnd_2)
-                            t_hw2_lo = cfcn.opt_time_to_y0((pp, v_max_2), bnd_2)
-                            t_hw2_hi = cfcn.opt_time_to_y0((pp, v_max_2), bnd_3)
-                            t_rlx = cfcn.opt_time_to_y0((pp, v_min + p_rlx * (v_max_2 - v_min)), bnd_3)
-
-                            # determine if it is feasible to find the 2nd peak half-width point
-                            if (t_hw2_hi is None) or (t_rlx is None):
-                                # if not, then linearly extrapolate past the end point of the signal
-                                xi2 = np.array(range(2*xi[-1]))
-                                ppL = IUS(xi, data_nw['vMu'][:, i], k=1)
-
-                                # determines the half-width/relaxtion time from the extrapolated signal
-                                bnd_4 = [(data_nw['sigFeat'][i, 2], xi2[-1])]
-                                t_hw2_hi = cfcn.opt_time_to_y0((ppL, v_max_2), bnd_4)
-                                t_rlx = cfcn.opt_time_to_y0((ppL, v_min + p_rlx * (v_max_2 - v_min)), bnd_4)
-
-                            # calculates the new signal features
-                            data_nw['sigFeat'][i, 3] = t_hw1_lo
-                            data_nw['sigFeat'][i, 4] = t_hw1_hi
-                            sFeat[i, 0] = t_hw2_hi - t_hw2_lo
-                            sFeat[i, 1] = t_rlx - t_max
-
-                        # concatenates the new signal feature date
-                        data_nw['sigFeat'] = np.concatenate((data_nw['sigFeat'], sFeat), axis=1)
-
-                    # sets the cell cluster include indices (if not already set)
-                    if 'clInclude' not in data_nw['expInfo']:
-                        data_nw['expInfo']['clInclude'] = np.ones(data_nw['nC'], dtype=bool)
-
-                # appends the new data dictionary to the overall data list
-                data.append(data_nw)
-
-        # appends the current filename to the data dictionary and returns the object
+                # retrieves the next loaded data dictionary (the data is kept in the original file order)
+                f = next(f_done)
+                data[f_load[f]] = f.result()
+
+        finally:
+            # cancels any files not yet being loaded (if the user cancelled or a file couldn't be loaded)
+            for f in f_load:
+                f.cancel()
+
+            t_pool.shutdown(wait=False)
+
+        # returns the data dictionaries
         return data
 
     def save_multi_expt_file(self, data, out_info):
@@ -1040,9 +993,8 @@ class WorkerThread(QThread):
         # sets the output file name
         out_file = os.path.join(out_info['inputDir'], '{0}.{1}'.format(out_info['dataName'], f_extn))
 
-        # outputs the data to file
-        with open(out_file, 'wb') as fw:
-            p.dump(data, fw)
+        # outputs the data to file (only the altered experiment/result records are written to existing files)
+        ds.save_segment_file(out_file, data)
 
         # updates the progressbar
         self.work_progress.emit('Data Save Complete!', 100.0)
@@ -1080,9 +1032,8 @@ class WorkerThread(QThread):
             data_out['data'][i_file, 0], data_out['data'][i_file, 1] = \
                                         cf.get_comp_datasets(data, c_data=data_out['c_data'][i_file], is_full=True)
 
-        # outputs the data to file
-        with open(out_file, 'wb') as fw:
-            p.dump(data_out, fw)
+        # outputs the data to file (the arrays are written directly from memory)
+        ds.save_buffer_file(out_file, data_out, compress=out_info.get('compress', False))
 
         # updates the progressbar
         self.work_progress.emit('Data Save Complete!', 100.0)
@@ -1099,6 +1050,60 @@ class WorkerThread(QThread):
         # returns the object
         return p
 
+    def run_lda_pool_tasks(self, pool, p_fcn, n_sp, p_data, w_str):
+        '''
+
+        :param pool:
+        :param p_fcn:
+        :param n_sp:
+        :param p_data:
+        :param w_str:
+        :return:
+        '''
+
+        # initialisations
+        n_task, p_results = len(p_data), []
+
+        # publishes the spike count arrays to shared memory (only if running the tasks over the pool workers)
+        self.sh_data = cfcn.SharedSpikeCounts(n_sp, use_shm=pool is not None)
+        p_data = [[self.sh_data.sh_info, self.sh_data.cancel_info] + x for x in p_data]
+
+        try:
+            # runs the tasks (results are returned in the same order as the tasks)
+            if pool is None:
+                p_iter = map(p_fcn, p_data)
+            else:
+                p_iter = pool.imap(p_fcn, p_data)
+
+            for i_task, p_res in enumerate(p_iter):
+                # if the user cancelled, then flag the remaining tasks to exit and return a None value
+                if self.forced_quit or (not self.is_running) or (p_res is None):
+                    self.sh_data.cancel()
+                    return None
+
+                # updates the progressbar and stores the results
+                self.work_progress.emit(w_str.format(i_task + 1, n_task), 100. * ((i_task + 1) / n_task))
+                p_results.append(p_res)
+
+        finally:
+            # releases the shared memory blocks
+            self.sh_data.close()
+            self.sh_data = None
+
+        # returns the task results
+        return p_results
+
+    def cancel_pool_jobs(self):
+        '''
+
+        :return:
+        '''
+
+        # flags any running pool tasks to exit and releases the shared memory blocks
+        sh_data = self.sh_data
+        if sh_data is not None:
+            sh_data.close()
+
     def init_cluster_data(self):
         '''
 
@@ -1332,11 +1337,12 @@ class WorkerThread(QThread):
     ####    CLUSTER MATCHING FUNCTIONS    ####
     ##########################################
 
-    def det_cluster_matches(self, data, calc_para, w_prog):
+    def det_cluster_matches(self, data, calc_para, w_prog, pool=None):
         '''
 
         :param exp_name:
         :param comp_dlg:
+        :param pool:
         :return:
         '''
 
@@ -1359,41 +1365,24 @@ class WorkerThread(QThread):
         c_data.w_sig_feat = calc_para['w_sig_feat']
         c_data.w_sig_comp = calc_para['w_sig_comp']
         c_data.w_isi = calc_para['w_isi']
+        c_data.match_solver = calc_para['match_solver']
+        c_data.match_score_min = calc_para['match_score_min']
 
         # retrieves the fixed/free cluster dataframes
         data_fix, data_free = cf.get_comp_datasets(data, c_data=c_data, is_full=True)
 
-        def det_overall_cluster_matches(is_feas, D):
+        def det_overall_cluster_matches(is_feas, D, d_max=None):
             '''
 
             :param data_fix:
             :param data_free:
             :param D:
+            :param d_max:
             :return:
             '''
 
-            # calculates the pair-wise SS distances between each the fixed/free mean signals
-            iDsort, n_rows = np.argsort(D.T, axis=None), np.size(D, axis=0)
-
-            # memory allocation
-            isFix = np.zeros(data_fix['nC'], dtype=bool)
-            isFree = np.zeros(data_free['nC'], dtype=bool)
-            i_match = -np.ones(data_fix['nC'], dtype=int)
-
-            # determines the overall unique
-            for i in range(len(iDsort)):
-                # determines the indices of the next best match
-                iR, iC = cfcn.ind2sub(n_rows, iDsort[i])
-                if not (isFix[iR] or isFree[iC]) and is_feas[iR, iC]:
-                    # if there is not already a match, then update the match arrays
-                    i_match[iR] = iC
-                    isFix[iR], isFree[iC] = True, True
-                    if all(isFix) or all(isFree):
-                        # if all matches are found, then exit the loop
-                        break
-
-            # returns the final match array
-            return i_match
+            # determines the overall unique matches (using the selected assignment solver)
+            return cfcn.det_cluster_assignment(D, is_feas, c_data.match_solver, d_max)
 
         def det_cluster_matches_old(c_data, is_feas, d_depth):
             '''
@@ -1459,7 +1448,7 @@ class WorkerThread(QThread):
 
             # initialises the comparison data object
             w_prog.emit('Calculating Signal DTW Indices', pW)
-            c_data = cfcn.calc_dtw_indices(c_data, data_fix, data_free, is_feas)
+            c_data = cfcn.calc_dtw_indices(c_data, data_fix, data_free, is_feas, pool=pool)
 
             # calculates the signal feature metrics
             w_prog.emit('Calculating Signal Feature Metrics', 2.0 * pW)
@@ -1502,7 +1491,8 @@ class WorkerThread(QThread):
 
             # determines the unique overall cluster matches
             w_prog.emit('Determining Overall Cluster Matches', 5.0 * pW)
-            c_data.i_match = det_overall_cluster_matches(is_feas, -total_metrics_mean)
+            d_max = -c_data.match_score_min if (c_data.match_score_min > 0) else None
+            c_data.i_match = det_overall_cluster_matches(is_feas, -total_metrics_mean, d_max)
 
             # matches which are from different regions are to be removed
             ii = np.where(c_data.i_match >= 0)[0]
@@ -1663,13 +1653,14 @@ class WorkerThread(QThread):
     ####    CLUSTER MATCHING FUNCTIONS    ####
     ##########################################
 
-    def calc_fix_free_correlation(self, data, calc_para, w_prog):
+    def calc_fix_free_correlation(self, data, calc_para, w_prog, pool=None):
         '''
 
         :param data:
         :param plot_para:
         :param calc_para:
         :param w_prog:
+        :param pool:
         :return:
         '''
 
@@ -1729,7 +1720,7 @@ class WorkerThread(QThread):
             ff_corr.ind_g[i_file] = ind_nw
 
             # removes any spiking frequency data for where there is no matching data
-            cfcn.calc_shuffled_sf_corr(ff_corr, i_file, calc_para, [i_cell_tot, n_cell_tot], w_prog)
+            cfcn.calc_shuffled_sf_corr(ff_corr, i_file, calc_para, [i_cell_tot, n_cell_tot], w_prog, pool=pool)
 
             # increments the progressbar counter
             i_cell_tot += len(ind_nw)
@@ -2402,16 +2393,32 @@ class WorkerThread(QThread):
         r_obj = RotationFilteredData(data, r_filt, None, None, True, 'Whole Experiment', False)
         t_phase = r_obj.t_phase[0][0]
 
+        # creates copies of the calculation parameters for the differing phase duration/offset LDA calculations
+        calc_para_phs, calc_para_ofs = dcopy(calc_para), dcopy(calc_para)
+        calc_para_phs['t_ofs_rot'], calc_para_ofs['t_phase_rot'] = 0, calc_para['t_phase_const']
+
+        # sets the differing phase/offset value arrays
+        dt_phs = np.arange(calc_para['dt_phase'], t_phase, calc_para['dt_phase'])
+        dt_ofs = np.arange(0., t_phase - calc_para['t_phase_const'], calc_para['t_phase_const'])
+
+        # sets the analysis window (offset/duration) of each of the LDA calculations
+        t_win_phs = [cfcn.get_rot_phase_offsets(dict(calc_para_phs, t_phase_rot=x)) for x in dt_phs]
+        t_win_ofs = [cfcn.get_rot_phase_offsets(dict(calc_para_ofs, t_ofs_rot=x)) for x in dt_ofs]
+
+        # the spike counts are binned once over the edges of all the analysis windows, with the counts for each
+        # window summed from these bins (rather than re-filtering the spike times for every window)
+        t_win = [x for x in t_win_phs + t_win_ofs if x[0] is not None]
+        if len(t_win):
+            n_sp_bin = cfcn.get_spike_count_tensor(data, r_filt, i_expt, t_bin=cfcn.calc_window_bin_edges(t_win))
+            get_window_tensor = lambda x: None if (x[0] is None) else n_sp_bin.get_window_tensor(x[0], x[1])
+        else:
+            get_window_tensor = lambda x: None
+
         ################################################
         ####    DIFFERING PHASE LDA CALCULATIONS    ####
         ################################################
 
-        # creates a copy of the calculation parameters for the differing phase duration LDA calculations
-        calc_para_phs = dcopy(calc_para)
-        calc_para_phs['t_ofs_rot'] = 0
-
         # memory allocation
-        dt_phs = np.arange(calc_para['dt_phase'], t_phase, calc_para['dt_phase'])
         d_data.lda[0], d_data.y_acc[0] = np.empty(len(dt_phs), dtype=object), np.empty(len(dt_phs), dtype=object)
 
         # loops through each of the phase discretisations calculating the LDA calculations
@@ -2425,7 +2432,8 @@ class WorkerThread(QThread):
             calc_para_phs['t_phase_rot'] = dt_phs[i_phs]
 
             # runs the rotation analysis for the current configuration
-            result = cfcn.run_rot_lda(data, calc_para_phs, r_filt, i_expt, i_cell, n_trial_max)
+            result = cfcn.run_rot_lda(data, calc_para_phs, r_filt, i_expt, i_cell, n_trial_max,
+                                      r_obj=get_window_tensor(t_win_phs[i_phs]))
             if isinstance(result, bool):
                 # if there was an error, then return a false flag value
                 return False
@@ -2437,12 +2445,7 @@ class WorkerThread(QThread):
         ####    DIFFERING OFFSET LDA CALCULATIONS    ####
         #################################################
 
-        # creates a copy of the calculation parameters for the differing offset LDA calculations
-        calc_para_ofs = dcopy(calc_para)
-        calc_para_ofs['t_phase_rot'] = calc_para['t_phase_const']
-
-        # sets the differing phase/offset value arrays
-        dt_ofs = np.arange(0., t_phase - calc_para['t_phase_const'], calc_para['t_phase_const'])
+        # memory allocation
         d_data.lda[1], d_data.y_acc[1] = np.empty(len(dt_ofs), dtype=object), np.empty(len(dt_ofs), dtype=object)
 
         # loops through each of the phase discretisations calculating the LDA calculations
@@ -2456,7 +2459,8 @@ class WorkerThread(QThread):
             calc_para_ofs['t_ofs_rot'] = dt_ofs[i_ofs]
 
             # runs the rotation analysis for the current configuration
-            result = cfcn.run_rot_lda(data, calc_para_ofs, r_filt, i_expt, i_cell, n_trial_max)
+            result = cfcn.run_rot_lda(data, calc_para_ofs, r_filt, i_expt, i_cell, n_trial_max,
+                                      r_obj=get_window_tensor(t_win_ofs[i_ofs]))
             if isinstance(result, bool):
                 # if there was an error, then return a false flag value
                 return False
@@ -2491,15 +2495,17 @@ class WorkerThread(QThread):
         # returns a true value indicating the calculations were successful
         return True
 
-    def run_shuffled_lda(self, data, calc_para, r_filt, i_expt, i_cell, n_trial_max):
+    def run_shuffled_lda(self, pool, data, calc_para, r_filt, i_expt, i_cell, n_trial_max, seed=None):
         '''
 
+        :param pool:
         :param data:
         :param calc_para:
         :param r_filt:00
         :param i_expt:
         :param i_cell:
         :param n_trial_max:
+        :param seed:
         :return:
         '''
 
@@ -2522,23 +2528,29 @@ class WorkerThread(QThread):
         d_data.y_acc = np.empty((n_ex, n_cond + 1, n_sh), dtype=object)
         n_sp = np.empty((n_ex, n_sh), dtype=object)
 
+        # sets up the spike counts for each experiment (these are shared with the pool workers)
+        w_prog.emit('Setting Up Spike Count Arrays...', 0.)
+        n_sp0 = cfcn.setup_expt_lda_spike_counts(data, calc_para, r_filt, i_expt, i_cell, n_trial_max)
+
+        # sets up the shuffled trial LDA tasks (each shuffle has its own random seed)
+        is_OTO = cfcn.get_glob_para('lda_trial_type') == 'One-Trial Out'
+        sh_seed = cf.setup_random_state(seed).randint(2 ** 31 - 1, size=n_sh)
+        p_data = [[calc_para['lda_para'], n_trial_max, n_cond, is_OTO, sh_seed[i_sh]] for i_sh in range(n_sh)]
+
         # runs the LDA for each of the shuffles
-        for i_sh in range(n_sh):
-            # updates the progressbar
-            w_str = 'Shuffled Trial LDA (Shuffle #{0} of {1})'.format(i_sh + 1, n_sh)
-            w_prog.emit(w_str, 100. * (i_sh / n_sh))
+        w_str = 'Shuffled Trial LDA (Shuffle #{0} of {1})'
+        p_results = self.run_lda_pool_tasks(pool, cfcn.run_shuffled_lda_pool, n_sp0, p_data, w_str)
+        if p_results is None:
+            # if the calculations were cancelled, then return a false flag value
+            return False
 
-            # runs the rotation analysis for the current configuration
-            result = cfcn.run_rot_lda(data, calc_para, r_filt, i_expt, i_cell, n_trial_max, is_shuffle=True)
+        for i_sh, result in enumerate(p_results):
             if isinstance(result, bool):
                 # if there was an error, then return a false flag value
                 return False
             else:
                 # otherwise, store the lda/accuracy values
-                d_data.y_acc[:, :, i_sh], n_sp[:, i_sh] = result[1], result[3]
-                if i_sh == 0:
-                    # sets the experiment names (for the first shuffle only)
-                    d_data.exp_name == result[2]
+                d_data.y_acc[:, :, i_sh], n_sp[:, i_sh] = result[0], result[1]
 
         #######################################
         ####    HOUSE KEEPING EXERCISES    ####
@@ -2651,73 +2663,20 @@ class WorkerThread(QThread):
         # returns a true value indicating the calculations were successful
         return True
 
-    def run_pooled_lda(self, pool, data, calc_para, r_filt, i_expt, i_cell, n_trial_max):
+    def run_pooled_lda(self, pool, data, calc_para, r_filt, i_expt, i_cell, n_trial_max, seed=None):
         '''
 
+        :param pool:
         :param data:
         :param calc_para:
         :param r_filt:
         :param i_expt:
         :param i_cell:
         :param n_trial_max:
+        :param seed:
         :return:
         '''
 
-        def run_pooled_lda_expt(data, calc_para, r_filt, i_expt0, i_cell0, n_trial_max, n_cell, n_sp0):
-            '''
-
-            :param data:
-            :param calc_para:
-            :param r_filt:
-            :param i_expt:
-            :param i_cell:
-            :param n_trial_max:
-            :param xi:
-            :return:
-            '''
-
-            while 1:
-                # sets the required number of cells for the LDA analysis
-                if calc_para['pool_expt']:
-                    n_sp = n_sp0[:, np.random.permutation(np.size(n_sp0, axis=1))[:n_cell]]
-                    i_cell, i_expt = i_cell0, i_expt0
-
-                else:
-                    i_cell = dcopy(i_cell0)
-                    is_keep = np.ones(len(i_expt0), dtype=bool)
-
-                    for i_ex in range(len(i_expt0)):
-                        # determines the original valid cells for the current experiment
-                        ii = np.where(i_cell0[i_ex])[0]
-                        if len(ii) < n_cell:
-                            is_keep[i_ex] = False
-                            continue
-
-                        # from these cells, set n_cell cells as being valid (for analysis purposes)
-                        i_cell[i_ex][:] = False
-                        i_cell[i_ex][ii[np.random.permutation(len(ii))][:n_cell]] = True
-
-                    # removes the experiments which did not have the min number of cells
-                    i_expt, i_cell, n_sp = i_expt0[is_keep], i_cell[is_keep], n_sp0
-
-                # runs the LDA
-                results = cfcn.run_rot_lda(data, calc_para, r_filt, i_expt, i_cell, n_trial_max, n_sp0=n_sp)
-                if not isinstance(results, bool):
-                    # if successful, then exit the loop
-                    break
-
-            # returns the decoding accuracy values
-            if calc_para['pool_expt']:
-                return results[1]
-            else:
-                # retrieves the results from the LDA
-                y_acc0 = results[1]
-
-                # sets the values into
-                y_acc = np.nan * np.ones((len(is_keep), np.size(y_acc0, axis=1)))
-                y_acc[is_keep, :] = y_acc0
-                return y_acc
-
         # initialisations
         d_data = data.discrim.part
         w_prog, n_sp = self.work_progress, None
@@ -2731,45 +2690,35 @@ class WorkerThread(QThread):
             # case is all experiments are pooled
 
             # initialisations and memory allocation
-            ind_t, n_sp = np.arange(n_trial_max), []
+            n_sp = []
             t_ofs, t_phase = cfcn.get_rot_phase_offsets(calc_para)
 
-            # creates a reduce data object and creates the rotation filter object
-            data_tmp = cfcn.reduce_cluster_data(data, i_expt, True)
-            r_obj = RotationFilteredData(data_tmp, r_filt, None, None, True, 'Whole Experiment', False,
-                                         t_ofs=t_ofs, t_phase=t_phase)
+            # retrieves the spike count tensors for the filter configuration (only calculated if not already cached)
+            r_obj = cfcn.get_spike_count_tensor(data, r_filt, i_expt, t_ofs, t_phase)
 
             # sets up the LDA data/group index arrays across each condition
             for i_filt in range(r_obj.n_filt):
-                # retrieves the time spikes for the current filter/experiment, and then combines into a single
-                # concatenated array. calculates the final spike counts over each cell/trial and appends to the
+                # retrieves the spike counts (over all cells) for the current filter and appends them to the
                 # overall spike count array
-                A = dcopy(r_obj.t_spike[i_filt])[:, ind_t, :]
-                if r_obj.rot_filt['t_type'][i_filt] == 'MotorDrifting':
-                    # case is motordrifting (swap phases)
-                    t_sp_tmp = np.hstack((A[:, :, 2], A[:, :, 1]))
-                else:
-                    # case is other experiment conditions
-                    t_sp_tmp = np.hstack((A[:, :, 1], A[:, :, 2]))
-
-                # calculates the spike counts and appends them to the count array
-                n_sp.append(np.vstack([np.array([len(y) for y in x]) for x in t_sp_tmp]))
+                ind_c = np.arange(np.size(r_obj.n_sp[i_filt], axis=0))
+                t_type = r_obj.rot_filt['t_type'][i_filt]
+                n_sp.append(cfcn.get_phase_spike_counts(r_obj.n_sp[i_filt], t_type, ind_c, n_trial_max))
 
             # combines the spike counts/group indices into the final combined arrays
-            n_sp, n_expt, i_expt_lda = np.hstack(n_sp).T, 1, np.array([i_expt[0]])
+            n_sp, n_expt = np.hstack(n_sp).T, 1
             xi = cfcn.get_pool_cell_counts(data, calc_para['lda_para'], 1)
 
             # reduces the cells to the selected cell type
             _, _, i_cell0, _, _ = cfcn.setup_lda(data, {'lda_para': calc_para['lda_para']}, None)
-            n_sp = n_sp[:, np.hstack(i_cell0)]
-            i_cell = np.array([np.ones(np.size(n_sp, axis=1), dtype=bool)])
+            n_sp = [n_sp[:, np.hstack(i_cell0)]]
+            i_cell = np.array([np.ones(np.size(n_sp[0], axis=1), dtype=bool)])
 
         else:
             # case is experiments are not pooled
 
             # initialisations
             # y_acc_d, n_expt = data.discrim.dir.y_acc, min([3, len(i_expt)])
-            y_acc_d, n_expt, i_expt_lda = data.discrim.dir.y_acc, len(i_expt), i_expt
+            y_acc_d, n_expt = data.discrim.dir.y_acc, len(i_expt)
 
             # # retrieves the top n_expt experiments based on the base decoding accuracy
             # ii = np.sort(np.argsort(-np.prod(y_acc_d, axis=1))[:n_expt])
@@ -2779,45 +2728,31 @@ class WorkerThread(QThread):
             n_cell_max = np.max([sum(x) for x in i_cell])
             xi = [x for x in cfcn.n_cell_pool1 if x <= n_cell_max]
 
+            # sets up the spike counts for the valid cells within each experiment
+            w_prog.emit('Setting Up Spike Count Arrays...', 0.)
+            n_sp = cfcn.setup_expt_lda_spike_counts(data, calc_para, r_filt, i_expt, i_cell, n_trial_max)
+
         # memory allocation
         n_xi, n_sh, n_cond = len(xi), calc_para['n_shuffle'], len(r_filt['t_type'])
         d_data.y_acc = np.zeros((n_expt, n_cond + 1, n_xi, n_sh))
 
-        # loops through each of the cell counts calculating the partial LDA
-        for i_sh in range(n_sh):
-            # updates the progressbar
-            w_str = 'Pooling LDA Calculations (Shuffle {0} of {1})'.format(i_sh + 1, n_sh)
-            w_prog.emit(w_str, 100. * (i_sh / n_sh))
-
-            # # runs the analysis based on the operating system
-            # if 'Windows' in platform.platform():
-            #     # case is Richard's local computer
-            #
-            #     # initialisations and memory allocation
-            #     p_data = [[] for _ in range(n_xi)]
-            #     for i_xi in range(n_xi):
-            #         p_data[i_xi].append(data)
-            #         p_data[i_xi].append(calc_para)
-            #         p_data[i_xi].append(r_filt)
-            #         p_data[i_xi].append(i_expt)
-            #         p_data[i_xi].append(i_cell)
-            #         p_data[i_xi].append(n_trial_max)
-            #         p_data[i_xi].append(xi[i_xi])
-            #
-            #     # runs the pool object to run the partial LDA
-            #     p_results = pool.map(cfcn.run_part_lda_pool, p_data)
-            #     for i_xi in range(n_xi):
-            #         j_xi = xi.index(p_results[i_xi][0])
-            #         d_data.y_acc[:, :, j_xi, i_sh] = p_results[i_xi][1]
-            # else:
-
-            # case is Subiculum
+        # sets up the pooled LDA tasks. each cell count is a single task (with the shuffles run as a batch), and
+        # each shuffle/cell count has its own random seed
+        is_OTO = cfcn.get_glob_para('lda_trial_type') == 'One-Trial Out'
+        sh_seed = cf.setup_random_state(seed).randint(2 ** 31 - 1, size=(n_sh, n_xi))
+        p_data = [[calc_para['lda_para'], n_trial_max, n_cond, is_OTO, xi[i_xi], sh_seed[:, i_xi]]
+                  for i_xi in range(n_xi)]
+
+        # runs the partial LDA for each of the cell counts
+        w_str = 'Pooling LDA Calculations (Task {0} of {1})'
+        p_results = self.run_lda_pool_tasks(pool, cfcn.run_pooled_lda_pool, n_sp, p_data, w_str)
+        if p_results is None:
+            # if the calculations were cancelled, then return a false flag value
+            return False
 
-            # initialisations and memory allocation
-            for i_xi in range(n_xi):
-                d_data.y_acc[:, :, i_xi, i_sh] = run_pooled_lda_expt(
-                    data, calc_para, r_filt, i_expt_lda, dcopy(i_cell), n_trial_max, xi[i_xi], dcopy(n_sp)
-                )
+        # sets the decoding accuracy values (the results are in the same order as the tasks)
+        for i_xi, y_acc in enumerate(p_results):
+            d_data.y_acc[:, :, i_xi, :] = np.transpose(y_acc, (1, 2, 0))
 
         #######################################
         ####    HOUSE KEEPING EXERCISES    ####
@@ -2884,18 +2819,14 @@ class WorkerThread(QThread):
         c_ind, c_wght0 = dcopy(A), dcopy(A)
         c_wght, y_top, y_bot = dcopy(C), dcopy(C), dcopy(C)
 
-        # reduces down the data cluster to the valid experiments
-        data_tmp = cfcn.reduce_cluster_data(data, i_expt, True)
-
         # sets the LDA solver type
         lda = cfcn.setup_lda_solver(lda_para)
 
-        # creates a reduce data object and creates the rotation filter object
+        # retrieves the spike count tensors for each trial type
         for i_tt, tt in enumerate(r_filt['t_type']):
             # retrieves the rotation filter for the current
             _r_filt['t_type'] = [tt]
-            r_obj = RotationFilteredData(data_tmp, _r_filt, None, None, True, 'Whole Experiment', False,
-                                         t_ofs=t_ofs, t_phase=t_phase)
+            r_obj = cfcn.get_spike_count_tensor(data, _r_filt, i_expt, t_ofs, t_phase)
 
             # memory allocation
             y_acc_bot, y_acc_top, c_wght_ex = dcopy(B), dcopy(B), dcopy(B)
@@ -4701,6 +4632,8 @@ class WorkerThread(QThread):
                     check_class_para_equal(c_data, 'w_sig_feat', calc_para['w_sig_feat']),
                     check_class_para_equal(c_data, 'w_sig_comp', calc_para['w_sig_comp']),
                     check_class_para_equal(c_data, 'w_isi', calc_para['w_isi']),
+                    getattr(c_data, 'match_solver', 'Greedy') == calc_para['match_solver'],
+                    getattr(c_data, 'match_score_min', 0.) == calc_para['match_score_min'],
                 ]
 
                 # determines if there was a change in parameters (and hence a recalculation required)
@@ -0,0 +1,158 @@
+# module import
+import os
+import sys
+import threading
+import pickle as p
+import numpy as np
+from collections import OrderedDict
+
+# custom module import
+from analysis_guis import data_store as ds
+
+########################################################################################################################
+####    TEST CLASSES    ####
+########################################################################################################################
+
+
+class FieldData(object):
+    def __init__(self):
+        # field initialisation
+        self.exc_filt = {'region': ['All']}
+
+
+class SegmentData(object):
+    def __init__(self):
+        # field initialisation (the exclusion filter is shared between fields)
+        self._cluster = []
+        self.cluster = None
+        self.rotation = FieldData()
+        self.exc_filt = self.rotation.exc_filt
+        self.depth = FieldData()
+        self.data_ver = 0
+
+########################################################################################################################
+####    TEST FUNCTIONS    ####
+########################################################################################################################
+
+
+def test_convert_cdata_file(tmp_path):
+    '''
+
+    :param tmp_path:
+    :return:
+    '''
+
+    # initialisations (the data includes large/small arrays and array/dictionary sub-classes)
+    f_name = str(tmp_path / 'test.cdata')
+    data = {'x': np.arange(2 ** 18, dtype=float), 'y': [np.zeros(3), (1, 'a')],
+            'od': OrderedDict([('b', 1), ('a', np.ones(2 ** 17))]),
+            'ma': np.ma.masked_array(np.arange(5.), mask=[0, 1, 0, 0, 1])}
+    with open(f_name, 'wb') as fp:
+        p.dump(data, fp)
+
+    # converts the file (the sub-class types are retained)
+    assert ds.convert_cdata_file(f_name) and ds.is_data_store(f_name)
+    assert not os.path.exists('{0}.conv'.format(f_name))
+
+    data_conv = ds.load_data_store(f_name, mmap_mode=None)
+    assert type(data_conv['od']) == OrderedDict and type(data_conv['ma']) == np.ma.MaskedArray
+    assert np.array_equal(data_conv['ma'].mask, data['ma'].mask)
+    assert np.array_equal(data_conv['x'], data['x'])
+
+    # files which are already converted are not altered
+    assert not ds.convert_cdata_file(f_name)
+
+
+def test_is_data_equal():
+    '''
+
+    :return:
+    '''
+
+    # objects of different sub-types are not equal
+    assert ds.is_data_equal({'a': np.ones(3)}, {'a': np.ones(3)})
+    assert not ds.is_data_equal(OrderedDict([('a', 1)]), {'a': 1})
+    assert not ds.is_data_equal(np.ma.masked_array([1., 2.], mask=[0, 1]), np.array([1., 2.]))
+    assert not ds.is_data_equal(np.ma.masked_array([1., 2.], mask=[0, 1]), np.ma.masked_array([1., 2.], mask=[1, 0]))
+
+
+def test_lazy_dict_threads(tmp_path):
+    '''
+
+    :param tmp_path:
+    :return:
+    '''
+
+    # initialisations (the field cache only holds 3 of the fields, so fields are continually evicted)
+    f_name, n_fld, n_pts = str(tmp_path / 'test.sdata'), 8, 2 ** 12
+    ds.save_data_store(f_name, {'f{0}'.format(i): np.full(n_pts, i, dtype=float) for i in range(n_fld)}, min_bytes=1024)
+
+    s_read = ds.StoreReader(f_name, 'c')
+    cache = ds.FieldCache(3 * n_pts * 8)
+    data, t_err = ds.LazyDataDict(s_read.header['data'], s_read, cache), []
+
+    def read_fields(seed):
+        '''
+
+        :param seed:
+        :return:
+        '''
+
+        r_state = np.random.RandomState(seed)
+        try:
+            for _ in range(2000):
+                # reads a field (this must be the field array, and not an array reference)
+                i_fld = r_state.randint(n_fld)
+                x = data['f{0}'.format(i_fld)]
+                assert isinstance(x, np.ndarray) and (x[0] == i_fld)
+
+                # reads a field from a temporary dictionary (its fields are removed from the cache when deleted)
+                data_tmp = ds.LazyDataDict(s_read.header['data'], s_read, cache)
+                assert data_tmp['f0'][0] == 0
+                del data_tmp
+
+        except Exception as e:
+            t_err.append(e)
+
+    # runs the threads (the thread switch interval is reduced to increase the number of interleaved reads)
+    t_switch = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    try:
+        t_obj = [threading.Thread(target=read_fields, args=(i,)) for i in range(2)]
+        for t in t_obj:
+            t.start()
+
+        for t in t_obj:
+            t.join()
+
+    finally:
+        sys.setswitchinterval(t_switch)
+
+    # no thread errors occur and the cache is within the memory limit
+    assert not t_err, t_err
+    assert cache.n_bytes == sum(cache.fld.values()) <= cache.n_max_bytes
+
+
+def test_segment_file_shared_fields(tmp_path):
+    '''
+
+    :param tmp_path:
+    :return:
+    '''
+
+    # outputs the data to a segmented file
+    f_name = str(tmp_path / 'test.mdata')
+    ds.save_segment_file(f_name, SegmentData())
+
+    # the objects shared between fields are read back as the same object (also when only one field is read)
+    data = ds.load_segment_file(f_name)
+    assert data.exc_filt is data.rotation.exc_filt
+    assert data.depth.exc_filt is not data.exc_filt
+    assert ds.load_segment_file(f_name, fields=['exc_filt']).exc_filt == {'region': ['All']}
+
+    # fields which don't share objects are still output as separate records
+    with open(f_name, 'rb') as fp:
+        layout = ds.read_segment_index(fp)['layout']
+
+    assert layout['fields']['rotation'] == layout['fields']['exc_filt']
+    assert len(set([layout['fields'][k] for k in ['rotation', 'depth', 'data_ver']])) == 3
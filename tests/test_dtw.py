@@ -0,0 +1,97 @@
+# module import
+import numpy as np
+
+# custom module import
+from analysis_guis.calc_functions import calc_banded_dtw
+
+########################################################################################################################
+####    REFERENCE FUNCTIONS    ####
+########################################################################################################################
+
+
+def calc_full_dtw_loop(x, y):
+    '''
+
+    :param x:
+    :param y:
+    :return:
+    '''
+
+    # memory allocation
+    n, m = len(x), len(y)
+    D = np.inf * np.ones((n + 1, m + 1))
+    D[0, 0] = 0.
+
+    # calculates the accumulated cost matrix (no band constraint)
+    for i in range(1, n + 1):
+        for j in range(1, m + 1):
+            D[i, j] = np.abs(x[i - 1] - y[j - 1]) + min(D[i - 1, j], D[i, j - 1], D[i - 1, j - 1])
+
+    # returns the dtw distance
+    return D[n, m]
+
+
+def check_warping_path(p, x, y, d):
+    '''
+
+    :param p:
+    :param x:
+    :param y:
+    :param d:
+    :return:
+    '''
+
+    # checks the path runs from the start to the end of both signals
+    assert p is not None, 'No warping path was returned'
+    assert tuple(p[0]) == (0, 0) and tuple(p[-1]) == (len(x) - 1, len(y) - 1), 'Warping path end points are incorrect'
+
+    # checks each step moves by at most one index along each signal
+    dp = np.diff(p, axis=0)
+    assert np.all((dp >= 0) & (dp <= 1)) and np.all(np.sum(dp, axis=1) > 0), 'Warping path steps are invalid'
+
+    # checks the path cost matches the dtw distance
+    assert np.isclose(np.sum(np.abs(x[p[:, 0]] - y[p[:, 1]])), d), 'Warping path cost differs from the dtw distance'
+
+########################################################################################################################
+####    TEST FUNCTIONS    ####
+########################################################################################################################
+
+
+def test_banded_dtw_full_band():
+    '''
+
+    :return:
+    '''
+
+    # initialisations
+    r_state = np.random.RandomState(0)
+    x, y = r_state.randn(8, 30), r_state.randn(8, 30)
+
+    # a band covering the entire cost matrix gives the unconstrained dtw distance
+    d_dtw, p_dtw = calc_banded_dtw(x, y, 30)
+    for i in range(len(x)):
+        assert np.isclose(d_dtw[i], calc_full_dtw_loop(x[i], y[i]))
+        check_warping_path(p_dtw[i], x[i], y[i], d_dtw[i])
+
+
+def test_banded_dtw_unequal_lengths():
+    '''
+
+    :return:
+    '''
+
+    # initialisations (the band is too narrow to connect the cost matrix corners without being widened)
+    r_state = np.random.RandomState(1)
+    x, y = r_state.randn(4, 100), r_state.randn(4, 5)
+
+    # the dtw distances are finite and the warping paths are valid
+    d_dtw, p_dtw = calc_banded_dtw(x, y, 10)
+    assert np.all(np.isfinite(d_dtw))
+    for i in range(len(x)):
+        assert d_dtw[i] >= calc_full_dtw_loop(x[i], y[i]) - 1e-10
+        check_warping_path(p_dtw[i], x[i], y[i], d_dtw[i])
+
+    # the same holds when the signal lengths are swapped
+    d_dtw, p_dtw = calc_banded_dtw(y, x, 0)
+    for i in range(len(x)):
+        check_warping_path(p_dtw[i], y[i], x[i], d_dtw[i])
@@ -0,0 +1,167 @@
+# module import
+import numpy as np
+
+# custom module import
+import analysis_guis.common_func as cf
+from analysis_guis.rotational_analysis import calc_resampled_bin_counts
+
+# fixed parameters
+Z_TOL = 4.
+R_VAR_TOL = 0.15
+
+########################################################################################################################
+####    LOOP RESAMPLING FUNCTIONS    ####
+########################################################################################################################
+
+
+def calc_resampled_bin_counts_loop(x_sp, i_seg, n_seg, t_bin, ind_bin, dt_min, n_sample, r_state=None):
+    '''
+
+    :param x_sp:
+    :param i_seg:
+    :param n_seg:
+    :param t_bin:
+    :param ind_bin:
+    :param dt_min:
+    :param n_sample:
+    :param r_state:
+    :return:
+    '''
+
+    def calc_resampled_counts(t_sp, t_bin, dt_min, n_sample):
+        '''
+
+        :param t_sp:
+        :param t_bin:
+        :param dt_min:
+        :param n_sample:
+        :return:
+        '''
+
+        # calculates the residual gap between the time bin duration and the min time bin duration
+        dt_gap = np.diff(t_bin)[0] - dt_min
+
+        if (t_sp[0] < (t_bin[0] + dt_gap)) or (t_sp[-1] > (t_bin[1] - dt_gap)):
+            # if there are spikes not completely covered by the min time duration, then resample the counts
+            n_sp = np.zeros(n_sample)
+            for i_sample in range(n_sample):
+                t_bin_rs = (t_bin[0] + r_state.rand() * dt_gap) + np.array([0, dt_min])
+                n_sp[i_sample] = np.sum(np.logical_and(t_sp > t_bin_rs[0], t_sp <= t_bin_rs[1]))
+
+            # returns the mean resampled count
+            return np.mean(n_sp), True
+
+        else:
+            # otherwise, return the spike count
+            return len(t_sp), False
+
+    # memory allocation
+    r_state = cf.setup_random_state(r_state)
+    n_sp_bin = np.zeros((n_seg, len(t_bin) - 1))
+    is_rs = np.zeros(np.shape(n_sp_bin), dtype=bool)
+
+    # calculates the resampled spike counts for each trial/time bin
+    for i in range(n_seg):
+        t_sp = np.sort(x_sp[i_seg == i])
+        for j in ind_bin:
+            t_sp_bin = t_sp[np.logical_and(t_sp > t_bin[j], t_sp <= t_bin[j + 1])]
+            if len(t_sp_bin):
+                n_sp_bin[i, j], is_rs[i, j] = calc_resampled_counts(t_sp_bin, t_bin[j:(j + 2)], dt_min, n_sample)
+
+    # returns the resampled counts and the resampled trial/bin flags
+    return n_sp_bin, is_rs
+
+########################################################################################################################
+####    EQUIVALENCE CHECK FUNCTIONS    ####
+########################################################################################################################
+
+
+def setup_test_spikes(n_seg, t_bin, f_sp, r_state):
+    '''
+
+    :param n_seg:
+    :param t_bin:
+    :param f_sp:
+    :param r_state:
+    :return:
+    '''
+
+    # sets the poisson spike times for each trial
+    n_sp = r_state.poisson(f_sp * (t_bin[-1] - t_bin[0]), n_seg)
+    i_seg = np.repeat(np.arange(n_seg), n_sp)
+    x_sp = t_bin[0] + r_state.rand(len(i_seg)) * (t_bin[-1] - t_bin[0])
+
+    # returns the spike times/trial indices
+    return x_sp, i_seg
+
+
+def check_resampled_bin_counts(n_seg=20, n_sample=10, n_rep=100, f_sp=8., seed=0):
+    '''
+
+    :param n_seg:
+    :param n_sample:
+    :param n_rep:
+    :param f_sp:
+    :param seed:
+    :return:
+    '''
+
+    # initialisations (the time bins have unequal durations, similar to the kinematic bins)
+    r_state = cf.setup_random_state(seed)
+    t_bin = np.cumsum(np.concatenate(([0.], 0.1 + 0.3 * np.abs(np.sin(np.linspace(0.1, np.pi, 16))))))
+    ind_bin, dt_min = range(len(t_bin) - 1), np.min(np.diff(t_bin))
+    x_sp, i_seg = setup_test_spikes(n_seg, t_bin, f_sp, r_state)
+
+    # calculates the loop/vectorised resampled counts over each repetition
+    n_loop = np.array([calc_resampled_bin_counts_loop(x_sp, i_seg, n_seg, t_bin, ind_bin, dt_min, n_sample,
+                                                      r_state=r_state)[0] for _ in range(n_rep)])
+    n_vec = np.array([calc_resampled_bin_counts(x_sp, i_seg, n_seg, t_bin, ind_bin, dt_min, n_sample,
+                                                r_state=r_state) for _ in range(n_rep)])
+    n_exp = calc_resampled_bin_counts(x_sp, i_seg, n_seg, t_bin, ind_bin, dt_min, n_sample, use_exp=True)
+
+    # calculates the mean/variance of the resampled counts for each trial/bin
+    mu_loop, var_loop = np.mean(n_loop, axis=0), np.var(n_loop, axis=0, ddof=1)
+    mu_vec, var_vec = np.mean(n_vec, axis=0), np.var(n_vec, axis=0, ddof=1)
+    is_rs = calc_resampled_bin_counts_loop(x_sp, i_seg, n_seg, t_bin, ind_bin, dt_min, 1)[1]
+
+    # calculates the pooled z-scores of the mean differences and the ratio of the total variances
+    z_vec = np.sum(mu_vec[is_rs] - mu_loop[is_rs]) / np.sqrt(np.sum(var_vec[is_rs] + var_loop[is_rs]) / n_rep)
+    z_exp = np.sum(mu_loop[is_rs] - n_exp[is_rs]) / np.sqrt(np.sum(var_loop[is_rs]) / n_rep)
+    r_var = np.sum(var_vec[is_rs]) / np.sum(var_loop[is_rs])
+
+    # checks the bins that don't require resampling are identical
+    assert np.any(is_rs) and np.any(~is_rs), 'Test data must contain both resampled and non-resampled bins'
+    assert np.array_equal(n_vec[:, ~is_rs], n_loop[:, ~is_rs]), 'Non-resampled bin counts differ'
+    assert np.array_equal(n_exp[~is_rs], mu_loop[~is_rs]), 'Non-resampled expected bin counts differ'
+    assert np.all(var_vec[~is_rs] == 0), 'Vectorised sampler resampled fully covered bins'
+
+    # checks the resampled bins have equivalent means/variances
+    assert abs(z_vec) < Z_TOL, 'Loop/vectorised sampler means differ (z = {0:.2f})'.format(z_vec)
+    assert abs(z_exp) < Z_TOL, 'Loop sampler/expected counts differ (z = {0:.2f})'.format(z_exp)
+    assert abs(r_var - 1.) < R_VAR_TOL, 'Loop/vectorised sampler variances differ (ratio = {0:.3f})'.format(r_var)
+
+    # returns the check statistics
+    return {'n_rs': np.sum(is_rs), 'z_vec': z_vec, 'z_exp': z_exp, 'r_var': r_var}
+
+
+
+def test_resampled_bin_counts():
+    '''
+
+    :return:
+    '''
+
+    # runs the loop/vectorised sampler equivalence check over several seeds
+    for seed in range(3):
+        check_resampled_bin_counts(seed=seed)
+
+########################################################################################################################
+####    MAIN FUNCTION    ####
+########################################################################################################################
+
+
+if __name__ == '__main__':
+    for seed in range(5):
+        c_stats = check_resampled_bin_counts(seed=seed)
+        print('Seed {0}: {1} resampled bins, z_vec = {2:.2f}, z_exp = {3:.2f}, var ratio = {4:.3f}'.format(
+            seed, c_stats['n_rs'], c_stats['z_vec'], c_stats['z_exp'], c_stats['r_var']))